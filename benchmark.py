@@ -0,0 +1,56 @@
+import ast
+import sys
+import time
+
+import minimax
+
+# Micro-benchmark of the game state engines: runs the same fixed depth search
+# on game_state_example.txt with every engine and prints nodes/sec
+# Usage: python benchmark.py [depth] [repeats]
+
+
+def loadExampleState(path="game_state_example.txt"):
+    with open(path) as example:
+        return ast.literal_eval(example.read())
+
+
+# Wrap the engine so every applied move is counted as a searched node
+def countingEngine(engine, counter):
+    def applyMove(game_state, curr_snake_id, move):
+        counter[0] += 1
+        return engine.applyMove(game_state, curr_snake_id, move)
+
+    return engine._replace(applyMove=applyMove)
+
+
+def benchmarkEngine(engine, game_state, depth, repeats):
+    counter = [0]
+    counted_engine = countingEngine(engine, counter)
+    main_snake_id = game_state["you"]["id"]
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        # Every run starts from empty tables, like the first turn of a game
+        context = minimax.createSearchContext(game_state, counted_engine, float("inf"))
+        search_state = engine.createGameState(game_state, main_snake_id)
+        value, best_move = minimax.miniMax(
+            context, search_state, depth, main_snake_id, main_snake_id, None, True,
+            float("-inf"), float("inf"), game_state["turn"])
+    elapsed = time.perf_counter() - start
+
+    return counter[0], elapsed, value, best_move
+
+
+def main(depth, repeats):
+    game_state = loadExampleState()
+
+    for name in ["grid", "bitboard"]:
+        nodes, elapsed, value, best_move = benchmarkEngine(
+            minimax.getEngine(name), game_state, depth, repeats)
+        print(f"{name:>9}: {nodes} nodes in {elapsed * 1000:.1f} ms, "
+              f"{nodes / elapsed:.0f} nodes/sec (depth {depth}, best move {best_move}, value {value})")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 5)
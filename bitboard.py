@@ -0,0 +1,800 @@
+from collections import deque
+
+from boardmodel import boardModel
+from minimax import EVALUATION_MODE, MORE_TURN_WEIGHT, Engine, isOnEdge, isOnEdgeBorder, updateHeadCoord
+from ordering import MOVES
+from transposition import moveHashDelta, snakeHash, snakeSlots, zobristKeys
+
+# Bitboard game state engine. Every board is a single integer where bit (y * width + x) is one cell,
+# with the same y-flipped coordinates as the grid engine. Occupancy, food, heads and each snake's
+# body are bitmasks, so neighbours, collisions and flood fill are shift-and-mask operations.
+
+# Board geometry masks, shared by every state with the same board size
+_geometry_cache = {}
+
+
+# Returns (full board mask, mask without the first column, mask without the last column)
+def boardGeometry(board_width, board_height):
+    key = (board_width, board_height)
+    geometry = _geometry_cache.get(key)
+
+    if (geometry is None):
+        full = (1 << (board_width * board_height)) - 1
+        first_column = 0
+        for y in range(board_height):
+            first_column |= 1 << (y * board_width)
+        last_column = first_column << (board_width - 1)
+
+        geometry = (full, full & ~first_column, full & ~last_column)
+        _geometry_cache[key] = geometry
+
+    return geometry
+
+
+# Drop the geometry masks of a board size, see precompute.py
+def releaseGeometry(board_width, board_height):
+    _geometry_cache.pop((board_width, board_height), None)
+
+
+# A snake: body is the deque of cell indexes from head to tail, mask the bitmask of its cells,
+# slot its index in the Zobrist keys and hash its part of the position hash.
+# Killed snakes stay in the snake list with alive set to False
+class BitSnake:
+    __slots__ = ("id", "body", "mask", "health", "slot", "hash", "alive")
+
+    def __init__(self, snake_id, body, health, slot, snake_hash, alive=True):
+        self.id = snake_id
+        self.body = body
+        self.mask = 0
+        self.health = health
+        self.slot = slot
+        self.hash = snake_hash
+        self.alive = alive
+
+        for cell in body:
+            self.mask |= 1 << cell
+
+
+# heads is the bitmask of the alive snakes' heads and head_snakes the alive snake of every head cell,
+# alive snakes never share a head cell
+class BitboardState:
+    __slots__ = ("width", "height", "full", "not_first_column", "not_last_column",
+                 "turn", "curr_snake_id", "food", "occupied", "heads", "head_snakes", "snakes",
+                 "snake_index", "zobrist_keys", "slots", "hash")
+
+
+# Returns every cell next to the cells in the given mask
+def neighbours(game_state, mask):
+    return ((mask << 1) & game_state.not_first_column | (mask >> 1) & game_state.not_last_column
+            | (mask << game_state.width) & game_state.full | mask >> game_state.width)
+
+
+# Create a bitboard copy of the current game state, including food, snakes and curr snake id.
+# game_slots are the hash slots of the snakes for the whole game, see snakeSlots
+def createGameState(game_state, curr_snake_id, game_slots=None):
+    board_width = game_state["board"]["width"]
+    board_height = game_state["board"]["height"]
+
+    state = BitboardState()
+    state.width = board_width
+    state.height = board_height
+    state.full, state.not_first_column, state.not_last_column = boardGeometry(board_width, board_height)
+    state.turn = game_state["turn"]
+    state.curr_snake_id = curr_snake_id
+    state.food = 0
+    state.occupied = 0
+    state.heads = 0
+    state.head_snakes = {}
+    state.snakes = []
+
+    # Zobrist hash of the position, updated incrementally by applyMove
+    state.slots, slot_count = snakeSlots(game_state["board"]["snakes"], game_slots)
+    keys = zobristKeys(board_width, board_height, slot_count)
+    state.zobrist_keys = keys
+    state.hash = 0
+
+    model = boardModel(game_state)
+    for food_cell in model.food:
+        state.food |= 1 << food_cell
+        state.hash ^= keys.food[food_cell]
+
+    for snake in model.snakes:
+        body = deque(snake.body)
+        slot = state.slots[snake.id]
+        bit_snake = BitSnake(snake.id, body, snake.health, slot,
+                             snakeHash(keys, slot, body, snake.health))
+        state.snakes.append(bit_snake)
+        state.occupied |= bit_snake.mask
+        state.heads |= 1 << body[0]
+        state.head_snakes[body[0]] = bit_snake
+        state.hash ^= bit_snake.hash
+
+    # Index of every snake in the snake list, snakes keep their index for the whole search
+    state.snake_index = {snake.id: index for index, snake in enumerate(state.snakes)}
+
+    return state
+
+
+# Copy a bitboard state, only the snakes need new objects
+def copyGameState(game_state):
+    state = BitboardState()
+    for attribute in BitboardState.__slots__:
+        setattr(state, attribute, getattr(game_state, attribute))
+    state.snakes = [BitSnake(snake.id, deque(snake.body), snake.health, snake.slot, snake.hash, snake.alive)
+                    for snake in game_state.snakes]
+    state.head_snakes = {snake.body[0]: snake for snake in state.snakes if snake.alive}
+
+    return state
+
+
+# Find the alive snake with the given id, returns None if there is none
+def findSnake(game_state, snake_id):
+    snake_index = game_state.snake_index.get(snake_id)
+    if (snake_index is None):
+        return None
+
+    snake = game_state.snakes[snake_index]
+    return snake if snake.alive else None
+
+
+# Find the alive snake with its head on the given cell
+def findSnakeAtHead(game_state, head_cell):
+    return game_state.head_snakes.get(head_cell)
+
+
+# Mark a killed snake as dead and remove it from the board masks, returns the snake to bring it back
+def removeKilledSnake(game_state, snake):
+    snake.alive = False
+    game_state.occupied &= ~snake.mask
+    game_state.heads &= ~(1 << snake.body[0])
+    del game_state.head_snakes[snake.body[0]]
+
+    return snake
+
+
+# Mark a killed snake alive again and put it back in the board masks
+def restoreKilledSnake(game_state, snake):
+    snake.alive = True
+    game_state.occupied |= snake.mask
+    game_state.heads |= 1 << snake.body[0]
+    game_state.head_snakes[snake.body[0]] = snake
+
+
+# Push the new head and pop the tail, eating the food on the new head cell if any.
+# Returns the record needed to move the snake back
+def moveForward(game_state, snake, head_cell):
+    body = snake.body
+    head_bit = 1 << head_cell
+    old_head = body[0]
+    tail = body.pop()
+
+    # Tail stays occupied when another segment is stacked on it (snake has just eaten)
+    tail_vacated = not body or body[-1] != tail
+    if (tail_vacated):
+        snake.mask &= ~(1 << tail)
+        game_state.occupied &= ~(1 << tail)
+
+    has_eaten = game_state.food & head_bit != 0
+    game_state.food &= ~head_bit
+    snake.mask |= head_bit
+    game_state.occupied |= head_bit
+    game_state.heads = game_state.heads & ~(1 << old_head) | head_bit
+    del game_state.head_snakes[old_head]
+    game_state.head_snakes[head_cell] = snake
+    body.appendleft(head_cell)
+
+    return head_cell, old_head, tail, tail_vacated, has_eaten
+
+
+# Take back a moveForward, restoring the body and the masks
+def undoMoveForward(game_state, snake, move_record):
+    head_cell, old_head, tail, tail_vacated, has_eaten = move_record
+    head_bit = 1 << head_cell
+    body = snake.body
+
+    body.popleft()
+    body.append(tail)
+
+    snake.mask &= ~head_bit
+    game_state.occupied &= ~head_bit
+    if (tail_vacated):
+        snake.mask |= 1 << tail
+        game_state.occupied |= 1 << tail
+    if (has_eaten):
+        game_state.food |= head_bit
+    game_state.heads = game_state.heads & ~head_bit | 1 << old_head
+    del game_state.head_snakes[head_cell]
+    game_state.head_snakes[old_head] = snake
+
+
+# Apply the move of the correspondent snake to the game state in place and update the position hash.
+# Returns the undo record to give to undoMove, or None if the snake does not exist
+def applyMove(game_state, curr_snake_id, move):
+    prev_hash = game_state.hash
+    undo_record = applyMoveRules(game_state, curr_snake_id, move)
+
+    if (undo_record is None):
+        return None
+
+    curr_snake, _, prev_health, killed_before, move_record, has_grown, killed_after = undo_record
+    undo_record.append(prev_hash)
+    undo_record.append(curr_snake.hash)
+
+    if (killed_before is not None):
+        for snake in killed_before:
+            game_state.hash ^= snake.hash
+
+    if (move_record is not None):
+        head_cell, old_head, tail, tail_vacated, has_eaten = move_record
+        keys = game_state.zobrist_keys
+        curr_length = len(curr_snake.body)
+
+        old_length = curr_length - 1 if has_grown else curr_length
+        body = curr_snake.body
+        delta = moveHashDelta(keys, curr_snake.slot, old_head, head_cell, tail, tail_vacated,
+                              old_length, curr_length, prev_health, curr_snake.health,
+                              body[2] if old_length >= 3 else (tail if old_length == 2 else None), body[-1])
+        curr_snake.hash ^= delta
+        game_state.hash ^= delta
+
+        if (has_eaten):
+            game_state.hash ^= keys.food[head_cell]
+
+    if (killed_after is not None):
+        game_state.hash ^= curr_snake.hash
+
+    return undo_record
+
+
+# Apply the rules of the move of the correspondent snake to the game state in place, same rules as
+# the grid engine. Returns the undo record, or None if the snake does not exist
+def applyMoveRules(game_state, curr_snake_id, move):
+    board_width = game_state.width
+    curr_snake = findSnake(game_state, curr_snake_id)
+
+    # Current snake does not exist
+    if (curr_snake is None):
+        return None
+
+    curr_body = curr_snake.body
+    curr_snake_length = len(curr_body)
+
+    # Undo record: snake, previous snake to move, previous health, snakes killed before moving,
+    # move record, whether it grew and the snake killed after moving (starvation)
+    undo_record = [curr_snake, game_state.curr_snake_id, curr_snake.health, None, None, False, None]
+    game_state.turn += 1
+    game_state.curr_snake_id = curr_snake_id
+
+    head_x, head_y = updateHeadCoord(curr_body[0] % board_width, curr_body[0] // board_width, move)
+
+    # Check if snake destination hits border
+    if not (0 <= head_x < board_width and 0 <= head_y < game_state.height):
+        undo_record[3] = [removeKilledSnake(game_state, curr_snake)]
+        return undo_record
+
+    head_cell = head_y * board_width + head_x
+    head_bit = 1 << head_cell
+
+    # Check if collision is with the head of a snake
+    if (game_state.heads & head_bit):
+        destination_snake = findSnakeAtHead(game_state, head_cell)
+        destination_snake_length = len(destination_snake.body)
+
+        # Our size is bigger and we kill the another snake
+        if (destination_snake_length < curr_snake_length):
+            undo_record[3] = [removeKilledSnake(game_state, destination_snake)]
+            undo_record[4] = moveForward(game_state, curr_snake, head_cell)
+            curr_snake.health -= 1
+
+            # check if our snake ran out of health
+            if (curr_snake.health <= 0):
+                undo_record[6] = removeKilledSnake(game_state, curr_snake)
+
+        # Our snake is smaller or same size
+        else:
+            killed = [removeKilledSnake(game_state, curr_snake)]
+
+            # Same size case, both snakes die
+            if (destination_snake_length == curr_snake_length):
+                killed.append(removeKilledSnake(game_state, destination_snake))
+
+            undo_record[3] = killed
+
+        return undo_record
+
+    # Checks if snake runs into a body, chasing its own tail is allowed when the tail is not stacked
+    if (game_state.occupied & head_bit):
+        if (head_cell == curr_body[-1] and curr_body[-2] != curr_body[-1]):
+            undo_record[4] = moveForward(game_state, curr_snake, head_cell)
+            curr_snake.health -= 1
+
+            # check if our snake ran out of health
+            if (curr_snake.health <= 0):
+                undo_record[6] = removeKilledSnake(game_state, curr_snake)
+        else:
+            undo_record[3] = [removeKilledSnake(game_state, curr_snake)]
+
+        return undo_record
+
+    # Snake move to a cell with food
+    if (game_state.food & head_bit):
+
+        # Check if theres a competitor for the targeted food and if that comptetitor is bigger or equal size
+        if (foodCompetitor(game_state, curr_snake, head_bit)):
+            undo_record[3] = [removeKilledSnake(game_state, curr_snake)]
+            return undo_record
+
+        undo_record[4] = moveForward(game_state, curr_snake, head_cell)
+        curr_snake.health = 100
+
+        # add a new body part, stacked on the tail
+        curr_body.append(curr_body[-1])
+        undo_record[5] = True
+
+        return undo_record
+
+    # Snake's regular movement to empty spaces
+    undo_record[4] = moveForward(game_state, curr_snake, head_cell)
+    curr_snake.health -= 1
+
+    # Check if snake ran out of health
+    if (curr_snake.health <= 0):
+        undo_record[6] = removeKilledSnake(game_state, curr_snake)
+
+    return undo_record
+
+
+# Revert a move applied with applyMove, restoring the game state exactly as it was
+def undoMove(game_state, undo_record):
+    (curr_snake, prev_snake_id, prev_health, killed_before, move_record, has_grown, killed_after,
+     prev_hash, prev_snake_hash) = undo_record
+
+    if (killed_after is not None):
+        restoreKilledSnake(game_state, killed_after)
+
+    if (move_record is not None):
+        if (has_grown):
+            curr_snake.body.pop()
+        undoMoveForward(game_state, curr_snake, move_record)
+        curr_snake.health = prev_health
+
+    if (killed_before is not None):
+        for removed in reversed(killed_before):
+            restoreKilledSnake(game_state, removed)
+
+    game_state.turn -= 1
+    game_state.curr_snake_id = prev_snake_id
+    game_state.hash = prev_hash
+    curr_snake.hash = prev_snake_hash
+
+
+# Creates a new version of game state with the move and the correspondent snake
+def makeMove(game_state, curr_snake_id, move):
+    new_game_state = copyGameState(game_state)
+
+    if (applyMove(new_game_state, curr_snake_id, move) is None):
+        return None
+
+    return new_game_state
+
+
+# Returns boolean depending on if the snake with the given id is dead or not in the snake state
+def isGameOver(game_state, snake_id):
+    if (snake_id is None):
+        return False
+
+    if (game_state is None):
+        return True
+
+    return findSnake(game_state, snake_id) is None
+
+
+# Select the id of the alive snake that moves after the given one in the snake list
+def nextSnakeId(game_state, curr_snake_id):
+    snakes = game_state.snakes
+    curr_index = game_state.snake_index.get(curr_snake_id, 0)
+
+    for offset in range(1, len(snakes)):
+        snake = snakes[(curr_index + offset) % len(snakes)]
+        if (snake.alive):
+            return snake.id
+
+    return curr_snake_id
+
+
+# Key of the position with the given snake to move, used by the transposition table
+def positionKey(game_state, curr_snake_id):
+    return game_state.hash ^ game_state.zobrist_keys.to_move[game_state.slots[curr_snake_id]]
+
+
+# Determines if a head of a snake at least as long as ours is next to the food cell, we would die taking it
+def foodCompetitor(game_state, snake, food_bit):
+    competitors = neighbours(game_state, food_bit) & game_state.heads & ~(1 << snake.body[0])
+    while (competitors):
+        # Lowest head bit left
+        head_bit = competitors & -competitors
+        if (len(game_state.head_snakes[head_bit.bit_length() - 1].body) >= len(snake.body)):
+            return True
+        competitors ^= head_bit
+
+    return False
+
+
+# Moves of the snake that stay on the board and do not run into a body, see the grid engine's legalMoves
+def legalMoves(game_state, snake_id, main_snake_id, non_suicidal):
+    board_width = game_state.width
+    snake = findSnake(game_state, snake_id)
+    body = snake.body
+    snake_length = len(body)
+    head_x = body[0] % board_width
+    head_y = body[0] // board_width
+    tail_moves_away = snake_length < 2 or body[-2] != body[-1]
+
+    moves = []
+    for move in MOVES:
+        x, y = updateHeadCoord(head_x, head_y, move)
+        if not (0 <= x < board_width and 0 <= y < game_state.height):
+            continue
+
+        cell = y * board_width + x
+        cell_bit = 1 << cell
+        takes_main_snake = False
+
+        if (game_state.heads & cell_bit):
+            if (non_suicidal):
+                other_snake = findSnakeAtHead(game_state, cell)
+                other_length = len(other_snake.body)
+                takes_main_snake = other_snake.id == main_snake_id and snake_id != main_snake_id
+
+                if (other_length > snake_length or (other_length == snake_length and not takes_main_snake)):
+                    continue
+
+        elif (game_state.occupied & cell_bit):
+            if not (cell == body[-1] and tail_moves_away):
+                continue
+
+        if (non_suicidal):
+            if (game_state.food & cell_bit):
+                if (foodCompetitor(game_state, snake, cell_bit)):
+                    continue
+            elif (snake.health <= 1 and not takes_main_snake):
+                continue
+
+        moves.append(move)
+
+    return moves
+
+
+# Head coordinates of the snake, None if it is dead
+def snakeHead(game_state, snake_id):
+    snake = findSnake(game_state, snake_id)
+    return (snake.body[0] % game_state.width, snake.body[0] // game_state.width) if snake is not None else None
+
+
+# Head of the snake, board size and heads of the smaller snakes, used to order moves
+def snakeHeadInfo(game_state, snake_id):
+    board_width = game_state.width
+    curr_snake = findSnake(game_state, snake_id)
+    smaller_heads = [(snake.body[0] % board_width, snake.body[0] // board_width) for snake in game_state.snakes
+                     if snake.alive and len(snake.body) < len(curr_snake.body)]
+
+    return (curr_snake.body[0] % board_width, curr_snake.body[0] // board_width,
+            board_width, game_state.height, smaller_heads)
+
+
+# Breadth-first search from the head of the snake, one layer of cells per step, over the free cells
+# (and its tail when it moves away). Returns the reachable space, whether the tail is reachable and the
+# path distances to the closest food and to the closest of the target heads, like the grid engine
+def floodFill(game_state, snake, target_heads):
+    head_bit = 1 << snake.body[0]
+    tail_bit = 1 << snake.body[-1]
+    have_eaten = snake.body[-2] == snake.body[-1]
+
+    free = game_state.full & ~game_state.occupied | head_bit
+    if (not have_eaten):
+        free |= tail_bit
+
+    food_distance = float("inf")
+    target_distance = float("inf")
+    reached = head_bit
+    frontier = head_bit
+    distance = 0
+    while frontier:
+        grown = neighbours(game_state, frontier)
+        if (target_distance == float("inf") and grown & target_heads):
+            target_distance = distance + 1
+
+        frontier = grown & free & ~reached
+        distance += 1
+        if (food_distance == float("inf") and frontier & game_state.food):
+            food_distance = distance
+        reached |= frontier
+
+    is_tail_reachable = reached & tail_bit != 0
+    space = reached.bit_count() if is_tail_reachable else reached.bit_count() - 1
+
+    return space, is_tail_reachable, food_distance, target_distance
+
+
+# Breadth-first search from all heads at once, one layer of cells per step, like the grid engine's voronoi.
+# Returns the territory and contested cell counts by snake id, and for the current snake whether it reaches
+# its tail and the path distances to the closest food and target head it reaches
+def voronoi(game_state, curr_snake_id, target_heads):
+    alive_snakes = [snake for snake in game_state.snakes if snake.alive]
+    free = game_state.full & ~game_state.occupied
+    for snake in alive_snakes:
+        if (snake.body[-2] != snake.body[-1]):
+            free |= 1 << snake.body[-1]
+
+    snake_ids = [snake.id for snake in alive_snakes]
+    territory = [0] * len(snake_ids)
+    contested = [0] * len(snake_ids)
+    frontiers = [1 << snake.body[0] for snake in alive_snakes]
+    curr_index = snake_ids.index(curr_snake_id)
+    curr_tail_bit = 1 << alive_snakes[curr_index].body[-1]
+
+    is_tail_reachable = False
+    food_distance = float("inf")
+    target_distance = float("inf")
+    claimed = game_state.heads
+    distance = 0
+
+    while any(frontiers):
+        reached = []
+        for index, frontier in enumerate(frontiers):
+            grown = neighbours(game_state, frontier) if frontier else 0
+            if (index == curr_index and target_distance == float("inf") and grown & target_heads):
+                target_distance = distance + 1
+            reached.append(grown & free & ~claimed)
+
+        distance += 1
+        reached_once = 0
+        reached_more = 0
+        for cells in reached:
+            reached_more |= reached_once & cells
+            reached_once |= cells
+        claimed |= reached_once
+
+        for index, cells in enumerate(reached):
+            if (cells):
+                frontiers[index] = cells & ~reached_more
+                territory[index] += frontiers[index].bit_count()
+                if (cells & reached_more):
+                    contested[index] += (cells & reached_more).bit_count()
+            else:
+                frontiers[index] = 0
+
+        curr_reached = reached[curr_index]
+        if (curr_reached & curr_tail_bit):
+            is_tail_reachable = True
+        if (food_distance == float("inf") and curr_reached & game_state.food):
+            food_distance = distance
+
+    return (dict(zip(snake_ids, territory)), dict(zip(snake_ids, contested)),
+            is_tail_reachable, food_distance, target_distance)
+
+
+# Determines if the cell is empty, food or part of our main snake's body (not its head)
+def isSafeCell(game_state, main_body, x, y):
+    cell_bit = 1 << (y * game_state.width + x)
+    return not (game_state.occupied & cell_bit) or main_body & cell_bit != 0
+
+
+# Prevents our snake from being in a position that i will get itself edge killed
+def edgeKillDanger(game_state, main_body, head_x, head_y):
+    edge_kill_danger_weight = -400
+    board_width = game_state.width
+    board_height = game_state.height
+
+    if (not isOnEdge(head_x, head_y, board_height, board_width)):
+        return 0
+
+    if (head_x == 0):
+        if (not isSafeCell(game_state, main_body, head_x + 1, head_y)):
+            return edge_kill_danger_weight
+
+    elif (head_x == board_width - 1):
+        if (not isSafeCell(game_state, main_body, head_x - 1, head_y)):
+            return edge_kill_danger_weight
+
+    elif (head_y == 0):
+        if (not isSafeCell(game_state, main_body, head_x, head_y + 1)):
+            return edge_kill_danger_weight
+
+    elif (head_y == board_height - 1):
+        if (not isSafeCell(game_state, main_body, head_x, head_y - 1)):
+            return edge_kill_danger_weight
+
+    return 0
+
+
+# Return edge kill value of current snake, the cell next to the edge snake's head must be our main snake's body
+def edgeKillValue(game_state, main_body, head_x, head_y, other_edge_snakes, main_snake_id):
+    main_snake_edge_kill_weight = -5000
+    other_snake_edge_kill_weight = 40
+    board_width = game_state.width
+    board_height = game_state.height
+
+    if (not isOnEdgeBorder(head_x, head_y, board_width, board_height)):
+        return 0
+
+    for snake in other_edge_snakes:
+        curr_edge_kill_weight = other_snake_edge_kill_weight
+        if (snake.id == main_snake_id):
+            curr_edge_kill_weight = main_snake_edge_kill_weight
+
+        edge_head_x = snake.body[0] % board_width
+        edge_head_y = snake.body[0] // board_width
+        neck_x = snake.body[1] % board_width
+        neck_y = snake.body[1] // board_width
+
+        if ((head_x == 1 and edge_head_x == 0) or (head_x == board_width - 2 and edge_head_x == board_width - 1)):
+            inner_bit = 1 << (snake.body[0] + (1 if edge_head_x == 0 else -1))
+            if (main_body & inner_bit and ((neck_y < edge_head_y and head_y > edge_head_y)
+                                           or (neck_y > edge_head_y and head_y < edge_head_y))):
+                return curr_edge_kill_weight
+
+        elif ((head_y == 1 and edge_head_y == 0) or (head_y == board_height - 2 and edge_head_y == board_height - 1)):
+            inner_bit = 1 << (snake.body[0] + (board_width if edge_head_y == 0 else -board_width))
+            if (main_body & inner_bit and ((neck_x < edge_head_x and head_x > edge_head_x)
+                                           or (neck_x > edge_head_x and head_x < edge_head_x))):
+                return curr_edge_kill_weight
+
+    return 0
+
+
+# Finds the heads of the smaller snakes as well as returning head collision values
+def headCollisionInfo(game_state, head_x, head_y, curr_snake_size, curr_snake_id, main_snake_id):
+    smaller_heads = 0
+    other_head_losing_weight = -10000
+    main_head_losing_weight = float("inf")
+    other_head_equal_weight = -10000
+    board_width = game_state.width
+
+    curr_head_losing_weight = 0
+
+    for snake in game_state.snakes:
+        if (snake.id == curr_snake_id or not snake.alive):
+            continue
+
+        snake_size = len(snake.body)
+        snake_distance = abs(head_x - snake.body[0] % board_width) + abs(head_y - snake.body[0] // board_width)
+
+        if (snake_size < curr_snake_size):
+            smaller_heads |= 1 << snake.body[0]
+
+        if (snake_distance < 2):
+            if (snake_size > curr_snake_size):
+                curr_head_losing_weight = other_head_losing_weight
+
+                # If current snake is going up against our main snake
+                if (curr_snake_id != main_snake_id and snake.id == main_snake_id):
+                    curr_head_losing_weight = main_head_losing_weight
+
+            elif (snake_size == curr_snake_size):
+                curr_head_losing_weight = other_head_equal_weight
+
+    return smaller_heads, curr_head_losing_weight
+
+
+# Calculate the value of the current game state for our main snake without the turn term, same terms as the
+# grid engine's evaluatePosition
+def evaluatePosition(game_state, main_snake_id, curr_snake_id):
+    curr_weight = 0
+
+    opponent_death_weight = float("inf")
+    available_space_weight = 10
+    outer_bound_weight = -5
+    head_kill_weight = 70
+    food_weight = 25
+    snake_size_weight = 20
+
+    danger_health_penalty = -120
+    low_health_penalty = -60
+
+    if (game_state is None):
+        if (curr_snake_id == main_snake_id):
+            return float("-inf"), 0
+        else:
+            return float("inf"), 0
+
+    board_width = game_state.width
+    board_height = game_state.height
+
+    main_snake = None
+    curr_snake = None
+    biggest_size = 0
+    other_edge_snakes = []
+    for snake in game_state.snakes:
+        if (not snake.alive):
+            continue
+
+        if (snake.id == main_snake_id):
+            main_snake = snake
+        if (snake.id == curr_snake_id):
+            curr_snake = snake
+        else:
+            biggest_size = max(len(snake.body), biggest_size)
+            if isOnEdge(snake.body[0] % board_width, snake.body[0] // board_width, board_width, board_height):
+                other_edge_snakes.append(snake)
+
+    # Check if our main snake has died
+    if (main_snake is None):
+        return float("-inf"), 0
+
+    # Check if the current snake has died (not main snake)
+    if (curr_snake is None):
+        return opponent_death_weight, 0
+
+    curr_snake_size = len(curr_snake.body)
+    curr_snake_health = curr_snake.health
+
+    if (curr_snake_health < 20):
+        curr_weight += danger_health_penalty
+    elif (curr_snake_health < 35):
+        curr_weight += low_health_penalty
+
+    curr_weight += curr_snake_size * snake_size_weight
+
+    head_x = curr_snake.body[0] % board_width
+    head_y = curr_snake.body[0] // board_width
+
+    smaller_heads, head_collision_value = headCollisionInfo(
+        game_state, head_x, head_y, curr_snake_size, curr_snake_id, main_snake_id)
+
+    if (EVALUATION_MODE == "voronoi"):
+        territory, contested, is_tail_reachable, closest_food_distance, smallest_snake_distance = voronoi(
+            game_state, curr_snake_id, smaller_heads)
+        available_space = territory[curr_snake_id] + contested[curr_snake_id] / 2
+    else:
+        available_space, is_tail_reachable, closest_food_distance, smallest_snake_distance = floodFill(
+            game_state, curr_snake, smaller_heads)
+    curr_weight += available_space * available_space_weight
+
+    if (available_space < 2 and not is_tail_reachable):
+        return -10000, 0
+    elif (available_space < curr_snake_size // 4 and not is_tail_reachable):
+        return -800, 0
+    elif (available_space < curr_snake_size // 1.5 and not is_tail_reachable):
+        return -400, 0
+
+    curr_weight += food_weight/(closest_food_distance + 1)
+
+    # Our main snake's body without its head, the cells marked with its id on the grid board
+    main_body = main_snake.mask & ~game_state.heads
+
+    curr_weight += edgeKillDanger(game_state, main_body, head_x, head_y)
+
+    edge_kill_weight = edgeKillValue(game_state, main_body, head_x, head_y, other_edge_snakes, main_snake_id)
+    if (edge_kill_weight > 0):
+        outer_bound_weight = 0
+    curr_weight += edge_kill_weight
+
+    if (isOnEdge(head_x, head_y, board_width, board_height)):
+        curr_weight += outer_bound_weight
+
+    if (curr_snake_size - biggest_size > 0):
+        curr_size_diff = curr_snake_size - biggest_size
+        if (curr_size_diff > 6):
+            curr_size_diff = 6
+    else:
+        curr_size_diff = 1
+
+    curr_weight += head_collision_value
+    curr_weight += (head_kill_weight * curr_size_diff) / (smallest_snake_distance + 1)
+
+    if (curr_snake_id == main_snake_id):
+        return curr_weight, 1
+    else:
+        return curr_weight * -1, -1
+
+
+# Calculate the value of the current game state for our main snake, same terms as the grid engine
+def evaluatePoint(game_state, depth, main_snake_id, curr_snake_id, current_turn):
+    position_value, turn_sign = evaluatePosition(game_state, main_snake_id, curr_snake_id)
+    return position_value + turn_sign * current_turn * MORE_TURN_WEIGHT
+
+
+BITBOARD_ENGINE = Engine("bitboard", createGameState, applyMove, undoMove, makeMove,
+                         evaluatePoint, evaluatePosition, isGameOver, nextSnakeId, positionKey,
+                         snakeHead, snakeHeadInfo, legalMoves)
@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+# Board model of a move request: the request is read into it once and everything else reads the model, the move
+# checks and the fallback pathfinder of main.py as well as createGameState of both search engines.
+# Cells are indexed row * width + x with rows counted from the top, the y-flipped coordinates of the search
+# (y = height - 1 - row), so "up" is the previous row.
+
+# Models kept at once, the requests being answered and searched in the process
+BOARD_MODEL_CACHE_SIZE = 16
+
+# Cell offset of every move as (x, row) steps
+MOVE_STEPS = {"up": (0, -1), "down": (0, 1), "left": (-1, 0), "right": (1, 0)}
+
+# Snake of the model, body cells from head to tail
+ModelSnake = namedtuple("ModelSnake", ["id", "name", "health", "body"])
+
+
+class BoardModel:
+    def __init__(self, game_state):
+        board = game_state["board"]
+        self.width = board["width"]
+        self.height = board["height"]
+        self.you_id = game_state["you"]["id"]
+        self.food = [self.cell(food["x"], food["y"]) for food in board["food"]]
+        self.snakes = [ModelSnake(snake["id"], snake.get("name", ""), snake["health"],
+                                  [self.cell(body["x"], body["y"]) for body in snake["body"]])
+                       for snake in board["snakes"]]
+        self.snake_index = {snake.id: index for index, snake in enumerate(self.snakes)}
+
+        # Contents of every cell as on the grid engine's board: 0 empty, 1 food, 2 a head,
+        # else the id of the snake whose body is on it. head_cells holds the id of the snake whose head is on a cell
+        cell_count = self.width * self.height
+        self.cells = [0] * cell_count
+        self.head_cells = ["0"] * cell_count
+        for food_cell in self.food:
+            self.cells[food_cell] = 1
+        for snake in self.snakes:
+            for body_cell in snake.body:
+                # Segments stacked on the head (first turns) count as the head
+                if (body_cell == snake.body[0]):
+                    self.cells[body_cell] = 2
+                    self.head_cells[body_cell] = snake.id
+                else:
+                    self.cells[body_cell] = snake.id
+
+        self.blocked = {}
+
+    # Cell of the request coordinates (x, y pointing up)
+    def cell(self, x, y):
+        return (self.height - 1 - y) * self.width + x
+
+    # Request coordinates (x, y pointing up) of the cell
+    def coordinates(self, cell):
+        return cell % self.width, self.height - 1 - cell // self.width
+
+    # Cell the move leads to from the given cell, None when it leaves the board
+    def moveCell(self, cell, move):
+        step_x, step_row = MOVE_STEPS[move]
+        x = cell % self.width + step_x
+        row = cell // self.width + step_row
+        if (0 <= x < self.width and 0 <= row < self.height):
+            return row * self.width + x
+        return None
+
+    # Move from a cell to the cell next to it
+    def cellMove(self, cell, next_cell):
+        for move in MOVE_STEPS:
+            if (self.moveCell(cell, move) == next_cell):
+                return move
+        return None
+
+    def snake(self, snake_id):
+        return self.snakes[self.snake_index[snake_id]]
+
+    # Cells a move must not go to: every body cell, and with extra_safe the cells next to the other snakes' heads.
+    # Our own head is free. Built once per flag
+    def blockedCells(self, extra_safe=False):
+        blocked = self.blocked.get(extra_safe)
+        if (blocked is None):
+            blocked = [False] * (self.width * self.height)
+            for snake in self.snakes:
+                if (extra_safe and snake.id != self.you_id):
+                    for move in MOVE_STEPS:
+                        next_cell = self.moveCell(snake.body[0], move)
+                        if (next_cell is not None):
+                            blocked[next_cell] = True
+                for body_cell in snake.body:
+                    blocked[body_cell] = True
+            if (self.you_id in self.snake_index):
+                blocked[self.snake(self.you_id).body[0]] = False
+            self.blocked[extra_safe] = blocked
+
+        return blocked
+
+
+# Models of the latest requests by the id of the request, least recently used first. An entry holds the request
+# too: it is only the model of that very request, and its id is not given to another request while the model is
+# kept. move() releases the model of its request when it returns. The request itself is left as it came, it is
+# sent to the worker processes and logged without a model in it
+_models = OrderedDict()
+_models_lock = threading.Lock()
+
+
+# Board model of the request, built on first use. A copy of the request is another request with a model of its own
+def boardModel(game_state):
+    key = id(game_state)
+    with _models_lock:
+        entry = _models.get(key)
+        if (entry is not None and entry[0] is game_state):
+            _models.move_to_end(key)
+            return entry[1]
+
+    model = BoardModel(game_state)
+    with _models_lock:
+        _models[key] = (game_state, model)
+        while (len(_models) > BOARD_MODEL_CACHE_SIZE):
+            _models.popitem(last=False)
+    return model
+
+
+# Drop the model of the request, a later boardModel builds it again
+def releaseBoardModel(game_state):
+    with _models_lock:
+        entry = _models.get(id(game_state))
+        if (entry is not None and entry[0] is game_state):
+            del _models[id(game_state)]
@@ -0,0 +1,62 @@
+import os
+import time
+
+# Time management of a move request. The clock starts when the request arrives, so parsing and the checks
+# before the search count against the budget. The budget is the game's timeout less the network latency
+# estimated for the game and a safety margin. The search gets two deadlines: after the soft one iterative
+# deepening starts no new depth, at the hard one the search stops.
+
+# Milliseconds of the budget left unused, for the response to get out in time
+DEADLINE_SAFETY_MS = float(os.environ.get("DEADLINE_SAFETY_MS", "30"))
+
+# Timeout of a game whose requests do not give one
+DEFAULT_TIMEOUT_MS = 500
+
+# Network latency assumed until the game has reported a latency of ours
+DEFAULT_NETWORK_LATENCY_MS = float(os.environ.get("DEFAULT_NETWORK_LATENCY_MS", "100"))
+
+# Weight of the newest latency sample in the rolling estimate
+LATENCY_SMOOTHING = 0.3
+
+# Share of the budget after which no new depth is started, a depth usually takes longer than all before it
+SOFT_DEADLINE_SHARE = 0.5
+
+# Search gets at least this many ms, even when the estimate leaves less
+MIN_SEARCH_MS = 10
+
+
+# Network latency of the game: the latency reported for our last response less the time we took to answer it,
+# as a rolling estimate. Updated once per turn from the request
+def networkLatency(game_state, memory):
+    latency = game_state["you"].get("latency", "")
+    if (memory.latency_turn != game_state["turn"] and memory.response_turn == game_state["turn"] - 1
+            and latency not in ["", None]):
+        sample = max(float(latency) - memory.response_ms, 0)
+        if (memory.network_latency_ms is None):
+            memory.network_latency_ms = sample
+        else:
+            memory.network_latency_ms += LATENCY_SMOOTHING * (sample - memory.network_latency_ms)
+        memory.latency_turn = game_state["turn"]
+
+    if (memory.network_latency_ms is None):
+        return DEFAULT_NETWORK_LATENCY_MS
+    return memory.network_latency_ms
+
+
+# Soft and hard deadline in ms of the search of a request that arrived at request_time_ms
+def searchDeadlines(game_state, request_time_ms, memory):
+    timeout_ms = game_state["game"].get("timeout") or DEFAULT_TIMEOUT_MS
+    budget_ms = timeout_ms - networkLatency(game_state, memory) - DEADLINE_SAFETY_MS
+
+    # Whatever went before the search is already spent
+    spent_ms = time.time()*1000 - request_time_ms
+    budget_ms = max(budget_ms, spent_ms + MIN_SEARCH_MS)
+
+    return request_time_ms + budget_ms * SOFT_DEADLINE_SHARE, request_time_ms + budget_ms
+
+
+# The response to the request that arrived at request_time_ms is sent: remember how long it took,
+# the next request's latency is measured against it
+def responseSent(game_state, request_time_ms, memory):
+    memory.response_turn = game_state["turn"]
+    memory.response_ms = time.time()*1000 - request_time_ms
@@ -0,0 +1,52 @@
+import os
+import time
+from collections import OrderedDict
+
+# Evaluation cache: the position part of evaluatePoint (everything but the turn term, which depends on
+# how deep in the search the position is reached) by position key and main snake, see evaluatePosition.
+# The position key is the Zobrist hash with the evaluated snake to move, so it covers the perspective.
+
+# Entries kept by one cache, the least recently used ones are dropped first. 0 disables the cache
+EVALUATION_CACHE_SIZE = int(os.environ.get("EVALUATION_CACHE_SIZE", "50000"))
+
+
+class EvaluationCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Seconds spent evaluating the missed positions, the time saved by a hit is estimated from it
+        self.miss_seconds = 0.0
+
+    # (position value, turn sign) of engine.evaluatePosition, evaluated only when not cached
+    def evaluate(self, engine, game_state, main_snake_id, curr_snake_id):
+        key = (engine.positionKey(game_state, curr_snake_id), main_snake_id)
+        value = self.entries.get(key)
+
+        if (value is not None):
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return value
+
+        self.misses += 1
+        start = time.perf_counter()
+        value = engine.evaluatePosition(game_state, main_snake_id, curr_snake_id)
+        self.miss_seconds += time.perf_counter() - start
+
+        self.entries[key] = value
+        if (len(self.entries) > self.max_entries):
+            self.entries.popitem(last=False)
+
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        miss_ms = self.miss_seconds * 1000
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_ms": round(self.hits * miss_ms / self.misses, 1) if self.misses else 0.0,
+        }
@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from evalcache import EVALUATION_CACHE_SIZE, EvaluationCache
+from ordering import MoveOrdering
+from transposition import TRANSPOSITION_TABLE_MB, TranspositionTable
+
+# Search results kept between the turns of a game: transposition table, killer and history tables,
+# evaluation cache and the principal variation of the last search. A game is added by start() and released by end(),
+# games that never send end() are evicted when they are the least recently used or have expired.
+
+# Games kept at once, every game holds its own transposition table
+GAME_STORE_SIZE = int(os.environ.get("GAME_STORE_SIZE", "8"))
+
+# Seconds after its last move at which a game is dropped
+GAME_STORE_TTL = float(os.environ.get("GAME_STORE_TTL", "60"))
+
+
+class GameMemory:
+    def __init__(self, game_state):
+        self.game_id = game_state["game"]["id"]
+        self.key = gameKey(game_state)
+        self.board_size = (game_state["board"]["width"], game_state["board"]["height"])
+        # Hash slots of the snakes on the first turn, fixed for the whole game
+        self.slots = {snake["id"]: slot for slot, snake in enumerate(game_state["board"]["snakes"])}
+        self.transposition_table = TranspositionTable(TRANSPOSITION_TABLE_MB) if TRANSPOSITION_TABLE_MB > 0 else None
+        self.move_ordering = MoveOrdering()
+        self.evaluation_cache = EvaluationCache(EVALUATION_CACHE_SIZE) if EVALUATION_CACHE_SIZE > 0 else None
+        # "paranoid" or "best_reply", chosen by the first search of the game (see minimax.searchMode)
+        self.search_mode = None
+        # (snake id, move) of the expected line of play from the last searched position
+        self.principal_variation = []
+        # Turn and snake heads of the last searched position
+        self.last_turn = None
+        self.last_heads = {}
+        self.last_used = time.time()
+        # One search of the game at a time
+        self.lock = threading.Lock()
+        # Context of the game's pondering, see ponder.py
+        self.ponder_context = None
+        # Context of the game's last search and the best move it found so far, see watchdog.py
+        self.search_context = None
+        self.answer_move = None
+        # Rolling network latency estimate and the turn it was last updated on, see deadline.py
+        self.network_latency_ms = None
+        self.latency_turn = None
+        # Turn of our last response and the ms it took from the request's arrival
+        self.response_turn = None
+        self.response_ms = 0
+        # ms from the arrival of the request to the first finished depth of this turn's search, and
+        # (turn, preprocessing ms, first answer ms) of every searched turn, see precompute.py
+        self.first_answer_ms = None
+        self.answer_timings = []
+
+    # Moves every snake made since the last searched position, None when it was not the previous turn
+    def playedMoves(self, game_state):
+        if (self.last_turn is None or game_state["turn"] != self.last_turn + 1):
+            return None
+
+        played_moves = {}
+        for snake in game_state["board"]["snakes"]:
+            last_head = self.last_heads.get(snake["id"])
+            if (last_head is None):
+                return None
+            played_moves[snake["id"]] = headMove(last_head, (snake["head"]["x"], snake["head"]["y"]))
+
+        return played_moves
+
+    # Our expected move if the other snakes played along the principal variation, else None.
+    # Every snake alive on the last turn made one move of the variation
+    def expectedMove(self, game_state, main_snake_id):
+        played_moves = self.playedMoves(game_state)
+        played_plies = len(self.last_heads)
+        if (played_moves is None or len(self.principal_variation) <= played_plies):
+            return None
+
+        for snake_id, move in self.principal_variation[:played_plies]:
+            if (snake_id in played_moves and played_moves[snake_id] != move):
+                return None
+
+        snake_id, move = self.principal_variation[played_plies]
+        return move if snake_id == main_snake_id else None
+
+    # Remember the searched position and its principal variation for the next turn
+    def update(self, game_state, principal_variation):
+        self.principal_variation = principal_variation
+        self.last_turn = game_state["turn"]
+        self.last_heads = {snake["id"]: (snake["head"]["x"], snake["head"]["y"])
+                           for snake in game_state["board"]["snakes"]}
+
+
+# Move (in the coordinates of the request, y pointing up) from one head to the next
+def headMove(last_head, head):
+    if (head[0] > last_head[0]):
+        return "right"
+    if (head[0] < last_head[0]):
+        return "left"
+    if (head[1] > last_head[1]):
+        return "up"
+    return "down"
+
+
+# Key of a game's memory: the game id and our snake's id. Two of our snakes in one game search from
+# different points of view and each keeps tables of its own
+def gameKey(game_state):
+    return game_state["game"]["id"], game_state["you"]["id"]
+
+
+# Games by (game id, our snake id), in least recently used order
+class GameStore:
+    def __init__(self, max_games, ttl_seconds):
+        self.max_games = max_games
+        self.ttl_seconds = ttl_seconds
+        self.games = OrderedDict()
+        self.lock = threading.Lock()
+        self.evicted = 0
+
+    def create(self, game_state):
+        memory = GameMemory(game_state)
+        with self.lock:
+            self.games[memory.key] = memory
+            self.evict()
+        return memory
+
+    # Memory of the game, created when the game was not started here (e.g. after a restart)
+    def get(self, game_state):
+        with self.lock:
+            memory = self.games.get(gameKey(game_state))
+            if (memory is not None):
+                memory.last_used = time.time()
+                self.games.move_to_end(memory.key)
+                self.evict()
+                return memory
+
+        return self.create(game_state)
+
+    # Release the memory of our snake of the request, our other snakes in the game keep theirs
+    def release(self, game_state):
+        with self.lock:
+            self.games.pop(gameKey(game_state), None)
+
+    # Drop expired games and the least recently used ones above the size limit, the lock is held
+    def evict(self):
+        expire_time = time.time() - self.ttl_seconds
+        while (self.games):
+            key, memory = next(iter(self.games.items()))
+            if (len(self.games) <= self.max_games and memory.last_used >= expire_time):
+                break
+            del self.games[key]
+            self.evicted += 1
+
+    # Keys of the games kept here
+    def keys(self):
+        with self.lock:
+            return list(self.games)
+
+    # Release every game but the ones of the keys, a search worker keeps the games the server process keeps
+    def retain(self, keys):
+        keys = set(keys)
+        with self.lock:
+            for key in [key for key in self.games if key not in keys]:
+                del self.games[key]
+
+    # Whether a game kept here plays on a board of the size
+    def playsBoard(self, board_size):
+        with self.lock:
+            return any(memory.board_size == board_size for memory in self.games.values())
+
+    def stats(self):
+        return {"games": len(self.games), "evicted": self.evicted}
+
+
+game_store = GameStore(GAME_STORE_SIZE, GAME_STORE_TTL)
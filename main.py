@@ -1,28 +1,21 @@
+import os
 import typing
 import time
-from astar import AStar
 
-from minimax import miniMax_value
+from boardmodel import boardModel, releaseBoardModel
+from deadline import responseSent
+from gamestore import game_store
+from mcts import monteCarlo_value
+from parallel import parallelMiniMax_value, startSearchWorkers
+from pathfind import findPath
+from ponder import requestFinished, requestStarted
+from precompute import boardKey, prepareBoard, prepared_boards, recordTimings, releaseBoard, timingReport
+from watchdog import watchedMove
 
+# Search that picks the move: "minimax" (alpha-beta, see minimax.py) or "mcts" (Monte Carlo tree search, see mcts.py)
+SEARCH_ALGORITHM = os.environ.get("SEARCH_ALGORITHM", "minimax")
 
-class AStarSearch(AStar):
-    def __init__(self, nodes):
-        self.nodes = nodes
-
-    def neighbors(self, n):
-        for n1, d in self.nodes[n]:
-            yield n1
-
-    def distance_between(self, n1, n2):
-        for n, d in self.nodes[n1]:
-            if n == n2:
-                return d
-
-    def heuristic_cost_estimate(self, current, goal):
-        return abs(current[0] - goal[0]) + abs(current[1] - goal[1])
-
-    def is_goal_reached(self, current, goal):
-        return current == goal
+SEARCH_FUNCTIONS = {"minimax": parallelMiniMax_value, "mcts": monteCarlo_value}
 
 
 # info is called when you create your Battlesnake on play.battlesnake.com
@@ -41,13 +34,20 @@ def info() -> typing.Dict:
 
 
 # start is called when your Battlesnake begins a game
+# The game's tables and the static tables of its board are built here, off the clock of the first move
 def start(game_state: typing.Dict):
     printly(game_state, "GAME START")
+    game_store.create(game_state)
+    build_ms = prepareBoard(game_state)
+    printly(game_state, "Board tables " + str(boardKey(game_state)) + " built in " + str(round(build_ms, 1)) + " ms")
 
 
 # end is called when your Battlesnake finishes a game
 def end(game_state: typing.Dict):
+    printly(game_state, "Timings: " + timingReport(game_store.get(game_state)))
     printly(game_state, "GAME OVER\n")
+    game_store.release(game_state)
+    releaseBoard(game_state)
 
 
 def printly(game_state:typing.Dict, e):
@@ -58,73 +58,74 @@ def printly(game_state:typing.Dict, e):
 # Valid moves are "up", "down", "left", or "right"
 # See https://docs.battlesnake.com/api/example-move for available data
 
-def safeMove(game_state: typing.Dict, board) -> list[str]:
-    is_move_safe = {"up": True, "down": True, "left": True, "right": True}
-
-    my_head = game_state["you"]["body"][0]  # Coordinates of my head
-    my_neck = game_state["you"]["body"][1]  # Coordinates of my "neck"
-
-    board_width = game_state['board']['width']
-    board_height = game_state['board']['height']
+# Moves of our snake that stay on the board and off every body, with extra_safe also off the cells next to
+# the other heads
+def safeMove(game_state: typing.Dict, extra_safe=False) -> list[str]:
+    model = boardModel(game_state)
+    blocked = model.blockedCells(extra_safe)
+    my_head = model.snake(model.you_id).body[0]
 
-    l_distance = my_head["x"]
-    r_distance = board_width - 1 - l_distance
-    b_distance = my_head["y"]
-    t_distance = board_height - 1 - b_distance
-
-    if my_neck["x"] < my_head["x"] or l_distance == 0 or board[my_head["x"]-1][my_head["y"]] == 1:  # Neck is left of head, don't move left
-        is_move_safe["left"] = False
-
-    if my_neck["x"] > my_head["x"] or r_distance == 0 or board[my_head["x"]+1][my_head["y"]] == 1:  # Neck is right of head, don't move right
-        is_move_safe["right"] = False
-
-    if my_neck["y"] < my_head["y"] or b_distance == 0 or board[my_head["x"]][my_head["y"]-1] == 1:  # Neck is below head, don't move down
-        is_move_safe["down"] = False
-
-    if my_neck["y"] > my_head["y"] or t_distance == 0 or board[my_head["x"]][my_head["y"]+1] == 1:  # Neck is above head, don't move up
-        is_move_safe["up"] = False
-
-    # Are there any safe moves left?
     safe_moves = []
-    for move, isSafe in is_move_safe.items():
-        if isSafe:
+    for move in ["up", "down", "left", "right"]:
+        next_cell = model.moveCell(my_head, move)
+        if next_cell is not None and not blocked[next_cell]:
             safe_moves.append(move)
 
     return safe_moves
 
 
+# Cell of the closest food we are closer to than another snake, None if there is none
 def search_closest_safest_food(game_state: typing.Dict):
-    head = game_state["you"]["head"]
-    food_pieces = game_state["board"]["food"]
-    other_snakes = game_state["board"]["snakes"]
-    if food_pieces is None:
-        return None
-        # TODO check if necessary return None and list()
-    food_list = list(food_pieces)
+    model = boardModel(game_state)
+    head = model.snake(model.you_id).body[0]
 
     def manhattan_distance(a, b):
-        return abs(a["x"] - b["x"]) + abs(a["y"] - b["y"])
+        return abs(a % model.width - b % model.width) + abs(a // model.width - b // model.width)
 
     def distance_from_head(e):
         return manhattan_distance(head, e)
 
-    food_list.sort(key=distance_from_head)
-    # printly(game_state, food_list)
+    food_list = sorted(model.food, key=distance_from_head)
 
     for food in food_list:
         our_distance = distance_from_head(food)
-        for snake in game_state["board"]["snakes"]:
-            if snake["id"] != game_state["you"]["id"]:
-                other_distance = manhattan_distance(food, snake["head"])
+        for snake in model.snakes:
+            if snake.id != model.you_id:
+                other_distance = manhattan_distance(food, snake.body[0])
                 if our_distance < other_distance:
-                    printly(game_state, "Going towards " + str(food))
-                    return food["x"], food["y"]
+                    printly(game_state, "Going towards " + str(model.coordinates(food)))
+                    return food
 
     printly(game_state, "No safe food found!")
     return None
 
 
-def move(game_state: typing.Dict) -> typing.Dict:
+# request_time_ms is when the request arrived, the move deadline counts from it (see deadline.py)
+def move(game_state: typing.Dict, request_time_ms: typing.Optional[float] = None) -> typing.Dict:
+    if request_time_ms is None:
+        request_time_ms = time.time() * 1000
+    # The request is read into its board model once, everything after reads the model
+    boardModel(game_state)
+    # Pondering stops while the request is answered and starts again from the chosen move
+    requestStarted(game_state)
+    selected = None
+    try:
+        # The watchdog answers by the deadline, with the cheap move if the search has found none by then
+        selected = watchedMove(game_state, request_time_ms, chooseMove, cheapMove(game_state))
+        return selected
+    finally:
+        responseSent(game_state, request_time_ms, game_store.get(game_state))
+        requestFinished(game_state, selected["move"] if selected is not None else None)
+        releaseBoardModel(game_state)
+
+
+# First safe move away from the cells next to the other heads, else any safe move
+def cheapMove(game_state: typing.Dict) -> str:
+    safe_moves = safeMove(game_state, True) or safeMove(game_state)
+    return safe_moves[0] if safe_moves else "up"
+
+
+def chooseMove(game_state: typing.Dict, request_time_ms: float) -> typing.Dict:
     printly(game_state, "Move: " + str(game_state["turn"]))
     # always try to kill in one move 
     ikm = immediate_kill_move(game_state)
@@ -132,10 +133,17 @@ def move(game_state: typing.Dict) -> typing.Dict:
         printly(game_state, "killing in one move: " + ikm)
         return {"move": ikm}
     try:
-        current_time_ms = int(time.time() * 1000)
-        processedBoard = defineBoard(game_state)
-        safe_moves = safeMove(game_state, processedBoard)
-        selected_move = miniMax_value(game_state, safe_moves, current_time_ms)
+        safe_moves = safeMove(game_state)
+        # Everything since the request arrived is preprocessing, reported apart from the search
+        search_start_ms = time.time() * 1000
+        preprocessing_ms = search_start_ms - request_time_ms
+        printly(game_state, "Preprocessing: " + str(round(preprocessing_ms, 1)) + " ms, board tables "
+                + ("prepared" if boardKey(game_state) in prepared_boards else "not prepared"))
+        memory = game_store.get(game_state)
+        memory.first_answer_ms = None
+        selected_move = SEARCH_FUNCTIONS[SEARCH_ALGORITHM](game_state, safe_moves, request_time_ms)
+        printly(game_state, "Search: " + str(round(time.time() * 1000 - search_start_ms, 1)) + " ms")
+        recordTimings(memory, game_state["turn"], preprocessing_ms)
         if selected_move is None or selected_move not in safe_moves:
             raise Exception("Minimax failed!")
         return {"move": selected_move}
@@ -147,181 +155,48 @@ def move(game_state: typing.Dict) -> typing.Dict:
             printly(game_state, "killing in one move: " + ikm)
             return {"move": ikm}
 
-        my_head = game_state["you"]["head"]["x"], game_state["you"]["head"]["y"]
-        # my_target = game_state["board"]["food"][0]["x"], game_state["board"]["food"][0]["y"]
+        model = boardModel(game_state)
+        my_head = model.snake(model.you_id).body[0]
         my_target = search_closest_safest_food(game_state)
 
-        path, board = search_path(game_state, my_head, my_target)
+        path = search_path(game_state, my_head, my_target)
 
         if path is None:
-            pickedMove = safeMove(game_state, board)
+            pickedMove = safeMove(game_state, True) or safeMove(game_state) or ["up"]
             printly(game_state, "Path not found! Picked move: " + pickedMove[0])
             # return free move
             return {"move": pickedMove[0]}
-        path_list = list(path)
-        # print(path_list)
-
-        if len(path_list) > 1:
-            next_move = next_direction(my_head, path_list[1])
-            printly(game_state, "moving " + next_move)
-            return {"move": next_move}
-        pickedMove = safeMove(game_state, board)
-        printly(game_state, "Path too short! Picked move: " + pickedMove[0])
-        return {"move": pickedMove}
-
-
-def search_path(game_state: typing.Dict, start, target) -> \
-        (typing.Optional)[typing.Tuple[typing.Iterable[object], object]]:
-    # Create grid for A*
-    height = game_state["board"]["height"]  # rows
-    width = game_state["board"]["width"]  # columns
-    board = [[0 for _ in range(width)] for _ in range(height)]
-
-    for snake in game_state["board"]["snakes"]:
-        if (snake["id"] != game_state["you"]["id"]):
-        #set head's surrounding to 1
-            xHead = snake["head"]["x"]
-            yHead = snake["head"]["y"]
-            if xHead > 0:
-                board[xHead-1][yHead] = 1
-            if xHead < width - 1:
-                board[xHead+1][yHead] = 1
-            if yHead > 0:
-                board[xHead][yHead-1] = 1
-            if yHead < height - 1:
-                board[xHead][yHead+1] = 1
-        for body_piece in snake["body"]:
-            x = body_piece['x']
-            y = body_piece['y']
-            board[x][y] = 1
-
-    # removed hazards handling because we are only going to compete on standard map
-    # for hazard in game_state["board"]["hazards"]:
-    #    x = hazard['x']
-    #    y = hazard['y']
-    #    board[x][y] = 1
-
-    board[game_state["you"]["head"]["x"]][game_state["you"]["head"]["y"]] = 0
-    board_graph = create_graph(board)
-    if target is not None:
-        path = AStarSearch(board_graph).astar(start, target)
-    else:
-        path = None
-    return path, board
-
-
-def search_path(game_state: typing.Dict, start, target) -> \
-        (typing.Optional)[typing.Tuple[typing.Iterable[object], object]]:
-    # Create grid for A*
-    board = defineBoard(game_state, True)
-    board_graph = create_graph(board)
-    if target is not None:
-        path = AStarSearch(board_graph).astar(start, target)
-    else:
-        path = None
-    return path, board
-
-def defineBoard(game_state: typing.Dict, extra_safe=False):
-    # Create grid for A*
-    height = game_state["board"]["height"]  # rows
-    width = game_state["board"]["width"]  # columns
-    board = [[0 for _ in range(width)] for _ in range(height)]
-
-    for snake in game_state["board"]["snakes"]:
-        if extra_safe and snake["id"] != game_state["you"]["id"]:
-            # set head's surrounding to 1
-            xHead = snake["head"]["x"]
-            yHead = snake["head"]["y"]
-            if xHead > 0:
-                board[xHead-1][yHead] = 1
-            if xHead < width - 1:
-                board[xHead+1][yHead] = 1
-            if yHead > 0:
-                board[xHead][yHead-1] = 1
-            if yHead < height - 1:
-                board[xHead][yHead+1] = 1
-        for body_piece in snake["body"]:
-            x = body_piece['x']
-            y = body_piece['y']
-            board[x][y] = 1
-
-    # removed hazards handling because we are only going to compete on standard map
-    # for hazard in game_state["board"]["hazards"]:
-    #    x = hazard['x']
-    #    y = hazard['y']
-    #    board[x][y] = 1
-
-    board[game_state["you"]["head"]["x"]][game_state["you"]["head"]["y"]] = 0
-    return board
-
-
-def next_direction(head, next_square):
-    if head[0]>next_square[0]:
-        return "left"
-    if head[0]<next_square[0]:
-        return "right"
-    if head[1]>next_square[1]:
-        return "down"
-    if head[1]<next_square[1]:
-        return "up"
-    return "None"
-
-def create_graph(matrix):
-    height = len(matrix)
-    width = len(matrix[0])
-    nodes = {}
-
-    def add_edge(node1, node2, cost):
-        if node1 in nodes:
-            nodes[node1].append((node2, cost))
-        else:
-            nodes[node1] = [(node2, cost)]
-
-    for y in range(height):
-        for x in range(width):
-            if matrix[x][y] == 0:  # Free cell
-                current_node = (x, y)
-                # Up
-                if y < height-1 and matrix[x][y+1] == 0:
-                    add_edge(current_node, (x, y+1), 100)
-
-                # Down
-                if y > 0 and matrix[x][y-1] == 0:
-                    add_edge(current_node, (x, y-1), 100)
-
-                # Left
-                if x > 0 and matrix[x-1][y] == 0:
-                    add_edge(current_node, (x-1, y), 100)
-
-                # Right
-                if x < width-1 and matrix[x+1][y] == 0:
-                    add_edge(current_node, (x+1, y), 100)
-
-    return nodes
+        first_step, path_length = path
+
+        next_move = model.cellMove(my_head, first_step)
+        printly(game_state, "moving " + next_move + " (path of " + str(path_length) + ")")
+        return {"move": next_move}
+
+
+# First cell and length of the shortest path from the start cell to the target cell away from the other heads,
+# None if there is none
+def search_path(game_state: typing.Dict, start, target) -> typing.Optional[typing.Tuple[int, int]]:
+    if target is None:
+        return None
+    model = boardModel(game_state)
+    return findPath(model.blockedCells(True), model.width, model.height, start, target)
 
 
 def immediate_kill_move(game_state: typing.Dict) -> str:
-    my_name = game_state["you"]["name"]
-    my_length = game_state["you"]["length"]
+    model = boardModel(game_state)
+    me = model.snake(model.you_id)
+    my_length = len(me.body)
     # find my next possible moves
-    my_possible_moves = {
-        (game_state["you"]["head"]["x"] + 1, game_state["you"]["head"]["y"]): "right",
-        (game_state["you"]["head"]["x"], game_state["you"]["head"]["y"] + 1): "up",
-        (game_state["you"]["head"]["x"] - 1, game_state["you"]["head"]["y"]): "left",
-        (game_state["you"]["head"]["x"], game_state["you"]["head"]["y"] - 1): "down"
-    }
-
-    del my_possible_moves[(game_state["you"]["body"][1]["x"], game_state["you"]["body"][1]["y"])]
+    my_possible_moves = {}
+    for move in ["right", "up", "left", "down"]:
+        next_cell = model.moveCell(me.body[0], move)
+        if next_cell is not None and next_cell != me.body[1]:
+            my_possible_moves[next_cell] = move
 
-    for snake in game_state["board"]["snakes"]:
-        if (snake["name"] != my_name) and (my_length > snake["length"]):
-            snake_possible_moves = {
-                (snake["head"]["x"] + 1, snake["head"]["y"]),
-                (snake["head"]["x"], snake["head"]["y"] + 1),
-                (snake["head"]["x"] - 1, snake["head"]["y"]),
-                (snake["head"]["x"], snake["head"]["y"] - 1)
-            }
-            snake_possible_moves.remove((snake["body"][1]["x"], snake["body"][1]["y"]))
+    for snake in model.snakes:
+        if (snake.id != me.id) and (my_length > len(snake.body)):
+            snake_possible_moves = {model.moveCell(snake.body[0], move) for move in ["right", "up", "left", "down"]}
+            snake_possible_moves.discard(snake.body[1])
 
             for my_move in my_possible_moves:
                 if my_move in snake_possible_moves:
@@ -335,5 +210,7 @@ def immediate_kill_move(game_state: typing.Dict) -> str:
 if __name__ == "__main__":
     from server import run_server
 
+    # Worker processes are forked once, before the server takes its first request
+    startSearchWorkers()
     run_server({"info": info, "start": start, "move": move, "end": end})
 
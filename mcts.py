@@ -0,0 +1,353 @@
+import math
+import os
+import queue
+import random
+import time
+
+import minimax
+import parallel
+from deadline import searchDeadlines
+from gamestore import game_store
+from ordering import MOVES
+
+# Monte Carlo tree search, the alternative to miniMax_value for crowded and large boards where the alpha-beta
+# search cannot see far enough. A node of the tree is a round in which every snake alive moves once. Every snake
+# picks its move of the round on its own statistics with UCB1 (decoupled UCT), the moves are then applied in snake
+# order by the engine's rules (applyMove, the in place makeMove). A new node is scored by a random rollout,
+# cut short and scored with evaluatePoint. Like the paranoid search, the opponents play against our snake:
+# the reward of an opponent is one minus ours. The most visited move so far is published to the game memory at a
+# regular interval, the watchdog answers with it and stops the search if it does not return in time.
+
+# Exploration constant of UCB1
+MCTS_EXPLORATION = 1.4
+
+# Rounds of a rollout before it is scored with evaluatePoint, 0 plays rollouts until the game ends
+MCTS_ROLLOUT_ROUNDS = int(os.environ.get("MCTS_ROLLOUT_ROUNDS", "8"))
+
+# Rounds after which a rollout played until the end is stopped and scored as a draw
+MCTS_MAX_ROLLOUT_ROUNDS = 200
+
+# Scale of the logistic reward of a rollout scored with evaluatePoint: a value MCTS_VALUE_SCALE above
+# the value of the root position is a reward of about 0.73
+MCTS_VALUE_SCALE = 200
+
+# Interval in ms at which the tree publishes its root statistics, to the game memory or as a worker to the parent
+MCTS_PUBLISH_MS = 20
+
+
+class TreeNode:
+    def __init__(self):
+        self.visits = 0
+        # Statistics of every snake's moves: {snake id: {move: [visits, reward sum]}}
+        self.move_stats = {}
+        # Child nodes by the moves of the round, one per snake in snake order
+        self.children = {}
+
+
+# Ids of the snakes alive in the order they move in a round, starting with our main snake
+def roundSnakes(engine, game_state, main_snake_id):
+    snake_ids = [main_snake_id]
+    snake_id = engine.nextSnakeId(game_state, main_snake_id)
+    while (snake_id != main_snake_id):
+        snake_ids.append(snake_id)
+        snake_id = engine.nextSnakeId(game_state, snake_id)
+    return snake_ids
+
+
+# Moves the snake chooses from: the non suicidal ones, else the ones that stay on the board, else any
+def snakeMoves(engine, game_state, snake_id, main_snake_id):
+    moves = engine.legalMoves(game_state, snake_id, main_snake_id, True)
+    if (not moves):
+        moves = engine.legalMoves(game_state, snake_id, main_snake_id, False)
+    return moves or [MOVES[0]]
+
+
+# Our reward when the game has ended: 0 when our main snake is dead, 1 when every opponent is, else None
+def terminalReward(engine, game_state, main_snake_id, has_opponents):
+    if (engine.isGameOver(game_state, main_snake_id)):
+        return 0.0
+    if (has_opponents and engine.nextSnakeId(game_state, main_snake_id) == main_snake_id):
+        return 1.0
+    return None
+
+
+# Value of a position from our main snake's point of view, see evaluatePoint
+def positionValue(engine, game_state, main_snake_id, current_turn):
+    return engine.evaluatePoint(game_state, 0, main_snake_id, main_snake_id, current_turn)
+
+
+# Our reward for a position: its value compared to the value of the root position, mapped to (0, 1)
+def positionReward(engine, game_state, main_snake_id, current_turn, root_value):
+    value = positionValue(engine, game_state, main_snake_id, current_turn)
+    if (value == float("inf")):
+        return 1.0
+    if (value == float("-inf")):
+        return 0.0
+    return 1 / (1 + math.exp(-max(min((value - root_value) / MCTS_VALUE_SCALE, 50), -50)))
+
+
+# Apply one move of every snake of the round in snake order, skipping the snakes killed earlier in the round.
+# Returns the number of moves applied
+def playRound(engine, game_state, snake_ids, moves, undo_records):
+    applied = 0
+    for snake_id, move in zip(snake_ids, moves):
+        if (engine.isGameOver(game_state, snake_id)):
+            continue
+        undo_record = engine.applyMove(game_state, snake_id, move)
+        if (undo_record is not None):
+            undo_records.append(undo_record)
+            applied += 1
+    return applied
+
+
+class MonteCarloTree:
+    def __init__(self, engine, search_state, main_snake_id, current_turn, seed):
+        self.engine = engine
+        self.search_state = search_state
+        self.main_snake_id = main_snake_id
+        self.current_turn = current_turn
+        self.rng = random.Random(seed)
+        self.root = TreeNode()
+        # A game with opponents is won when all of them are dead
+        self.has_opponents = len(roundSnakes(engine, search_state, main_snake_id)) > 1
+        # Rollouts are scored against the root position
+        self.root_value = 0
+        if (not engine.isGameOver(search_state, main_snake_id)):
+            root_value = positionValue(engine, search_state, main_snake_id, current_turn)
+            if (root_value not in [float("inf"), float("-inf")]):
+                self.root_value = root_value
+        self.iterations = 0
+        self.nodes = 1
+        # Search context of the running search, its deadline is also checked during rollouts
+        self.context = None
+
+    # Iterate until the search context's deadline or until it is stopped, the tree answers at any time.
+    # publish(tree) is called every MCTS_PUBLISH_MS
+    def search(self, context, publish=None):
+        self.context = context
+        publish_time_ms = time.time()*1000 + MCTS_PUBLISH_MS
+        while (not context.timeUp()):
+            self.iterate()
+            if (publish is not None and time.time()*1000 >= publish_time_ms):
+                publish(self)
+                publish_time_ms = time.time()*1000 + MCTS_PUBLISH_MS
+
+    # One iteration: select down to a new node, score it with a rollout and update the statistics of the path.
+    # An iteration whose rollout ran into the deadline is taken back without a trace
+    def iterate(self):
+        engine = self.engine
+        search_state = self.search_state
+        node = self.root
+        current_turn = self.current_turn
+        path = []
+        undo_records = []
+
+        while (True):
+            reward = terminalReward(engine, search_state, self.main_snake_id, self.has_opponents)
+            if (reward is not None):
+                break
+            if (node.visits == 0 and node is not self.root):
+                reward = self.rollout(current_turn, undo_records)
+                if (reward is None):
+                    for undo_record in reversed(undo_records):
+                        engine.undoMove(search_state, undo_record)
+                    return
+                break
+
+            snake_ids = roundSnakes(engine, search_state, self.main_snake_id)
+            moves = tuple(self.selectMove(node, snake_id) for snake_id in snake_ids)
+            path.append((node, snake_ids, moves))
+            current_turn += playRound(engine, search_state, snake_ids, moves, undo_records)
+
+            child = node.children.get(moves)
+            if (child is None):
+                child = TreeNode()
+                node.children[moves] = child
+                self.nodes += 1
+            node = child
+
+        node.visits += 1
+        for path_node, snake_ids, moves in path:
+            path_node.visits += 1
+            for snake_id, move in zip(snake_ids, moves):
+                stats = path_node.move_stats[snake_id][move]
+                stats[0] += 1
+                stats[1] += reward if snake_id == self.main_snake_id else 1 - reward
+
+        for undo_record in reversed(undo_records):
+            engine.undoMove(search_state, undo_record)
+        self.iterations += 1
+
+    # UCB1 move of the snake at the node on its own statistics, moves never tried come first
+    def selectMove(self, node, snake_id):
+        move_stats = node.move_stats.get(snake_id)
+        if (move_stats is None):
+            move_stats = {move: [0, 0.0] for move in snakeMoves(self.engine, self.search_state, snake_id,
+                                                                   self.main_snake_id)}
+            node.move_stats[snake_id] = move_stats
+
+        best_move = None
+        best_score = float("-inf")
+        log_visits = math.log(max(node.visits, 1))
+        for move, (visits, reward_sum) in move_stats.items():
+            if (visits == 0):
+                return move
+            score = reward_sum / visits + MCTS_EXPLORATION * math.sqrt(log_visits / visits)
+            if (score > best_score):
+                best_move, best_score = move, score
+        return best_move
+
+    # Random playout from the current position, every snake picks one of its non suicidal moves.
+    # Returns our reward, None when the deadline came first
+    def rollout(self, current_turn, undo_records):
+        engine = self.engine
+        search_state = self.search_state
+        rounds = 0
+
+        while (True):
+            reward = terminalReward(engine, search_state, self.main_snake_id, self.has_opponents)
+            if (reward is not None):
+                return reward
+            if (MCTS_ROLLOUT_ROUNDS > 0 and rounds >= MCTS_ROLLOUT_ROUNDS):
+                return positionReward(engine, search_state, self.main_snake_id, current_turn, self.root_value)
+            if (rounds >= MCTS_MAX_ROLLOUT_ROUNDS):
+                return 0.5
+            if (self.context.timeUp()):
+                return None
+
+            for snake_id in roundSnakes(engine, search_state, self.main_snake_id):
+                if (engine.isGameOver(search_state, snake_id)):
+                    continue
+                move = self.rng.choice(snakeMoves(engine, search_state, snake_id, self.main_snake_id))
+                undo_record = engine.applyMove(search_state, snake_id, move)
+                if (undo_record is not None):
+                    undo_records.append(undo_record)
+                    current_turn += 1
+            rounds += 1
+
+    # Statistics of our main snake's moves at the root: {move: [visits, reward sum]}
+    def rootStats(self):
+        return self.root.move_stats.get(self.main_snake_id, {})
+
+
+# Worker side: search a tree of the request until stop_time_ms, its root statistics and iterations are reported
+# under search_id as (worker, root statistics, iterations) every MCTS_PUBLISH_MS.
+# Returns our main snake's root statistics and the number of iterations
+def searchTree(game_state, engine_name, stop_time_ms, seed, worker=0, search_id=None):
+    engine = minimax.getEngine(engine_name)
+    main_snake_id = game_state["you"]["id"]
+    search_state = engine.createGameState(game_state, main_snake_id)
+    tree = MonteCarloTree(engine, search_state, main_snake_id, game_state["turn"], seed)
+
+    def publish(curr_tree):
+        parallel.reportProgress(search_id, worker, curr_tree.rootStats(), curr_tree.iterations)
+
+    tree.search(minimax.SearchContext(engine, stop_time_ms, None, None), publish)
+    return tree.rootStats(), tree.iterations
+
+
+# Most visited root move, the better mean reward on a tie
+def bestRootMove(root_stats):
+    best_move = None
+    best_key = None
+    for move, (visits, reward_sum) in root_stats.items():
+        key = (visits, reward_sum / visits if visits else 0.0)
+        if (best_move is None or key > best_key):
+            best_move, best_key = move, key
+    return best_move
+
+
+# Root statistics of the trees added up and their iterations, from (root statistics, iterations) of every tree
+def mergeTrees(results):
+    root_stats = {}
+    iterations = 0
+    for tree_stats, tree_iterations in results:
+        iterations += tree_iterations
+        for move, (visits, reward_sum) in tree_stats.items():
+            stats = root_stats.setdefault(move, [0, 0.0])
+            stats[0] += visits
+            stats[1] += reward_sum
+    return root_stats, iterations
+
+
+# Publish the most visited root move so far as the game's answer, the watchdog answers with it
+def publishRootMove(memory, current_time_ms, root_stats):
+    best_move = bestRootMove(root_stats)
+    if (best_move is None):
+        return
+    if (memory.first_answer_ms is None):
+        memory.first_answer_ms = time.time()*1000 - current_time_ms
+    memory.answer_move = best_move
+
+
+# Same answer as miniMax_value, found by Monte Carlo tree search. With the worker pool of parallel.py
+# started, every worker grows its own tree until the deadline and the root statistics are added up
+def monteCarlo_value(game_state, safe_moves, current_time_ms, engine_name=None):
+    memory = game_store.get(game_state)
+    with memory.lock:
+        return gameMonteCarlo_value(game_state, current_time_ms, engine_name or minimax.SEARCH_ENGINE, memory)
+
+
+# Search of one turn. The search context is the game's, the watchdog stops it
+def gameMonteCarlo_value(game_state, current_time_ms, engine_name, memory):
+    engine = minimax.getEngine(engine_name)
+    # The tree answers at any time. It searches until RESULT_MARGIN_MS before the hard deadline, which leaves the
+    # time to merge the trees and answer
+    _, stop_time_ms = searchDeadlines(game_state, current_time_ms, memory)
+    context = minimax.SearchContext(engine, stop_time_ms - parallel.RESULT_MARGIN_MS, None, None)
+    memory.search_context = context
+
+    if (parallel.search_pool is None):
+        main_snake_id = game_state["you"]["id"]
+        tree = MonteCarloTree(engine, engine.createGameState(game_state, main_snake_id), main_snake_id,
+                              game_state["turn"], game_state["turn"])
+        tree.search(context, lambda curr_tree: publishRootMove(memory, current_time_ms, curr_tree.rootStats()))
+        results = [(tree.rootStats(), tree.iterations)]
+    else:
+        results = poolTrees(game_state, engine_name, context, memory, current_time_ms)
+
+    root_stats, iterations = mergeTrees(results)
+    best_move = bestRootMove(root_stats)
+    if (best_move is None):
+        print("No good move found!")
+        return None
+
+    visits, reward_sum = root_stats[best_move]
+    print("MCTS reward: " + str(round(reward_sum / max(visits, 1), 3)) + ", Best move:" + best_move
+          + " iterations: " + str(iterations) + " trees: " + str(len(results))
+          + " visits: " + str({move: stats[0] for move, stats in root_stats.items()}))
+    publishRootMove(memory, current_time_ms, root_stats)
+    return best_move
+
+
+# Grow a tree in every worker until the deadline of the context, the statistics the workers report are merged
+# and published as they come in. The parent waits until the same deadline. Returns (root statistics, iterations)
+# of every tree, the last reported ones of the workers that did not return in time
+def poolTrees(game_state, engine_name, context, memory, current_time_ms):
+    worker_count = parallel.search_worker_count
+    results = [({}, 0) for _ in range(worker_count)]
+    search_id, inbox = parallel.openInbox()
+    try:
+        pending = [parallel.search_pool.apply_async(searchTree, (game_state, engine_name,
+                                                                 context.stop_time_ms,
+                                                                 game_state["turn"] * worker_count + worker,
+                                                                 worker, search_id))
+                   for worker in range(worker_count)]
+
+        # Late workers are ignored, they stop on their own
+        while (not context.timeUp() and not all(result.ready() for result in pending)):
+            try:
+                worker, tree_stats, tree_iterations = inbox.get(
+                    timeout=min(max(context.stop_time_ms - time.time()*1000, 0) / 1000, parallel.PROGRESS_POLL_S))
+            except queue.Empty:
+                continue
+            if (tree_iterations > results[worker][1]):
+                results[worker] = (tree_stats, tree_iterations)
+                publishRootMove(memory, current_time_ms, mergeTrees(results)[0])
+    finally:
+        parallel.closeInbox(search_id)
+
+    for worker, result in enumerate(pending):
+        if (result.ready() and result.successful()):
+            results[worker] = result.get()
+    return [result for result in results if result[1] > 0]
@@ -1,13 +1,116 @@
 import copy
+import math
+import os
+import threading
 import time
-from collections import deque
-
-# Generates a copy of current game board and another board that tracks snake head positions
+from collections import deque, namedtuple
+
+from boardmodel import boardModel
+from deadline import searchDeadlines
+from evalcache import EVALUATION_CACHE_SIZE, EvaluationCache
+from gamestore import game_store
+from ordering import MOVES, MoveOrdering, greedyMove
+from transposition import (DEVIATED_KEY, EXACT, LOWER, UPPER, TRANSPOSITION_TABLE_MB, TranspositionTable,
+                           moveHashDelta, snakeHash, snakeSlots, zobristKeys)
+
+# A game state engine: the rules and evaluation on top of one state representation.
+# The search only talks to the engine so it can switch between representations
+Engine = namedtuple("Engine", ["name", "createGameState", "applyMove", "undoMove", "makeMove",
+                               "evaluatePoint", "evaluatePosition", "isGameOver", "nextSnakeId", "positionKey",
+                               "snakeHead", "snakeHeadInfo", "legalMoves"])
+
+# Engine used by miniMax_value when none is given, "grid" or "bitboard"
+SEARCH_ENGINE = os.environ.get("SEARCH_ENGINE", "bitboard")
+
+# Iterative deepening stops at this depth even if there is time left
+MAX_SEARCH_DEPTH = 64
+
+# Only search moves that do not kill the moving snake alone (see legalMoves)
+PRUNE_SUICIDAL_MOVES = True
+
+# Opponents too far from our main snake to get near it within the remaining depth only play their
+# greedy move instead of branching (see isDistantSnake and greedyMove)
+PRUNE_DISTANT_OPPONENTS = True
+
+# Head distance to our main snake that still counts as near once the remaining moves are taken off:
+# heads next to each other are scored by the head collision term
+INTERACTION_MARGIN = 1
+
+# How the opponents are searched: "paranoid" gives every opponent its own layer of the tree, "best_reply" lets
+# at most one opponent of a round deviate from its greedy move, the round counts as one ply (see miniMax)
+SEARCH_MODE = os.environ.get("SEARCH_MODE", "paranoid")
+
+# Best-reply search is only used by games that start with at least this many snakes,
+# with one opponent it searches the same tree as paranoid search
+BEST_REPLY_MIN_SNAKES = int(os.environ.get("BEST_REPLY_MIN_SNAKES", "3"))
+
+# Space term of evaluatePoint: "flood" counts every cell the snake can reach (floodFill),
+# "voronoi" only the cells it reaches before every other snake (voronoi)
+EVALUATION_MODE = os.environ.get("EVALUATION_MODE", "flood")
+
+# Weight of the turn term of evaluatePoint, the only term that depends on the path to the position
+MORE_TURN_WEIGHT = 20
+
+# Half width of the root's aspiration window around the value of the last depth that ended with the same snake
+ASPIRATION_WINDOW = 100
+
+
+# Everything a search carries besides the position: engine, deadline, tables, configuration and statistics.
+# Every request searches with its own context, so the searches of several games can run at the same time
+class SearchContext:
+    def __init__(self, engine, stop_time_ms, transposition_table, move_ordering, evaluation_cache=None):
+        self.engine = engine
+        self.stop_time_ms = stop_time_ms
+        # No new depth of iterative deepening is started after it
+        self.soft_stop_time_ms = stop_time_ms
+        # Positions searched during the turn, None when disabled
+        self.transposition_table = transposition_table
+        # Values of evaluated positions, None when disabled
+        self.evaluation_cache = evaluation_cache
+        # Killer moves and history table
+        self.move_ordering = move_ordering
+        self.prune_suicidal_moves = PRUNE_SUICIDAL_MOVES
+        self.prune_distant_opponents = PRUNE_DISTANT_OPPONENTS
+        # Best-reply search instead of paranoid search, see searchMode
+        self.best_reply = False
+        self.max_depth = MAX_SEARCH_DEPTH
+        self.nodes = 0
+        self.completed_depth = 0
+        # Null window searches that had to be searched again with the full window
+        self.researches = 0
+        # Root searches whose value fell outside of the aspiration window
+        self.aspiration_fails = 0
+        # Opponent nodes searched with one move only, the opponent was too far away
+        self.distant_nodes = 0
+
+    def timeUp(self):
+        return time.time()*1000 >= self.stop_time_ms
+
+    def softTimeUp(self):
+        return time.time()*1000 >= self.soft_stop_time_ms
+
+    # Stop the search at its next time check
+    def stop(self):
+        self.stop_time_ms = float("-inf")
+
+    def stats(self):
+        stats = {"nodes": self.nodes, "completed_depth": self.completed_depth,
+                 "search_mode": "best_reply" if self.best_reply else "paranoid",
+                 "researches": self.researches, "aspiration_fails": self.aspiration_fails,
+                 "distant_nodes": self.distant_nodes,
+                 "move_ordering": self.move_ordering.stats()}
+        if (self.transposition_table is not None):
+            stats["transposition_table"] = self.transposition_table.stats()
+        if (self.evaluation_cache is not None):
+            stats["evaluation_cache"] = self.evaluation_cache.stats()
+        return stats
+
+
+# Generates a copy of current game board and another board that tracks snake head positions,
+# from the board model of the request
 def createBoardState(game_state):
-    board_width = game_state["board"]["width"]
-    board_height = game_state["board"]["height"]
-    foods = game_state["board"]["food"]
-    all_snake = game_state["board"]["snakes"]
+    model = boardModel(game_state)
+    board_width = model.width
     # 0 is empty space
     # 1 is food
     # 2 is snake head
@@ -15,27 +118,8 @@ def createBoardState(game_state):
     # id = corresponding snake body
     # snake head is represented in head_board as the corresponding snake id
 
-    board_copy = [[0 for _ in range(board_width)] for _ in range(board_height)]
-    head_board = [["0" for _ in range(board_width)]
-                  for _ in range(board_height)]
-
-    for food in foods:
-        food_x = food["x"]
-        food_y = board_height - 1 - food["y"]
-        board_copy[food_y][food_x] = 1
-
-    for snake in all_snake:
-        snake_id = snake["id"]
-        snake_head = snake["head"]
-
-        for body in snake["body"]:
-            body_x = body["x"]
-            body_y = board_height - 1 - body["y"]
-            if (body == snake_head):
-                board_copy[body_y][body_x] = 2
-                head_board[body_y][body_x] = snake_id
-            else:
-                board_copy[body_y][body_x] = snake_id
+    board_copy = [model.cells[row * board_width:(row + 1) * board_width] for row in range(model.height)]
+    head_board = [model.head_cells[row * board_width:(row + 1) * board_width] for row in range(model.height)]
 
     board_state = {
         "state_board": board_copy,
@@ -45,35 +129,29 @@ def createBoardState(game_state):
     return board_state
 
 
-# Create an array of snakes, each snake is a dict containing id, head and body coord
+# Create an array of snakes, each snake is a dict containing id, head and body coord.
+# The body is a deque from head to tail, so moving pushes and pops at its ends
 def snakeState(game_state):
-    snakes = game_state["board"]["snakes"]
-    board_height = game_state["board"]["height"]
+    model = boardModel(game_state)
+    board_width = model.width
 
     snake_state = []
-    for snake in snakes:
-        snake_id = snake["id"]
-        health = snake["health"]
-        snake_head = {"x": snake["head"]["x"],
-                      "y": board_height - 1 - snake["head"]["y"]}
-        snake_body = []
-        for body in snake["body"]:
-            body_x = body["x"]
-            body_y = body["y"]
-            snake_body.append({"x": body_x, "y": board_height - 1 - body_y})
-
+    for snake in model.snakes:
+        head_cell = snake.body[0]
         snake_state.append({
-            "id": snake_id,
-            "head": snake_head,
-            "body": snake_body,
-            "health": health
+            "id": snake.id,
+            "head": {"x": head_cell % board_width, "y": head_cell // board_width},
+            "body": deque({"x": body_cell % board_width, "y": body_cell // board_width} for body_cell in snake.body),
+            "health": snake.health,
+            "alive": True
         })
 
     return snake_state
 
 
 # Create an entire copy of the current game state, including current board, snakes and curr snake id
-def createGameState(game_state, curr_snake_id):
+# game_slots are the hash slots of the snakes for the whole game, see snakeSlots
+def createGameState(game_state, curr_snake_id, game_slots=None):
     game_state_copy = {}
 
     game_state_copy["turn"] = game_state["turn"]
@@ -81,139 +159,154 @@ def createGameState(game_state, curr_snake_id):
     game_state_copy["snakes"] = snakeState(game_state)
     game_state_copy["curr_snake_id"] = curr_snake_id
 
-    return game_state_copy
+    # Index of every snake in the snake list, snakes keep their index for the whole search
+    game_state_copy["snake_index"] = {snake["id"]: index for index, snake in enumerate(game_state_copy["snakes"])}
 
+    # Zobrist hash of the position, updated incrementally by applyMove
+    board_width = game_state["board"]["width"]
+    slots, slot_count = snakeSlots(game_state_copy["snakes"], game_slots)
+    keys = zobristKeys(board_width, game_state["board"]["height"], slot_count)
+    game_state_copy["zobrist_keys"] = keys
+    game_state_copy["slots"] = slots
+    position_hash = 0
 
-# Update the current snakes's head coordinates
-def updateSnakeHead(new_snake_state, curr_snake_index, x_coord, y_coord):
-    new_snake_state[curr_snake_index]["head"]["x"] = x_coord
-    new_snake_state[curr_snake_index]["head"]["y"] = y_coord
-    new_snake_state[curr_snake_index]["body"][0]["x"] = x_coord
-    new_snake_state[curr_snake_index]["body"][0]["y"] = y_coord
+    for food_y, row in enumerate(game_state_copy["board"]["state_board"]):
+        for food_x, cell in enumerate(row):
+            if (cell == 1):
+                position_hash ^= keys.food[food_y * board_width + food_x]
 
+    for snake in game_state_copy["snakes"]:
+        body_cells = [body["y"] * board_width + body["x"] for body in snake["body"]]
+        snake["slot"] = slots[snake["id"]]
+        snake["hash"] = snakeHash(keys, snake["slot"], body_cells, snake["health"])
+        position_hash ^= snake["hash"]
 
-# Update the current snake's body part coordinates
-def updateSnakeBody(new_snake_state, curr_snake_index, body_index, x_coord, y_coord):
-    new_snake_state[curr_snake_index]["body"][body_index]["x"] = x_coord
-    new_snake_state[curr_snake_index]["body"][body_index]["y"] = y_coord
+    game_state_copy["hash"] = position_hash
 
+    return game_state_copy
 
-# Update snake's health, -1 health for every turn or 0 if snake dies
-def updateSnakeHealth(new_snake_state, curr_snake_index, isAlive, hasAte):
+
+# Update the current snake's head coordinates
+def updateSnakeHead(snake, x_coord, y_coord):
+    snake["head"]["x"] = x_coord
+    snake["head"]["y"] = y_coord
+
+
+# Update snake's health, -1 health for every turn or 100 if the snake has eaten, returns the new health
+def updateSnakeHealth(snake, hasAte):
     if (hasAte):
-        new_snake_state[curr_snake_index]["health"] = 100
-    elif (isAlive):
-        new_snake_state[curr_snake_index]["health"] -= 1
+        snake["health"] = 100
     else:
-        new_snake_state[curr_snake_index]["health"] = 0
+        snake["health"] -= 1
 
-    return new_snake_state[curr_snake_index]["health"]
+    return snake["health"]
 
 
-# Update the snake's movement location in the new board and head state, also updates snake state's coords
-def moveForward(new_board_state, new_head_state, new_snake_state, curr_snake_id, curr_snake_index, curr_snake_body, head_x, head_y, is_tail):
-    prev_x, prev_y = None, None
+# Move the snake forward in place by pushing the new head and popping the tail, only the new head,
+# old head and vacated tail cells are touched. Returns the record needed to move the snake back
+def moveForward(board_state, head_state, snake, snake_id, head_x, head_y):
+    body = snake["body"]
+    old_x = snake["head"]["x"]
+    old_y = snake["head"]["y"]
 
-    body_index = 0
-    for body in curr_snake_body:
-        curr_x = body["x"]
-        curr_y = body["y"]
+    # The popped tail segment is reused as the new head segment
+    segment = body.pop()
+    tail_x = segment["x"]
+    tail_y = segment["y"]
 
-        if (not is_tail):
-            new_board_state[curr_y][curr_x] = 0
+    # Tail stays occupied when another segment is stacked on it (snake has just eaten)
+    tail_vacated = not body or body[-1]["x"] != tail_x or body[-1]["y"] != tail_y
+    if (tail_vacated):
+        board_state[tail_y][tail_x] = 0
 
-        if (body_index == 0):
-            new_board_state[head_y][head_x] = 2
-            new_head_state[head_y][head_x] = curr_snake_id
-            updateSnakeHead(new_snake_state, curr_snake_index, head_x, head_y)
-        else:
-            if (new_head_state[prev_y][prev_x] == curr_snake_id):
-                new_head_state[prev_y][prev_x] = "0"
-            if (body_index > 0):
-                updateSnakeBody(new_snake_state, curr_snake_index,
-                                body_index, prev_x, prev_y)
-            new_board_state[prev_y][prev_x] = curr_snake_id
+    if (body):
+        board_state[old_y][old_x] = snake_id
+    head_state[old_y][old_x] = "0"
 
-        prev_x = curr_x
-        prev_y = curr_y
-        body_index += 1
+    move_record = (head_x, head_y, old_x, old_y, tail_x, tail_y,
+                   board_state[head_y][head_x], head_state[head_y][head_x], tail_vacated)
 
+    board_state[head_y][head_x] = 2
+    head_state[head_y][head_x] = snake_id
 
-# Update snake state from snake eating food, duplicate tail and add as new tail
-def snakeStateFoodGrow(new_snake_state, curr_snake_index):
-    last_body = new_snake_state[curr_snake_index]["body"][-1]
-    last_x, last_y = last_body["x"], last_body["y"]
-    new_snake_state[curr_snake_index]["body"].append(
-        {"x": last_x, "y": last_y})
+    segment["x"] = head_x
+    segment["y"] = head_y
+    body.appendleft(segment)
+    updateSnakeHead(snake, head_x, head_y)
 
+    return move_record
 
-# Replace body part value to 0, removing the killed snake from game board and head board
-def removeKilledSnakeBody(new_board_state, new_head_state, new_snake_state, snake_index):
-    snake_body = new_snake_state[snake_index]["body"]
-    snake_head = new_snake_state[snake_index]["head"]
 
-    for body in snake_body:
-        body_x = body["x"]
-        body_y = body["y"]
+# Take back a moveForward, restoring the body and the touched cells
+def undoMoveForward(board_state, head_state, snake, snake_id, move_record):
+    head_x, head_y, old_x, old_y, tail_x, tail_y, destination_cell, destination_head, _ = move_record
+    body = snake["body"]
 
-        if (body == snake_head):
-            new_head_state[body_y][body_x] = 0
-        new_board_state[body_y][body_x] = 0
+    segment = body.popleft()
+    segment["x"] = tail_x
+    segment["y"] = tail_y
+    body.append(segment)
+    updateSnakeHead(snake, old_x, old_y)
 
+    board_state[head_y][head_x] = destination_cell
+    head_state[head_y][head_x] = destination_head
+    board_state[tail_y][tail_x] = snake_id
+    board_state[old_y][old_x] = 2
+    head_state[old_y][old_x] = snake_id
 
-# Remove killed snake from the snake state list and board
-def removeKilledSnake(new_board_state, new_head_state, new_snake_state, snake_index):
-    removeKilledSnakeBody(new_board_state, new_head_state,
-                          new_snake_state, snake_index)
-    new_snake_state.pop(snake_index)
 
+# Update snake state from snake eating food, duplicate tail and add as new tail
+def snakeStateFoodGrow(snake):
+    last_body = snake["body"][-1]
+    snake["body"].append({"x": last_body["x"], "y": last_body["y"]})
 
-# Find snake corresponding to the given current ID and return its info
-def findCurrentSnake(new_snake_state, curr_snake_id):
-    curr_snake_index = 0
-    curr_snake_length = 0
-    curr_snake_body = None
-    curr_snake_health = 0
-    curr_snake_tail = None
 
-    for i in range(len(new_snake_state)):
-        curr_snake = new_snake_state[i]
-        if (curr_snake["id"] == curr_snake_id):
-            curr_snake_index = i
-            curr_snake_body = curr_snake["body"]
-            curr_snake_length = len(curr_snake_body)
-            curr_snake_health = curr_snake["health"]
-            curr_snake_tail = curr_snake_body[-1]
+# Replace body part value to 0, removing the killed snake from game board and head board
+def removeKilledSnakeBody(new_board_state, new_head_state, snake):
+    for body in snake["body"]:
+        new_board_state[body["y"]][body["x"]] = 0
+    new_head_state[snake["head"]["y"]][snake["head"]["x"]] = "0"
 
-    return curr_snake_index, curr_snake_length, curr_snake_body, curr_snake_health, curr_snake_tail
 
+# Mark killed snake as dead and remove it from the board, it keeps its place in the snake state list.
+# Returns the snake, needed to bring it back
+def removeKilledSnake(new_board_state, new_head_state, snake):
+    snake["alive"] = False
+    removeKilledSnakeBody(new_board_state, new_head_state, snake)
+    return snake
 
-# Creates a deep copy of current game state to create a new game state
-def createNewGameState(game_state, curr_snake_id):
-    new_game_state = copy.deepcopy(game_state)
-    new_board_state = new_game_state["board"]["state_board"]
-    new_head_state = new_game_state["board"]["head_board"]
-    new_snake_state = new_game_state["snakes"]
-    new_game_state["turn"] = game_state["turn"] + 1
-    new_game_state["curr_snake_id"] = curr_snake_id
 
-    return new_game_state, new_board_state, new_head_state, new_snake_state
+# Put a killed snake back on the board and mark it alive again
+def restoreKilledSnake(board_state, head_state, snake):
+    snake_id = snake["id"]
+    snake["alive"] = True
 
+    for body in snake["body"]:
+        board_state[body["y"]][body["x"]] = snake_id
+    head = snake["head"]
+    board_state[head["y"]][head["x"]] = 2
+    head_state[head["y"]][head["x"]] = snake_id
 
-# Find current snake's head coordinates
-def findHeadCoord(width, height, new_head_state, curr_snake_id):
-    head_x, head_y = None, None
 
-    for y in range(height):
-        for x in range(width):
-            if (new_head_state[y][x] == curr_snake_id):
-                head_x = x
-                head_y = y
-                break
-        if (head_x != None):
-            break
+# Find the alive snake with the given id, returns None if there is none
+def findSnake(game_state, snake_id):
+    snake_index = game_state["snake_index"].get(snake_id)
+    if (snake_index is None):
+        return None
+
+    snake = game_state["snakes"][snake_index]
+    return snake if snake["alive"] else None
+
+
+# Find snake corresponding to the given current ID and return its info
+def findCurrentSnake(game_state, curr_snake_id):
+    curr_snake = findSnake(game_state, curr_snake_id)
+
+    if (curr_snake is None):
+        return None, 0, None, 0, None
 
-    return head_x, head_y
+    curr_snake_body = curr_snake["body"]
+    return curr_snake, len(curr_snake_body), curr_snake_body, curr_snake["health"], curr_snake_body[-1]
 
 
 # Update head coordinate to its future head coordinate after move
@@ -230,226 +323,410 @@ def updateHeadCoord(x, y, move):
     return x, y
 
 
-# Creates a new version of game state with the move and the correspondent snake
-def makeMove(game_state, curr_snake_id, move):
-    board_width = len(game_state["board"]["state_board"][0])
-    board_height = len(game_state["board"]["state_board"])
+# Apply the move of the correspondent snake to the game state in place and update the position hash.
+# Returns the undo record to give to undoMove, or None if the snake does not exist
+def applyMove(game_state, curr_snake_id, move):
+    prev_hash = game_state["hash"]
+    undo_record = applyMoveRules(game_state, curr_snake_id, move)
 
-    # new game state to update, change the id to current snake
-    new_game_state, new_board_state, new_head_state, new_snake_state = createNewGameState(
-        game_state, curr_snake_id)
+    if (undo_record is None):
+        return None
 
-    # Our snake's head coordinates
-    head_x, head_y = findHeadCoord(
-        board_width, board_height, new_head_state, curr_snake_id)
+    curr_snake, _, prev_health, killed_before, move_record, has_grown, killed_after = undo_record
+    undo_record.append(prev_hash)
+    undo_record.append(curr_snake["hash"])
+
+    if (killed_before is not None):
+        for snake in killed_before:
+            game_state["hash"] ^= snake["hash"]
+
+    if (move_record is not None):
+        head_x, head_y, old_x, old_y, tail_x, tail_y, destination_cell, _, tail_vacated = move_record
+        keys = game_state["zobrist_keys"]
+        board_width = len(game_state["board"]["state_board"][0])
+        curr_length = len(curr_snake["body"])
+        head_cell = head_y * board_width + head_x
+
+        old_length = curr_length - 1 if has_grown else curr_length
+        tail_cell = tail_y * board_width + tail_x
+        body = curr_snake["body"]
+        old_neck = body[2]["y"] * board_width + body[2]["x"] if old_length >= 3 else (
+            tail_cell if old_length == 2 else None)
+        delta = moveHashDelta(keys, curr_snake["slot"], old_y * board_width + old_x, head_cell,
+                              tail_cell, tail_vacated, old_length, curr_length,
+                              prev_health, curr_snake["health"],
+                              old_neck, body[-1]["y"] * board_width + body[-1]["x"])
+        curr_snake["hash"] ^= delta
+        game_state["hash"] ^= delta
+
+        if (destination_cell == 1):
+            game_state["hash"] ^= keys.food[head_cell]
+
+    if (killed_after is not None):
+        game_state["hash"] ^= curr_snake["hash"]
+
+    return undo_record
+
+
+# Apply the rules of the move of the correspondent snake to the game state in place.
+# Returns the undo record, or None if the snake does not exist
+def applyMoveRules(game_state, curr_snake_id, move):
+    board_state = game_state["board"]["state_board"]
+    head_state = game_state["board"]["head_board"]
+    board_width = len(board_state[0])
+    board_height = len(board_state)
+
+    # Acquire current snake info
+    curr_snake, curr_snake_length, curr_snake_body, curr_snake_health, curr_snake_tail = findCurrentSnake(
+        game_state, curr_snake_id)
 
     # Current snake does not exist
-    if (head_x is None or head_y is None):
+    if (curr_snake is None):
         return None
 
-    # Update head coordinate value to destination after move is applied
-    head_x, head_y = updateHeadCoord(head_x, head_y, move)
-
-    # Acquire current snake info
-    curr_snake_index, curr_snake_length, curr_snake_body, curr_snake_health, curr_snake_tail = findCurrentSnake(
-        new_snake_state, curr_snake_id)
+    # Undo record: snake, previous snake to move, previous health, snakes killed before moving,
+    # move record, whether it grew and the snake killed after moving (starvation)
+    undo_record = [curr_snake, game_state["curr_snake_id"], curr_snake_health, None, None, False, None]
+    game_state["turn"] += 1
+    game_state["curr_snake_id"] = curr_snake_id
 
-    # print(curr_snake_index)
-    # print(new_snake_state)
+    # Update head coordinate value to destination after move is applied
+    head_x, head_y = updateHeadCoord(curr_snake["head"]["x"], curr_snake["head"]["y"], move)
 
     # Check if snake destination hits border
     if not (0 <= head_x < board_width and 0 <= head_y < board_height):
-        removeKilledSnake(new_board_state, new_head_state,
-                          new_snake_state, curr_snake_index)
-        # updateSnakeHealth(new_snake_state, curr_snake_index, False, False)
-        return new_game_state
+        undo_record[3] = [removeKilledSnake(board_state, head_state, curr_snake)]
+        return undo_record
 
-    destination_cell = new_board_state[head_y][head_x]
-    destination_cell_head = new_head_state[head_y][head_x]
+    destination_cell = board_state[head_y][head_x]
 
     # Checks if snake runs into another snake or edge boundary
     if (destination_cell not in [0, 1]):
 
         # Check if collision is with the head of a snake
-        if (destination_cell == 2 and destination_cell_head != 0):
-            destination_snake_length = 0
-            destination_snake_body = None
-            destination_snake_index = 0
-
-            # Find the snake the current snake is about to collide with
-            for snake in new_snake_state:
-                if (snake["id"] == destination_cell_head):
-                    destination_snake_body = snake["body"]
-                    destination_snake_length = len(destination_snake_body)
-                    break
-
-                destination_snake_index += 1
+        if (destination_cell == 2):
+            destination_snake, destination_snake_length, _, _, _ = findCurrentSnake(
+                game_state, head_state[head_y][head_x])
 
             # Our size is bigger and we kill the another snake
             if (destination_snake_length < curr_snake_length):
 
                 # Remove destination snake from game board and snake state
-                removeKilledSnake(new_board_state, new_head_state,
-                                  new_snake_state, destination_snake_index)
-
-                # Index might have changed when snake is removed
-                curr_snake_index, _, _, _, _ = findCurrentSnake(new_snake_state, curr_snake_id)
+                undo_record[3] = [removeKilledSnake(board_state, head_state, destination_snake)]
 
-                # Snake moves forward and updates all coords in new game state
-                moveForward(new_board_state, new_head_state, new_snake_state,
-                            curr_snake_id, curr_snake_index, curr_snake_body, head_x, head_y, False)
+                # Snake moves forward and updates the touched cells in place
+                undo_record[4] = moveForward(board_state, head_state, curr_snake,
+                                             curr_snake_id, head_x, head_y)
 
-                curr_health = updateSnakeHealth(
-                    new_snake_state, curr_snake_index, True, False)
+                curr_health = updateSnakeHealth(curr_snake, False)
 
                 # check if our snake ran out of health
                 if (curr_health <= 0):
-                    removeKilledSnake(
-                        new_board_state, new_head_state, new_snake_state, curr_snake_index)
+                    undo_record[6] = removeKilledSnake(board_state, head_state, curr_snake)
 
             # Our snake is smaller or same size
             else:
-                removeKilledSnake(new_board_state, new_head_state,
-                                  new_snake_state, curr_snake_index)
-
-                # Index might have changed when snake is removed
-                destination_snake_index, _, _, _, _ = findCurrentSnake(new_snake_state, destination_snake_index)
+                killed = [removeKilledSnake(board_state, head_state, curr_snake)]
 
-                # Same size case
+                # Same size case, both snakes die
                 if (destination_snake_length == curr_snake_length):
-                    removeKilledSnake(
-                        new_board_state, new_head_state, new_snake_state, destination_snake_index)
+                    killed.append(removeKilledSnake(board_state, head_state, destination_snake))
 
-                # updateSnakeHealth(
-                #     new_snake_state, curr_snake_index, False, False)
+                undo_record[3] = killed
 
-        else:
-            if (destination_cell == curr_snake_id):
-                if (head_x == curr_snake_tail["x"] and head_y == curr_snake_tail["y"]):
-                    # Snake moves forward and updates all coords in new game state
-                    moveForward(new_board_state, new_head_state, new_snake_state,
-                                curr_snake_id, curr_snake_index, curr_snake_body, head_x, head_y, True)
-
-                    curr_health = updateSnakeHealth(
-                        new_snake_state, curr_snake_index, True, False)
-
-                    # check if our snake ran out of health
-                    if (curr_health <= 0):
-                        removeKilledSnake(
-                            new_board_state, new_head_state, new_snake_state, curr_snake_index)
-                else:
-                    removeKilledSnake(new_board_state, new_head_state,
-                                      new_snake_state, curr_snake_index)
+        # Snake chases its own tail, allowed only when the tail is not stacked (it will move away)
+        elif (destination_cell == curr_snake_id and head_x == curr_snake_tail["x"] and head_y == curr_snake_tail["y"]
+              and curr_snake_body[-2] != curr_snake_tail):
+            undo_record[4] = moveForward(board_state, head_state, curr_snake,
+                                         curr_snake_id, head_x, head_y)
 
-            else:
-                removeKilledSnake(new_board_state, new_head_state,
-                                  new_snake_state, curr_snake_index)
+            curr_health = updateSnakeHealth(curr_snake, False)
+
+            # check if our snake ran out of health
+            if (curr_health <= 0):
+                undo_record[6] = removeKilledSnake(board_state, head_state, curr_snake)
 
-        return new_game_state
+        else:
+            undo_record[3] = [removeKilledSnake(board_state, head_state, curr_snake)]
+
+        return undo_record
 
     # Snake move to a cell with food
     elif (destination_cell == 1):
 
         # Check if theres a competitor for the targeted food and if that comptetitor is bigger or equal size
-        directions = [[0, 1], [0, -1], [1, 0], [-1, 0]]
-        for dir in directions:
-            curr_x = head_x + dir[0]
-            curr_y = head_y + dir[1]
-            if (curr_x < 0 or curr_y < 0 or curr_x >= board_width or curr_y >= board_height or new_head_state[curr_y][curr_x] == curr_snake_id):
-                continue
-            if (new_head_state[curr_y][curr_x] not in [curr_snake_id, 0] and new_board_state[curr_y][curr_x] == 2):
-                _, other_snake_length, _, _, _ = findCurrentSnake(
-                    new_snake_state, new_head_state[curr_y][curr_x])
-                if (other_snake_length >= curr_snake_length):
-                    removeKilledSnake(new_board_state, new_head_state,
-                                      new_snake_state, curr_snake_index)
+        if (foodCompetitor(game_state, curr_snake_id, curr_snake_length, head_x, head_y)):
+            undo_record[3] = [removeKilledSnake(board_state, head_state, curr_snake)]
 
-                    return new_game_state
+            return undo_record
 
-        # Snake moves forward and updates all coords in new game state
-        moveForward(new_board_state, new_head_state, new_snake_state,
-                    curr_snake_id, curr_snake_index, curr_snake_body, head_x, head_y, False)
+        # Snake moves forward and updates the touched cells in place
+        undo_record[4] = moveForward(board_state, head_state, curr_snake,
+                                     curr_snake_id, head_x, head_y)
 
-        updateSnakeHealth(new_snake_state, curr_snake_index, True, True)
+        updateSnakeHealth(curr_snake, True)
 
         # add a new body part
-        snakeStateFoodGrow(new_snake_state, curr_snake_index)
+        snakeStateFoodGrow(curr_snake)
+        undo_record[5] = True
 
-        return new_game_state
+        return undo_record
 
     # Snake's regular movement to empty spaces
     else:
 
-        # Snake moves forward and updates all coords in new game state
-        moveForward(new_board_state, new_head_state, new_snake_state,
-                    curr_snake_id, curr_snake_index, curr_snake_body, head_x, head_y, False)
+        # Snake moves forward and updates the touched cells in place
+        undo_record[4] = moveForward(board_state, head_state, curr_snake,
+                                     curr_snake_id, head_x, head_y)
 
-        curr_health = updateSnakeHealth(
-            new_snake_state, curr_snake_index, True, False)
+        curr_health = updateSnakeHealth(curr_snake, False)
 
         # Check if snake ran out of health
         if (curr_health <= 0):
-            removeKilledSnake(new_board_state, new_head_state,
-                              new_snake_state, curr_snake_index)
+            undo_record[6] = removeKilledSnake(board_state, head_state, curr_snake)
 
-        return new_game_state
+        return undo_record
 
 
-# Calculate available space current game state snake has
-def floodFill(game_state, curr_snake_head, curr_snake_body, curr_snake_tail):
-    curr_snake_x = curr_snake_head["x"]
-    curr_snake_y = curr_snake_head["y"]
-    snake_tail_x = curr_snake_tail["x"]
-    snake_tail_y = curr_snake_tail["y"]
+# Revert a move applied with applyMove, restoring the game state exactly as it was
+def undoMove(game_state, undo_record):
+    (curr_snake, prev_snake_id, prev_health, killed_before, move_record, has_grown, killed_after,
+     prev_hash, prev_snake_hash) = undo_record
     board_state = game_state["board"]["state_board"]
-    board_width = len(board_state[0])
-    board_height = len(board_state)
-    visited = copy.deepcopy(board_state)
+    head_state = game_state["board"]["head_board"]
 
-    have_eaten = False
-    before_tail = curr_snake_body[-2]
+    if (killed_after is not None):
+        restoreKilledSnake(board_state, head_state, killed_after)
 
-    if (before_tail["x"] == snake_tail_x and before_tail["y"] == snake_tail_y):
-        have_eaten = True
+    if (move_record is not None):
+        if (has_grown):
+            curr_snake["body"].pop()
+        undoMoveForward(board_state, head_state, curr_snake, curr_snake["id"], move_record)
+        curr_snake["health"] = prev_health
 
-    for y in range(board_height):
-        for x in range(board_width):
-            if (board_state[y][x] in [0, 1] or (y == snake_tail_y and x == snake_tail_x) and not have_eaten):
-                visited[y][x] = False
-            else:
-                visited[y][x] = True
+    if (killed_before is not None):
+        for removed in reversed(killed_before):
+            restoreKilledSnake(board_state, head_state, removed)
 
-    visited[curr_snake_y][curr_snake_x] = False
-    space, is_tail_reachable = fill(visited, board_width, board_height,
-                                    curr_snake_x, curr_snake_y, snake_tail_x, snake_tail_y)
+    game_state["turn"] -= 1
+    game_state["curr_snake_id"] = prev_snake_id
+    game_state["hash"] = prev_hash
+    curr_snake["hash"] = prev_snake_hash
 
 
-    if (is_tail_reachable):
-        return space, True
+# Creates a new version of game state with the move and the correspondent snake
+def makeMove(game_state, curr_snake_id, move):
+    new_game_state = copy.deepcopy(game_state)
 
-    return space - 1, False
+    if (applyMove(new_game_state, curr_snake_id, move) is None):
+        return None
 
+    return new_game_state
 
-# Recursive function of floodfill
-def fill(visited, width, height, x, y, tail_x, tail_y):
-    queue = deque([(x, y)])
-    counter = 0
-    is_tail_reachable = False
 
-    while queue:
-        x, y = queue.popleft()
-        if (0 <= x < width and 0 <= y < height and not visited[y][x]):
-            if (x == tail_x and y == tail_y):
-                is_tail_reachable = True
+_neighbours_cache = {}
+
+
+# Indexes of the neighbour cells of every cell of a board size, cells are indexed y * width + x
+def cellNeighbours(board_width, board_height):
+    neighbours = _neighbours_cache.get((board_width, board_height))
+    if (neighbours is None):
+        neighbours = []
+        for y in range(board_height):
+            for x in range(board_width):
+                neighbours.append([next_y * board_width + next_x
+                                   for next_x, next_y in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+                                   if 0 <= next_x < board_width and 0 <= next_y < board_height])
+        _neighbours_cache[(board_width, board_height)] = neighbours
+
+    return neighbours
+
 
-            visited[y][x] = True
-            counter += 1
-            queue.extend([(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)])
+# Drop the neighbour table of a board size, see precompute.py
+def releaseNeighbours(board_width, board_height):
+    _neighbours_cache.pop((board_width, board_height), None)
 
-    return counter, is_tail_reachable
 
+# Visited marks and queue of a flood fill, reused from one fill to the next. A cell is visited when its mark
+# equals the generation of the current fill, so nothing has to be cleared between fills
+class FillBuffers:
+    def __init__(self, cell_count):
+        self.marks = [0] * cell_count
+        self.queue = []
+        self.generation = 0
 
-# Returns boolean depending on if snake state does not contain given id, snake is deleted when it is dead
+
+# Free fill buffers by cell count. Every request is searched in a thread of its own (see watchdog.py), so the
+# buffers are kept here rather than by thread, one for every fill that runs at the same time
+_fill_buffers = {}
+_fill_buffers_lock = threading.Lock()
+
+
+# Buffers for a fill of a board of cell_count cells, given back with releaseFillBuffers
+def takeFillBuffers(cell_count):
+    with _fill_buffers_lock:
+        free_buffers = _fill_buffers.get(cell_count)
+        buffers = free_buffers.pop() if free_buffers else None
+
+    if (buffers is None):
+        buffers = FillBuffers(cell_count)
+    buffers.generation += 1
+    buffers.queue.clear()
+    return buffers
+
+
+def releaseFillBuffers(buffers):
+    with _fill_buffers_lock:
+        _fill_buffers.setdefault(len(buffers.marks), []).append(buffers)
+
+
+# One breadth-first search from the head of the snake over the free cells (and its tail when it moves away).
+# Returns the reachable space, whether the tail is reachable, and the path distances to the closest food
+# and to the closest of the target heads (inf when none can be reached)
+def floodFill(game_state, curr_snake_head, curr_snake_body, curr_snake_tail, target_heads):
+    board_state = game_state["board"]["state_board"]
+    board_width = len(board_state[0])
+    board_height = len(board_state)
+    neighbours = cellNeighbours(board_width, board_height)
+    head_cell = curr_snake_head["y"] * board_width + curr_snake_head["x"]
+    tail_cell = curr_snake_tail["y"] * board_width + curr_snake_tail["x"]
+    target_cells = {y * board_width + x for x, y in target_heads}
+
+    # A snake that has just eaten keeps its tail in place
+    before_tail = curr_snake_body[-2]
+    have_eaten = before_tail["x"] == curr_snake_tail["x"] and before_tail["y"] == curr_snake_tail["y"]
+
+    buffers = takeFillBuffers(board_width * board_height)
+    marks = buffers.marks
+    queue = buffers.queue
+    generation = buffers.generation
+    marks[head_cell] = generation
+    queue.append(head_cell)
+
+    is_tail_reachable = head_cell == tail_cell
+    food_distance = float("inf")
+    target_distance = float("inf")
+    distance = -1
+    layer_end = 0
+    index = 0
+
+    while index < len(queue):
+        # A new layer starts, the queue holds every cell up to it
+        if (index == layer_end):
+            distance += 1
+            layer_end = len(queue)
+
+        cell = queue[index]
+        index += 1
+        if (food_distance == float("inf") and board_state[cell // board_width][cell % board_width] == 1):
+            food_distance = distance
+
+        for next_cell in neighbours[cell]:
+            if (marks[next_cell] != generation):
+                if (next_cell in target_cells and distance + 1 < target_distance):
+                    target_distance = distance + 1
+
+                board_cell = board_state[next_cell // board_width][next_cell % board_width]
+                if (board_cell == 0 or board_cell == 1 or (next_cell == tail_cell and not have_eaten)):
+                    marks[next_cell] = generation
+                    queue.append(next_cell)
+                    if (next_cell == tail_cell):
+                        is_tail_reachable = True
+
+    # Every queued cell is reachable
+    space = len(queue) if is_tail_reachable else len(queue) - 1
+    releaseFillBuffers(buffers)
+
+    return space, is_tail_reachable, food_distance, target_distance
+
+
+# One breadth-first search from all heads at once. Every free cell (or tail that moves away) belongs to the
+# snake that reaches it strictly first, cells reached first by several snakes at once are contested and
+# do not spread further. Returns the territory and contested cell counts by snake id, and for the current
+# snake whether it reaches its tail and the path distances to the closest food and target head it reaches
+def voronoi(game_state, curr_snake_id, target_heads):
+    board_state = game_state["board"]["state_board"]
+    board_width = len(board_state[0])
+    neighbours = cellNeighbours(board_width, len(board_state))
+    cells = [cell for row in board_state for cell in row]
+
+    alive_snakes = [snake for snake in game_state["snakes"] if snake["alive"]]
+    snake_ids = [snake["id"] for snake in alive_snakes]
+    territory = [0] * len(snake_ids)
+    contested = [0] * len(snake_ids)
+    curr_index = snake_ids.index(curr_snake_id)
+    target_cells = {y * board_width + x for x, y in target_heads}
+
+    # Index of the snake owning every reached cell (-2 when contested), -1 when not reached yet
+    owners = [-1] * len(cells)
+    reached_distance = [0] * len(cells)
+    contested_by = {}
+    moving_tails = set()
+    frontier = []
+
+    for index, snake in enumerate(alive_snakes):
+        head_cell = snake["head"]["y"] * board_width + snake["head"]["x"]
+        owners[head_cell] = index
+        frontier.append(head_cell)
+
+        tail = snake["body"][-1]
+        before_tail = snake["body"][-2]
+        if (before_tail["x"] != tail["x"] or before_tail["y"] != tail["y"]):
+            moving_tails.add(tail["y"] * board_width + tail["x"])
+        if (index == curr_index):
+            curr_tail = tail["y"] * board_width + tail["x"]
+
+    is_tail_reachable = False
+    food_distance = float("inf")
+    target_distance = float("inf")
+    distance = 0
+
+    while frontier:
+        distance += 1
+        layer = []
+        for cell in frontier:
+            index = owners[cell]
+            for next_cell in neighbours[cell]:
+                if (index == curr_index and next_cell in target_cells and distance < target_distance):
+                    target_distance = distance
+
+                owner = owners[next_cell]
+                if (owner == -1):
+                    board_cell = cells[next_cell]
+                    if (board_cell == 0 or board_cell == 1 or next_cell in moving_tails):
+                        owners[next_cell] = index
+                        reached_distance[next_cell] = distance
+                        layer.append(next_cell)
+
+                # Reached by another snake in the same layer
+                elif (owner != index and reached_distance[next_cell] == distance):
+                    reached_by = contested_by.setdefault(next_cell, {owner})
+                    reached_by.add(index)
+                    owners[next_cell] = -2
+
+        frontier = []
+        for cell in layer:
+            owner = owners[cell]
+            if (owner >= 0):
+                territory[owner] += 1
+                frontier.append(cell)
+                curr_reached = owner == curr_index
+            else:
+                for index in contested_by[cell]:
+                    contested[index] += 1
+                curr_reached = curr_index in contested_by[cell]
+
+            if (curr_reached):
+                if (cell == curr_tail):
+                    is_tail_reachable = True
+                if (food_distance == float("inf") and cells[cell] == 1):
+                    food_distance = distance
+
+    return (dict(zip(snake_ids, territory)), dict(zip(snake_ids, contested)),
+            is_tail_reachable, food_distance, target_distance)
+
+
+# Returns boolean depending on if the snake with the given id is dead or not in the snake state
 def isGameOver(game_state, snake_id):
     if (snake_id is None):
         return False
@@ -457,12 +734,7 @@ def isGameOver(game_state, snake_id):
     if (game_state is None):
         return True
 
-    snake_state = game_state["snakes"]
-
-    for snake in snake_state:
-        if (snake["id"] == snake_id):
-            return False
-    return True
+    return findSnake(game_state, snake_id) is None
 
 
 # Determines if given head coordinate is on edge
@@ -482,6 +754,9 @@ def snakeInfoLoop(game_state, curr_snake_id, board_width, board_height):
     biggest_size = 0
 
     for snake in game_state["snakes"]:
+        if (not snake["alive"]):
+            continue
+
         head_x = snake["head"]["x"]
         head_y = snake["head"]["y"]
 
@@ -501,20 +776,6 @@ def snakeInfoLoop(game_state, curr_snake_id, board_width, board_height):
     return curr_snake_head, curr_snake_body, curr_snake_tail, curr_snake_size, curr_snake_health, biggest_size, other_edge_snakes
 
 
-# Return the Manhattan distance of the closest food
-def closestFoodDistance(board_state, width, height, head_x, head_y):
-    closest_food = float("inf")
-
-    for y in range(height):
-        for x in range(width):
-            if (board_state[y][x] == 1):
-                food_distance = abs(
-                    head_x - x) + abs(head_y - y)
-                closest_food = min(food_distance, closest_food)
-
-    return closest_food
-
-
 # Determines if current head coordinates are on cells one before edge
 def isOnEdgeBorder(head_x, head_y, board_height, board_width):
     return (head_x == 1 or head_y == 1 or head_x == board_width - 2 or head_y == board_height - 2)
@@ -608,9 +869,9 @@ def edgeKillValue(board_state, board_width, board_height, head_x, head_y, other_
     return 0
 
 
-# Finds the closest smallest snake distance as well as returning head collision values
+# Finds the heads of the smaller snakes as well as returning head collision values
 def headCollisionInfo(game_state, head_x, head_y, curr_snake_size, curr_snake_id, main_snake_id):
-    smallest_snake_distance = float("inf")
+    smaller_heads = set()
     other_head_losing_weight = -10000
     main_head_losing_weight = float("inf")
 
@@ -623,14 +884,11 @@ def headCollisionInfo(game_state, head_x, head_y, curr_snake_size, curr_snake_id
         curr_head_x = snake["head"]["x"]
         curr_head_y = snake["head"]["y"]
 
-        if (snake["id"] == curr_snake_id):
+        if (snake["id"] == curr_snake_id or not snake["alive"]):
             continue
 
         if (len(snake["body"]) < curr_snake_size and (curr_snake_size - len(snake["body"])) >= 1):
-            curr_snake_distance = abs(
-                head_x - curr_head_x) + abs(head_y - curr_head_y)
-            smallest_snake_distance = min(
-                smallest_snake_distance, curr_snake_distance)
+            smaller_heads.add((curr_head_x, curr_head_y))
 
         # If current snake size is smaller or equal
         if ((abs(head_x - curr_head_x) + abs(head_y - curr_head_y) < 2)):
@@ -650,7 +908,7 @@ def headCollisionInfo(game_state, head_x, head_y, curr_snake_size, curr_snake_id
             # elif (curr_snake_size - len(snake["body"]) < 2):
             #     curr_head_losing_weight = other_head_equal_weight
 
-    return smallest_snake_distance, curr_head_losing_weight
+    return smaller_heads, curr_head_losing_weight
 
 
 # Prevent getting trapped by two snakes
@@ -659,8 +917,9 @@ def headCollisionInfo(game_state, head_x, head_y, curr_snake_size, curr_snake_id
 #   pass  
 
 
-# Calculate the value of the current game state for our main snake
-def evaluatePoint(game_state, depth, main_snake_id, curr_snake_id, current_turn):
+# Calculate the value of the current game state for our main snake, without the turn term. Returns the value and
+# the sign the turn term is added with (0 when it is not added), the value only depends on the position
+def evaluatePosition(game_state, main_snake_id, curr_snake_id):
     curr_weight = 0
 
     opponent_death_weight = float("inf")
@@ -670,7 +929,6 @@ def evaluatePoint(game_state, depth, main_snake_id, curr_snake_id, current_turn)
     head_kill_weight = 70
     food_weight = 25
     snake_size_weight = 20
-    more_turn_weight = 20
 
 
     danger_health_penalty = -120
@@ -679,17 +937,17 @@ def evaluatePoint(game_state, depth, main_snake_id, curr_snake_id, current_turn)
     # If the game state given somehow does not exist
     if (game_state is None):
         if (curr_snake_id == main_snake_id):
-            return float("-inf")
+            return float("-inf"), 0
         else:
-            return float("inf")
+            return float("inf"), 0
 
     # Check if our main snake has died
     if (isGameOver(game_state, main_snake_id)):
-        return float("-inf")
+        return float("-inf"), 0
 
     # Check if the current snake has died (not main snake)
     if (curr_snake_id != main_snake_id and isGameOver(game_state, curr_snake_id)):
-        return opponent_death_weight
+        return opponent_death_weight, 0
 
     board_state = game_state["board"]["state_board"]
     board_width = len(board_state[0])
@@ -711,24 +969,33 @@ def evaluatePoint(game_state, depth, main_snake_id, curr_snake_id, current_turn)
     # Add weight the bigger the snake is
     curr_weight += curr_snake_size * snake_size_weight
 
-    # FloodFill determines available space for current snake to move, add space weight
-    available_space, is_tail_reachable = floodFill(game_state, curr_snake_head, curr_snake_body, curr_snake_tail)
+    # Current snake head coordinates
+    head_x = curr_snake_head["x"]
+    head_y = curr_snake_head["y"]
+
+    smaller_heads, head_collision_value = headCollisionInfo(
+        game_state, head_x, head_y, curr_snake_size, curr_snake_id, main_snake_id)
+
+    # FloodFill determines available space for current snake to move and the path distances
+    # to the closest food and smaller snake, add space weight. Voronoi only counts the cells it gets
+    # to first, half of those it reaches at the same time as another snake
+    if (EVALUATION_MODE == "voronoi"):
+        territory, contested, is_tail_reachable, closest_food_distance, smallest_snake_distance = voronoi(
+            game_state, curr_snake_id, smaller_heads)
+        available_space = territory[curr_snake_id] + contested[curr_snake_id] / 2
+    else:
+        available_space, is_tail_reachable, closest_food_distance, smallest_snake_distance = floodFill(
+            game_state, curr_snake_head, curr_snake_body, curr_snake_tail, smaller_heads)
     curr_weight += available_space * available_space_weight
 
     if (available_space < 2 and not is_tail_reachable):
-        return -10000
+        return -10000, 0
     elif (available_space < curr_snake_size // 4 and not is_tail_reachable):
-        return -800
+        return -800, 0
     elif (available_space < curr_snake_size // 1.5 and not is_tail_reachable):
-        return -400
-
-    # Current snake head coordinates
-    head_x = curr_snake_head["x"]
-    head_y = curr_snake_head["y"]
+        return -400, 0
 
     # Closest distance to food, add weight scaling depending on how close is curr snake to food
-    closest_food_distance = closestFoodDistance(
-        board_state, board_width, board_height, head_x, head_y)
     curr_weight += food_weight/(closest_food_distance + 1)
 
     # Prevent us from being edge killed
@@ -749,9 +1016,6 @@ def evaluatePoint(game_state, depth, main_snake_id, curr_snake_id, current_turn)
     # if (head_x in [4, 5, 6] and len(game_state["snakes"]) < 3):
         # curr_weight += center_control_weight
 
-    smallest_snake_distance, head_collision_value = headCollisionInfo(
-        game_state, head_x, head_y, curr_snake_size, curr_snake_id, main_snake_id)
-
     if (curr_snake_size - biggest_size > 0):
         curr_size_diff = curr_snake_size - biggest_size
         if (curr_size_diff > 6):
@@ -762,104 +1026,543 @@ def evaluatePoint(game_state, depth, main_snake_id, curr_snake_id, current_turn)
     curr_weight += head_collision_value
     curr_weight += (head_kill_weight * curr_size_diff) / (smallest_snake_distance + 1)
 
-    curr_weight += current_turn * more_turn_weight
-
     # curr_weight *= depth_discount_factor * depth
     if (curr_snake_id == main_snake_id):
-        return curr_weight
+        return curr_weight, 1
     else:
-        return curr_weight * -1
+        return curr_weight * -1, -1
+
+
+# Calculate the value of the current game state for our main snake
+def evaluatePoint(game_state, depth, main_snake_id, curr_snake_id, current_turn):
+    position_value, turn_sign = evaluatePosition(game_state, main_snake_id, curr_snake_id)
+    return position_value + turn_sign * current_turn * MORE_TURN_WEIGHT
+
+
+# Select the id of the alive snake that moves after the given one in the snake array
+def nextSnakeId(game_state, curr_snake_id):
+    snakes = game_state["snakes"]
+    curr_index = game_state["snake_index"].get(curr_snake_id, 0)
+
+    for offset in range(1, len(snakes)):
+        snake = snakes[(curr_index + offset) % len(snakes)]
+        if (snake["alive"]):
+            return snake["id"]
+
+    return curr_snake_id
+
+
+# Key of the position with the given snake to move, used by the transposition table
+def positionKey(game_state, curr_snake_id):
+    return game_state["hash"] ^ game_state["zobrist_keys"].to_move[game_state["slots"][curr_snake_id]]
+
+
+# Moves of the snake that stay on the board and do not run into a body (its own tail is fine when it moves away).
+# With non_suicidal, moves that kill only this snake are dropped as well: losing a head to head, losing the
+# food to a bigger or equal head next to it, or starving. Those lead to a lost (our main snake) or
+# won (opponent) position anyway, unless an opponent takes our main snake with it, so those are kept
+def legalMoves(game_state, snake_id, main_snake_id, non_suicidal):
+    board_state = game_state["board"]["state_board"]
+    head_state = game_state["board"]["head_board"]
+    board_width = len(board_state[0])
+    board_height = len(board_state)
+
+    _, snake_length, snake_body, snake_health, snake_tail = findCurrentSnake(game_state, snake_id)
+    head_x = snake_body[0]["x"]
+    head_y = snake_body[0]["y"]
+    tail_moves_away = len(snake_body) < 2 or snake_body[-2] != snake_tail
+
+    moves = []
+    for move in MOVES:
+        x, y = updateHeadCoord(head_x, head_y, move)
+        if not (0 <= x < board_width and 0 <= y < board_height):
+            continue
+
+        destination_cell = board_state[y][x]
+        takes_main_snake = False
+
+        if (destination_cell == 2):
+            if (non_suicidal):
+                other_id = head_state[y][x]
+                _, other_length, _, _, _ = findCurrentSnake(game_state, other_id)
+                takes_main_snake = other_id == main_snake_id and snake_id != main_snake_id
+
+                if (other_length > snake_length or (other_length == snake_length and not takes_main_snake)):
+                    continue
+
+        elif (destination_cell != 0 and destination_cell != 1):
+            if not (destination_cell == snake_id and x == snake_tail["x"] and y == snake_tail["y"] and tail_moves_away):
+                continue
+
+        if (non_suicidal):
+            if (destination_cell == 1):
+                if (foodCompetitor(game_state, snake_id, snake_length, x, y)):
+                    continue
+            elif (snake_health <= 1 and not takes_main_snake):
+                continue
+
+        moves.append(move)
+
+    return moves
+
+
+# Determines if a head of a snake at least as long as ours is next to the food cell, we would die taking it
+def foodCompetitor(game_state, snake_id, snake_length, food_x, food_y):
+    board_state = game_state["board"]["state_board"]
+    head_state = game_state["board"]["head_board"]
+    board_width = len(board_state[0])
+    board_height = len(board_state)
+
+    for dir_x, dir_y in [[0, 1], [0, -1], [1, 0], [-1, 0]]:
+        x = food_x + dir_x
+        y = food_y + dir_y
+        if (x < 0 or y < 0 or x >= board_width or y >= board_height):
+            continue
+        other_id = head_state[y][x]
+        if (other_id != snake_id and other_id != "0" and board_state[y][x] == 2):
+            _, other_length, _, _, _ = findCurrentSnake(game_state, other_id)
+            if (other_length >= snake_length):
+                return True
+
+    return False
+
+
+# Head coordinates of the snake, None if it is dead
+def snakeHead(game_state, snake_id):
+    snake = findSnake(game_state, snake_id)
+    return (snake["head"]["x"], snake["head"]["y"]) if snake is not None else None
+
+
+# Head of the snake, board size and heads of the smaller snakes, used to order moves
+def snakeHeadInfo(game_state, snake_id):
+    board_state = game_state["board"]["state_board"]
+    curr_snake = findSnake(game_state, snake_id)
+
+    smaller_heads = [(snake["head"]["x"], snake["head"]["y"]) for snake in game_state["snakes"]
+                     if snake["alive"] and len(snake["body"]) < len(curr_snake["body"])]
+
+    return curr_snake["head"]["x"], curr_snake["head"]["y"], len(board_state[0]), len(board_state), smaller_heads
+
+
+# Value of the game state as evaluatePoint gives it, with the position part taken from the evaluation cache
+def evaluateNode(context, game_state, depth, main_snake_id, curr_snake_id, current_turn):
+    if (context.evaluation_cache is None or game_state is None):
+        return context.engine.evaluatePoint(game_state, depth, main_snake_id, curr_snake_id, current_turn)
+
+    position_value, turn_sign = context.evaluation_cache.evaluate(
+        context.engine, game_state, main_snake_id, curr_snake_id)
+    return position_value + turn_sign * current_turn * MORE_TURN_WEIGHT
+
+
+# Upper bound of the null window above alpha: a search in (alpha, nullWindowAbove(alpha)) only tells whether
+# the value is above alpha (the result is a lower bound) or not (an upper bound)
+def nullWindowAbove(alpha):
+    return math.nextafter(alpha, float("inf"))
+
+
+# Lower bound of the null window below beta, tells whether the value is below beta
+def nullWindowBelow(beta):
+    return math.nextafter(beta, float("-inf"))
+
+
+# Manhattan distance between the head of the snake (head_info from snakeHeadInfo) and the head of
+# our main snake, None if our main snake is dead
+def headDistance(engine, game_state, head_info, main_snake_id):
+    main_head = engine.snakeHead(game_state, main_snake_id)
+    if (main_head is None):
+        return None
+    return abs(head_info[0] - main_head[0]) + abs(head_info[1] - main_head[1])
+
+
+# Whether the snake (head_info from snakeHeadInfo) is too far from our main snake for their heads to get
+# next to each other within the remaining depth, even if every remaining move went towards the other
+def isDistantSnake(engine, game_state, head_info, main_snake_id, depth):
+    distance = headDistance(engine, game_state, head_info, main_snake_id)
+    return distance is not None and distance > depth + INTERACTION_MARGIN
 
 
 # The snake MiniMax algorithm
-def miniMax(game_state, depth, curr_snake_id,
+# In best-reply search, deviated tells whether an opponent of the current round already played another
+# move than its greedy one, the others then play theirs
+def miniMax(context, game_state, depth, curr_snake_id,
             main_snake_id, previous_snake_id,
-            return_move, alpha, beta, current_turn):
+            return_move, alpha, beta, current_turn, deviated=False):
 
-    global current_depth
-    global stop_time_ms
+    engine = context.engine
+    transposition_table = context.transposition_table
+    context.nodes += 1
 
     # If given game_state reached an end or depth has reached zero, return game_state score
-    if depth == 0 or time.time()*1000 >= stop_time_ms or isGameOver(game_state, previous_snake_id):
-        return evaluatePoint(game_state, depth, main_snake_id, previous_snake_id, current_turn)
-
-    current_depth = depth
+    if depth == 0 or context.timeUp() or engine.isGameOver(game_state, previous_snake_id):
+        return evaluateNode(context, game_state, depth, main_snake_id, previous_snake_id, current_turn)
 
     # get the id of the next snake that we're gonna minimax
-    curr_index = 0
-    for index, snake in enumerate(game_state["snakes"]):
-        if snake["id"] == curr_snake_id:
-            curr_index = index
-            break
-
-    # Select the next snake id inside the snake array
-    next_snake_id = game_state["snakes"][(curr_index + 1) % len(game_state["snakes"])]["id"]
-    moves = ["up", "down", "right", "left"]
+    next_snake_id = engine.nextSnakeId(game_state, curr_snake_id)
+
+    # The snake to move has already been killed, every move leads to the same end
+    if engine.isGameOver(game_state, curr_snake_id):
+        end_value = float("-inf") if curr_snake_id == main_snake_id else float("inf")
+        return (end_value, None) if return_move else end_value
+
+    # Use what an earlier search of the same position proved, as long as it was at least as deep
+    original_alpha, original_beta = alpha, beta
+    table_move = None
+    if (transposition_table is not None):
+        position_key = engine.positionKey(game_state, curr_snake_id)
+        if (deviated):
+            position_key ^= DEVIATED_KEY
+        entry = transposition_table.probe(position_key)
+
+        # Best move of the earlier search is tried first even when it was shallower
+        if (entry is not None):
+            table_move = entry[4]
+
+        # Scores of earlier turns hold a different turn bonus, only their won and lost results are still true
+        if (entry is not None and entry[1] >= depth
+                and (entry[5] == transposition_table.generation or entry[3] in [float("inf"), float("-inf")])):
+            _, _, bound, score, entry_move, _ = entry
+            if (bound == EXACT):
+                alpha = beta = score
+            elif (bound == LOWER):
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+
+            if (alpha >= beta):
+                transposition_table.cutoffs += 1
+                return (score, entry_move) if return_move else score
+
+    # No move keeps the snake alive, it is resolved as dead without creating child states
+    moves = engine.legalMoves(game_state, curr_snake_id, main_snake_id, context.prune_suicidal_moves)
+    if (not moves):
+        end_value = float("-inf") if curr_snake_id == main_snake_id else float("inf")
+        return (end_value, None) if return_move else end_value
+
+    head_info = engine.snakeHeadInfo(game_state, curr_snake_id)
+    best_reply = context.best_reply and curr_snake_id != main_snake_id
+    default_move = greedyMove(moves, head_info) if best_reply else None
+
+    # A distant opponent cannot reach us within the search, it plays its greedy safe move instead of
+    # branching, so the tree only grows with the opponents near our main snake
+    if (curr_snake_id != main_snake_id and context.prune_distant_opponents
+            and isDistantSnake(engine, game_state, head_info, main_snake_id, depth)):
+        context.distant_nodes += 1
+        moves = [greedyMove(moves, head_info)]
+    elif (best_reply and deviated):
+        moves = [default_move]
+    else:
+        moves = context.move_ordering.orderMoves(moves, head_info, curr_snake_id, current_turn, table_move)
 
     if curr_snake_id == main_snake_id:
-        highest_value = float("-inf")
+        best_value = float("-inf")
         best_move = None
-        for move in moves:
-            # Makes a copy of the current game state with the current snake taking a possible move
-            new_game_state = makeMove(game_state, curr_snake_id, move)
-            curr_val = miniMax(new_game_state, depth - 1, next_snake_id,
-                               main_snake_id, curr_snake_id,
-                               False, alpha, beta, current_turn + 1)
-            if curr_val > highest_value:
+        for move_index, move in enumerate(moves):
+            # Apply the move in place, search the child and take the move back. Moves after the first one
+            # only have to prove they are not better than alpha, a null window does that with the most cutoffs,
+            # they are searched again with the full window when they are better
+            undo_record = engine.applyMove(game_state, curr_snake_id, move)
+            if (move_index == 0):
+                curr_val = miniMax(context, game_state, depth - 1, next_snake_id,
+                                   main_snake_id, curr_snake_id,
+                                   False, alpha, beta, current_turn + 1)
+            else:
+                curr_val = miniMax(context, game_state, depth - 1, next_snake_id,
+                                   main_snake_id, curr_snake_id,
+                                   False, alpha, nullWindowAbove(alpha), current_turn + 1)
+                if (alpha < curr_val < beta):
+                    context.researches += 1
+                    curr_val = miniMax(context, game_state, depth - 1, next_snake_id,
+                                       main_snake_id, curr_snake_id,
+                                       False, alpha, beta, current_turn + 1)
+            engine.undoMove(game_state, undo_record)
+            if curr_val > best_value:
                 best_move = move
-                highest_value = curr_val
+                best_value = curr_val
 
             alpha = max(alpha, curr_val)
 
             if alpha >= beta:
+                context.move_ordering.recordCutoff(head_info, curr_snake_id, move, current_turn, depth, move_index)
                 break
 
-        # print(f"highest :   {curr_snake_id} {best_move}: {highest_value}")
-
-        return (highest_value, best_move) if return_move else highest_value
-
     else:
-        min_value = float("inf")
+        best_value = float("inf")
         best_move = None
-        for move in moves:
-            new_game_state = makeMove(game_state, curr_snake_id, move)
-            curr_val = miniMax(new_game_state, depth - 1, next_snake_id,
-                               main_snake_id, curr_snake_id,
-                               False, alpha, beta, current_turn + 1)
-            # print(f"{curr_snake_id} {move}: {curr_val}")
-            if (min_value > curr_val):
+        for move_index, move in enumerate(moves):
+            # Null window below beta for the moves after the first one, mirror of our snake's moves
+            undo_record = engine.applyMove(game_state, curr_snake_id, move)
+
+            # In best-reply search only the move back to our main snake (or its death) ends the round and the ply
+            child_depth = depth - 1
+            child_deviated = False
+            if (best_reply and next_snake_id != main_snake_id and not engine.isGameOver(game_state, main_snake_id)):
+                child_depth = depth
+                child_deviated = deviated or move != default_move
+
+            if (move_index == 0):
+                curr_val = miniMax(context, game_state, child_depth, next_snake_id,
+                                   main_snake_id, curr_snake_id,
+                                   False, alpha, beta, current_turn + 1, child_deviated)
+            else:
+                curr_val = miniMax(context, game_state, child_depth, next_snake_id,
+                                   main_snake_id, curr_snake_id,
+                                   False, nullWindowBelow(beta), beta, current_turn + 1, child_deviated)
+                if (alpha < curr_val < beta):
+                    context.researches += 1
+                    curr_val = miniMax(context, game_state, child_depth, next_snake_id,
+                                       main_snake_id, curr_snake_id,
+                                       False, alpha, beta, current_turn + 1, child_deviated)
+            engine.undoMove(game_state, undo_record)
+            if (best_value > curr_val):
                 best_move = move
-                min_value = curr_val
+                best_value = curr_val
 
             beta = min(curr_val, beta)
 
             if (beta <= alpha):
+                context.move_ordering.recordCutoff(head_info, curr_snake_id, move, current_turn, depth, move_index)
                 break
 
-        return (min_value, best_move) if return_move else min_value
+    # Values of a subtree cut by the deadline are not stored
+    if (transposition_table is not None and not context.timeUp()):
+        if (best_value <= original_alpha):
+            bound = UPPER
+        elif (best_value >= original_beta):
+            bound = LOWER
+        else:
+            bound = EXACT
+        transposition_table.store(position_key, depth, bound, best_value, best_move)
+
+    return (best_value, best_move) if return_move else best_value
+
+
+GRID_ENGINE = Engine("grid", createGameState, applyMove, undoMove, makeMove,
+                     evaluatePoint, evaluatePosition, isGameOver, nextSnakeId, positionKey,
+                     snakeHead, snakeHeadInfo, legalMoves)
 
 
-# Main function
-def miniMax_value(game_state, safe_moves, current_time_ms):
-    current_game_state = createGameState(game_state, game_state["you"]["id"])
+# Return the game state engine registered under the given name
+def getEngine(name):
+    if (name == "bitboard"):
+        import bitboard
+        return bitboard.BITBOARD_ENGINE
+
+    return GRID_ENGINE
+
+
+# Search every root move of our main snake to the given depth in the window (alpha, beta), first_move
+# (the previous best move) first and the others with a null window like in miniMax.
+# Returns the best value and move among the fully searched moves and whether every move was searched.
+# A move is only taken as the best with a value above alpha, values at or below it are upper bounds
+def miniMaxRoot(context, game_state, depth, main_snake_id, current_turn, first_move,
+                alpha=float("-inf"), beta=float("inf")):
+    engine = context.engine
+    moves = engine.legalMoves(game_state, main_snake_id, main_snake_id, context.prune_suicidal_moves)
+    head_info = engine.snakeHeadInfo(game_state, main_snake_id)
+    moves = context.move_ordering.orderMoves(moves, head_info, main_snake_id, current_turn, first_move)
+
+    next_snake_id = engine.nextSnakeId(game_state, main_snake_id)
+    highest_value = float("-inf")
+    best_move = None
+    window_alpha = alpha
+
+    for move_index, move in enumerate(moves):
+        undo_record = engine.applyMove(game_state, main_snake_id, move)
+        if (move_index == 0):
+            curr_val = miniMax(context, game_state, depth - 1, next_snake_id,
+                               main_snake_id, main_snake_id,
+                               False, alpha, beta, current_turn + 1)
+        else:
+            curr_val = miniMax(context, game_state, depth - 1, next_snake_id,
+                               main_snake_id, main_snake_id,
+                               False, alpha, nullWindowAbove(alpha), current_turn + 1)
+            if (alpha < curr_val < beta and not context.timeUp()):
+                context.researches += 1
+                curr_val = miniMax(context, game_state, depth - 1, next_snake_id,
+                                   main_snake_id, main_snake_id,
+                                   False, alpha, beta, current_turn + 1)
+        engine.undoMove(game_state, undo_record)
+
+        # The deadline was hit inside this move's subtree, its value cannot be trusted
+        if (context.timeUp()):
+            return highest_value, best_move, False
+
+        if curr_val > highest_value:
+            highest_value = curr_val
+            if (curr_val > window_alpha):
+                best_move = move
+
+        alpha = max(alpha, curr_val)
+
+        # Above the window, the caller has to search again with a wider one
+        if (alpha >= beta):
+            break
+
+    return highest_value, best_move, True
+
+
+# Root search in the aspiration window around expected_value, the value of an earlier depth (None for
+# the full window). A value outside of the window is only a bound, the root is then searched again with the
+# full window, starting with the move that went above the window if there is one
+def aspirationSearch(context, game_state, depth, main_snake_id, current_turn, first_move, expected_value):
+    if (expected_value is not None and expected_value not in [float("inf"), float("-inf")]):
+        alpha = expected_value - ASPIRATION_WINDOW
+        beta = expected_value + ASPIRATION_WINDOW
+        curr_value, curr_move, finished = miniMaxRoot(
+            context, game_state, depth, main_snake_id, current_turn, first_move, alpha, beta)
+
+        if (not finished or alpha < curr_value < beta):
+            return curr_value, curr_move, finished
+
+        context.aspiration_fails += 1
+        first_move = curr_move or first_move
+
+    return miniMaxRoot(context, game_state, depth, main_snake_id, current_turn, first_move)
+
+
+# Value the aspiration window of a depth is centered on: the value of the finished depth one round earlier,
+# which ended with the same snake. A round is a ply of every snake, in best-reply search our ply and the
+# opponents' round ply
+def aspirationCenter(context, depth_values, depth, snake_count):
+    round_depth = 2 if context.best_reply else snake_count
+    return depth_values.get(depth - round_depth)
+
+
+# Search mode of a game with the snakes of the given request, "best_reply" or "paranoid" (see SEARCH_MODE)
+def searchMode(game_state):
+    if (SEARCH_MODE == "best_reply" and len(game_state["board"]["snakes"]) >= BEST_REPLY_MIN_SNAKES):
+        return "best_reply"
+    return "paranoid"
+
+
+# Context of a new search of the given turn, with empty tables
+def createSearchContext(game_state, engine, stop_time_ms):
+    transposition_table = TranspositionTable(TRANSPOSITION_TABLE_MB) if TRANSPOSITION_TABLE_MB > 0 else None
+    move_ordering = MoveOrdering()
+    move_ordering.newSearch(game_state["game"]["id"], game_state["turn"])
+    evaluation_cache = EvaluationCache(EVALUATION_CACHE_SIZE) if EVALUATION_CACHE_SIZE > 0 else None
+    context = SearchContext(engine, stop_time_ms, transposition_table, move_ordering, evaluation_cache)
+    context.best_reply = searchMode(game_state) == "best_reply"
+    return context
+
+
+# Context of a new search of the given turn with the tables of the game's earlier turns
+def gameSearchContext(game_state, engine, stop_time_ms, memory):
+    played_moves = memory.playedMoves(game_state)
+    played_plies = len(memory.last_heads) if played_moves is not None else None
+    memory.move_ordering.newSearch(game_state["game"]["id"], game_state["turn"], played_plies)
+    if (memory.transposition_table is not None):
+        memory.transposition_table.newGeneration(game_state["turn"])
+    # The mode is kept for the whole game, the tables hold values of its search only
+    if (memory.search_mode is None):
+        memory.search_mode = searchMode(game_state)
+    context = SearchContext(engine, stop_time_ms, memory.transposition_table, memory.move_ordering,
+                            memory.evaluation_cache)
+    context.best_reply = memory.search_mode == "best_reply"
+    return context
+
+
+# Expected line of play from the root: the given first move of our main snake, then the best moves
+# of the following snakes as stored in the transposition table. Returns a list of (snake id, move)
+def principalVariation(context, game_state, main_snake_id, first_move, max_length):
+    engine = context.engine
+    transposition_table = context.transposition_table
+    principal_variation = []
+    undo_records = []
+    curr_snake_id = main_snake_id
+    move = first_move
+    deviated = False
+
+    while (move is not None and len(principal_variation) < max_length):
+        # Best-reply search keys the positions after an opponent's deviation apart, see miniMax
+        if (context.best_reply and curr_snake_id != main_snake_id):
+            moves = engine.legalMoves(game_state, curr_snake_id, main_snake_id, context.prune_suicidal_moves)
+            deviated = deviated or move != greedyMove(moves, engine.snakeHeadInfo(game_state, curr_snake_id))
+
+        next_snake_id = engine.nextSnakeId(game_state, curr_snake_id)
+        undo_records.append(engine.applyMove(game_state, curr_snake_id, move))
+        principal_variation.append((curr_snake_id, move))
+
+        curr_snake_id = next_snake_id
+        if (curr_snake_id == main_snake_id):
+            deviated = False
+        if (transposition_table is None or engine.isGameOver(game_state, curr_snake_id)):
+            break
+        position_key = engine.positionKey(game_state, curr_snake_id)
+        entry = transposition_table.probe(position_key ^ DEVIATED_KEY if deviated else position_key)
+        move = entry[4] if entry is not None and entry[5] == transposition_table.generation else None
+
+    for undo_record in reversed(undo_records):
+        engine.undoMove(game_state, undo_record)
+
+    return principal_variation
+
+
+# Main function, iterative deepening from depth 1 until the deadline (see deadline.py), current_time_ms
+# is the time the request arrived at. The answer is the best move of the last finished iteration
+def miniMax_value(game_state, safe_moves, current_time_ms, engine_name=None):
+    memory = game_store.get(game_state)
+    with memory.lock:
+        return gameMiniMax_value(game_state, current_time_ms, engine_name, memory)
+
+
+# Search of one turn with the tables of the game. The last search's transposition table finds the
+# new position again and its principal variation gives the first move, when the other snakes played along
+def gameMiniMax_value(game_state, current_time_ms, engine_name, memory):
+    engine = getEngine(engine_name or SEARCH_ENGINE)
+    current_game_state = engine.createGameState(game_state, game_state["you"]["id"], memory.slots)
     current_turn = game_state["turn"]
+    main_snake_id = game_state["you"]["id"]
+
+    soft_stop_time_ms, stop_time_ms = searchDeadlines(game_state, current_time_ms, memory)
+    context = gameSearchContext(game_state, engine, stop_time_ms, memory)
+    context.soft_stop_time_ms = soft_stop_time_ms
+    memory.search_context = context
+    expected_move = memory.expectedMove(game_state, main_snake_id)
+
+    result_value = None
+    best_move = None
+    # Value of every finished depth, the aspiration window is centered on the last one that ended with the same
+    # snake (the value is from the point of view of the snake that moved last)
+    depth_values = {}
+    snake_count = len(game_state["board"]["snakes"])
+
+    for depth in range(1, context.max_depth + 1):
+        curr_value, curr_move, finished = aspirationSearch(
+            context, current_game_state, depth, main_snake_id, current_turn, best_move or expected_move,
+            aspirationCenter(context, depth_values, depth, snake_count))
+
+        if (not finished):
+            # The previous best move is searched first, so a different best move has already beaten it
+            if (curr_move is not None and curr_move != best_move):
+                result_value, best_move = curr_value, curr_move
+                memory.answer_move = best_move
+            break
 
-    global stop_time_ms
-    if game_state["you"]["latency"] != '':
-        stop_time_ms = current_time_ms + 450 - float(game_state["you"]["latency"])
-    else:
-        stop_time_ms = current_time_ms + 100
+        context.completed_depth = depth
+        depth_values[depth] = curr_value
+        if (memory.first_answer_ms is None):
+            memory.first_answer_ms = time.time()*1000 - current_time_ms
+        if (curr_move is not None):
+            result_value, best_move = curr_value, curr_move
+            # The watchdog answers with it if the search does not return in time
+            memory.answer_move = best_move
+
+        # A forced win or loss does not change with a deeper search
+        if (curr_value in [float("inf"), float("-inf")]):
+            break
+
+        # The next depth would most likely not finish before the deadline
+        if (context.softTimeUp()):
+            break
 
-    global current_depth
-    current_depth = 0
-    max_depth = 5
-    result_value, best_move = miniMax(
-        current_game_state, max_depth, game_state["you"]["id"],
-        game_state["you"]["id"],None, True,
-        float("-inf"), float("inf"), current_turn)
+    print("Search: " + str(context.stats()) + ", expected move: " + str(expected_move)
+          + ", game store: " + str(game_store.stats()))
+    memory.update(game_state, principalVariation(context, current_game_state, main_snake_id,
+                                                 best_move, context.completed_depth))
 
     if best_move is not None:
-        print("Minimax value: " + str(result_value) + ", Best move:" + best_move + " depth: " + str(current_depth))
+        print("Minimax value: " + str(result_value) + ", Best move:" + best_move + " depth: " + str(context.completed_depth))
         return best_move
     else:
         print("No good move found!")
@@ -0,0 +1,109 @@
+# Move ordering for the alpha-beta search: the previous best or transposition table move first,
+# then the killer moves of the ply, then moves ranked by the history table and cheap static hints.
+# The earlier a refuting move is tried, the more siblings alpha-beta cuts.
+
+MOVES = ["up", "down", "right", "left"]
+
+# Head offset of every move in the y-flipped search coordinates
+MOVE_OFFSETS = {"up": (0, -1), "down": (0, 1), "right": (1, 0), "left": (-1, 0)}
+
+# Killer moves remembered per ply
+KILLER_SLOTS = 2
+
+
+# Cheap guess of how good a move is: away from walls and towards the closest smaller snake's head
+def staticHint(head_info, move):
+    head_x, head_y, board_width, board_height, smaller_heads = head_info
+    offset_x, offset_y = MOVE_OFFSETS[move]
+    x = head_x + offset_x
+    y = head_y + offset_y
+
+    if not (0 <= x < board_width and 0 <= y < board_height):
+        return -4
+
+    hint = 0
+    if (x == 0 or y == 0 or x == board_width - 1 or y == board_height - 1):
+        hint -= 1
+
+    if (smaller_heads):
+        curr_distance = min(abs(head_x - other_x) + abs(head_y - other_y) for other_x, other_y in smaller_heads)
+        new_distance = min(abs(x - other_x) + abs(y - other_y) for other_x, other_y in smaller_heads)
+        if (new_distance < curr_distance):
+            hint += 2
+
+    return hint
+
+
+# Default move of a snake that is not branched on: the best static hint, the first of the given moves on a tie.
+# Only depends on the position, so the value of a position does not depend on what was searched before
+def greedyMove(moves, head_info):
+    return max(moves, key=lambda move: staticHint(head_info, move))
+
+
+class MoveOrdering:
+    def __init__(self):
+        self.game_id = None
+        self.history = {}
+        self.killers = []
+        self.root_turn = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    # Reset what only holds within a turn. The history table lasts for the whole game,
+    # older turns weigh half as much as the last one. played_plies is the number of moves made
+    # since the last search of the game, its killers are shifted by as many plies
+    def newSearch(self, game_id, root_turn, played_plies=None):
+        if (game_id != self.game_id):
+            self.game_id = game_id
+            self.history = {}
+            self.killers = []
+        else:
+            self.history = {key: score // 2 for key, score in self.history.items() if score > 1}
+            self.killers = self.killers[played_plies:] if played_plies is not None else []
+
+        self.root_turn = root_turn
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    # Sort the given moves. head_info is (head_x, head_y, board_width, board_height, smaller snake heads)
+    # of the snake to move, first_move the previous best or transposition table move
+    def orderMoves(self, moves, head_info, snake_id, current_turn, first_move):
+        ply = current_turn - self.root_turn
+        killers = self.killers[ply] if ply < len(self.killers) else []
+        head_x, head_y = head_info[0], head_info[1]
+
+        def moveScore(move):
+            if (move == first_move):
+                return (2, 0, 0)
+            if (move in killers):
+                return (1, -killers.index(move), 0)
+            return (0, self.history.get((snake_id, head_x, head_y, move), 0), staticHint(head_info, move))
+
+        return sorted(moves, key=moveScore, reverse=True)
+
+    # A move caused a cutoff: remember it as a killer of the ply and reward it in the history table.
+    # move_index is its position in the ordered moves
+    def recordCutoff(self, head_info, snake_id, move, current_turn, depth, move_index):
+        ply = current_turn - self.root_turn
+        while (len(self.killers) <= ply):
+            self.killers.append([])
+
+        killers = self.killers[ply]
+        if (move not in killers):
+            killers.insert(0, move)
+            del killers[KILLER_SLOTS:]
+
+        history_key = (snake_id, head_info[0], head_info[1], move)
+        self.history[history_key] = self.history.get(history_key, 0) + depth * depth
+
+        self.cutoffs += 1
+        if (move_index == 0):
+            self.first_move_cutoffs += 1
+
+    def stats(self):
+        return {
+            "cutoffs": self.cutoffs,
+            "first_move_cutoffs": self.first_move_cutoffs,
+            "first_move_rate": self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+            "history_size": len(self.history),
+        }
@@ -0,0 +1,343 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import minimax
+from deadline import searchDeadlines
+from gamestore import game_store
+from ordering import greedyMove
+from precompute import buildStandardTables
+
+# Root-parallel search: the root moves, or root move x first opponent reply when there are
+# fewer root moves than workers, are searched by a pool of worker processes.
+# Every task deepens iteratively until the same deadline with the tables the worker keeps for the game, and
+# reports every finished depth. Workers keep only the games the server process keeps, the others are released
+# with their next task. The parent merges the finished depths as they come in, so the best move so far
+# is always there for the watchdog.
+
+# Number of worker processes, 0 keeps the search in the server process
+SEARCH_WORKERS = int(os.environ.get("SEARCH_WORKERS", "0"))
+
+# Workers stop this many ms before the deadline, so their results reach the parent in time
+RESULT_MARGIN_MS = 25
+
+# Seconds the parent waits for a depth report before it checks whether the workers are done
+PROGRESS_POLL_S = 0.005
+
+search_pool = None
+search_worker_count = 0
+
+# Queue of the progress the workers report, (search id, report), the depths they finish as (task index, depth,
+# value). A thread of the parent hands the reports to the inbox of their search, reports of searches that already
+# answered are dropped
+progress_queue = None
+progress_inboxes = {}
+progress_lock = threading.Lock()
+search_ids = itertools.count()
+
+# The progress queue as seen by a worker process, None in the parent
+worker_progress_queue = None
+
+
+# Start the worker processes, before the first move request so they are never forked per move
+def startSearchWorkers(worker_count=SEARCH_WORKERS):
+    global search_pool, search_worker_count, progress_queue
+    if (worker_count > 0 and search_pool is None):
+        # Written by the searching thread itself, a queue's feeder thread would wait for the search to let go
+        # of the interpreter lock
+        progress_queue = multiprocessing.SimpleQueue()
+        search_pool = multiprocessing.Pool(worker_count, initializer=initSearchWorker, initargs=(progress_queue,))
+        search_worker_count = worker_count
+        threading.Thread(target=routeProgress, args=(progress_queue,), daemon=True).start()
+    return search_pool
+
+
+def stopSearchWorkers():
+    global search_pool, search_worker_count, progress_queue
+    if (search_pool is not None):
+        search_pool.terminate()
+        search_pool.join()
+        search_pool = None
+        search_worker_count = 0
+        progress_queue.put(None)
+        progress_queue = None
+
+
+# Worker side: runs once in every worker process when the pool starts, before it takes any search
+def initSearchWorker(queue_of_progress):
+    global worker_progress_queue
+    worker_progress_queue = queue_of_progress
+    buildStandardTables()
+
+
+# Parent side: hand every reported depth to the inbox of its search, until the pool is stopped
+def routeProgress(queue_of_progress):
+    while (True):
+        try:
+            report = queue_of_progress.get()
+        except Exception:
+            # A worker was terminated in the middle of a report, the pool is stopping
+            return
+        if (report is None):
+            return
+        with progress_lock:
+            inbox = progress_inboxes.get(report[0])
+        if (inbox is not None):
+            inbox.put(report[1:])
+
+
+def reportProgress(search_id, *report):
+    if (worker_progress_queue is not None and search_id is not None):
+        worker_progress_queue.put((search_id,) + report)
+
+
+# Parent side: a new search id and the inbox its reports are delivered to, until closeInbox
+def openInbox():
+    search_id = next(search_ids)
+    inbox = queue.Queue()
+    with progress_lock:
+        progress_inboxes[search_id] = inbox
+    return search_id, inbox
+
+
+def closeInbox(search_id):
+    with progress_lock:
+        progress_inboxes.pop(search_id, None)
+
+
+# State of a task after its root move and, if there is one, the reply of the next snake, hashed with the game's
+# slots. Returns the state, the arguments of the miniMax call that continues it and the values
+# of the depths that end before the reply
+def taskSearchState(engine, game_state, game_slots, root_move, reply_move):
+    main_snake_id = game_state["you"]["id"]
+    current_turn = game_state["turn"]
+    search_state = engine.createGameState(game_state, main_snake_id, game_slots)
+    next_snake_id = engine.nextSnakeId(search_state, main_snake_id)
+    engine.applyMove(search_state, main_snake_id, root_move)
+
+    if (reply_move is None):
+        return search_state, next_snake_id, main_snake_id, 1, []
+
+    # Depth 1 stops right after the root move, the reply only counts from depth 2
+    first_values = [engine.evaluatePoint(search_state, 0, main_snake_id, main_snake_id, current_turn + 1)]
+    reply_next_snake_id = engine.nextSnakeId(search_state, next_snake_id)
+    engine.applyMove(search_state, next_snake_id, reply_move)
+    return search_state, reply_next_snake_id, next_snake_id, 2, first_values
+
+
+# Worker side: deepen the (root move, reply) tasks of the worker together, one depth for all of them
+# before the next, until stop_time_ms. The worker keeps a transposition table, move ordering and evaluation
+# cache for the game between its tasks and turns, searched in the game's search mode and hashed with the game's
+# slots (GameMemory.slots of the server process). Every game but the ones of live_games, the keys of the server
+# process's game store, is released first.
+# tasks are (task index, (root move, reply)), every finished depth is reported under search_id with the index.
+# Returns the value of every finished depth of every task
+def searchTasks(game_state, engine_name, tasks, stop_time_ms, search_mode="paranoid", search_id=None,
+                game_slots=None, live_games=None):
+    if (live_games is not None):
+        game_store.retain(live_games)
+
+    # The deadline passed while the tasks were queued, they are cancelled
+    if (time.time()*1000 >= stop_time_ms):
+        return [[] for _ in tasks]
+
+    engine = minimax.getEngine(engine_name)
+    main_snake_id = game_state["you"]["id"]
+    current_turn = game_state["turn"]
+    memory = game_store.get(game_state)
+    memory.search_mode = search_mode
+    if (game_slots is not None):
+        memory.slots = game_slots
+    context = minimax.gameSearchContext(game_state, engine, stop_time_ms, memory)
+
+    searches = [taskSearchState(engine, game_state, memory.slots, root_move, reply_move)
+                for _, (root_move, reply_move) in tasks]
+    task_values = [first_values for _, _, _, _, first_values in searches]
+    for (task_index, _), values in zip(tasks, task_values):
+        for depth, value in enumerate(values, 1):
+            reportProgress(search_id, task_index, depth, value)
+
+    for depth in range(1, context.max_depth + 1):
+        for (task_index, _), (search_state, curr_snake_id, previous_snake_id, plies, _), values in zip(
+                tasks, searches, task_values):
+            if (len(values) >= depth):
+                continue
+
+            value = minimax.miniMax(context, search_state, depth - plies, curr_snake_id,
+                                    main_snake_id, previous_snake_id,
+                                    False, float("-inf"), float("inf"), current_turn + plies)
+            if (context.timeUp()):
+                return task_values
+
+            values.append(value)
+            reportProgress(search_id, task_index, depth, value)
+
+    return task_values
+
+
+# Split the root into (root move, reply) tasks. Replies of the first opponent are only
+# split when there are fewer root moves than workers and the opponent is still alive to answer, and never
+# in best-reply search where the round of opponent moves is one ply.
+# Also returns, by root move with split replies, the reply the opponent plays when it is too far
+# away to branch (see minimax.isDistantSnake) and its head distance to our snake after the root move
+def rootTasks(engine, search_state, main_snake_id, worker_count, best_reply=False):
+    root_moves = engine.legalMoves(search_state, main_snake_id, main_snake_id, minimax.PRUNE_SUICIDAL_MOVES)
+    if (len(root_moves) >= worker_count or best_reply):
+        return [(move, None) for move in root_moves], {}
+
+    next_snake_id = engine.nextSnakeId(search_state, main_snake_id)
+    tasks = []
+    distant_replies = {}
+    for move in root_moves:
+        undo_record = engine.applyMove(search_state, main_snake_id, move)
+        replies = []
+        if (next_snake_id != main_snake_id and not engine.isGameOver(search_state, main_snake_id)
+                and not engine.isGameOver(search_state, next_snake_id)):
+            replies = engine.legalMoves(search_state, next_snake_id, main_snake_id, minimax.PRUNE_SUICIDAL_MOVES)
+        if (replies and minimax.PRUNE_DISTANT_OPPONENTS):
+            head_info = engine.snakeHeadInfo(search_state, next_snake_id)
+            distance = minimax.headDistance(engine, search_state, head_info, main_snake_id)
+            if (distance is not None):
+                distant_replies[move] = (greedyMove(replies, head_info), distance)
+        engine.undoMove(search_state, undo_record)
+
+        if (replies):
+            tasks.extend((move, reply) for reply in replies)
+        else:
+            tasks.append((move, None))
+
+    return tasks, distant_replies
+
+
+# Value of a root move at every depth finished by all of its tasks (values by reply), the opponent
+# picks its worst reply. At the depths the opponent is too far away to branch in the serial search,
+# it plays the reply of distant_reply (from rootTasks) instead
+def mergeRootMove(reply_values, distant_reply):
+    depth_count = min(len(values) for values in reply_values.values())
+    merged = []
+    for depth in range(depth_count):
+        # The values at index depth are searched to depth + 1 from the root, so depth plies remain at the reply
+        if (distant_reply is not None and distant_reply[1] > depth + minimax.INTERACTION_MARGIN):
+            merged.append(reply_values[distant_reply[0]][depth])
+        else:
+            merged.append(min(values[depth] for values in reply_values.values()))
+    return merged
+
+
+# Best root move on the depths the tasks finished so far: the moves are compared at the deepest depth every one of
+# them finished. A move whose tasks have not all finished a depth stays a candidate at the value of the cheapest
+# move, it is only picked over moves that lose for sure. Returns the move, its value and the compared depth,
+# (None, None, 0) while no move has finished a depth
+def bestMergedMove(tasks, task_values, distant_replies):
+    move_values = {}
+    for (move, reply), values in zip(tasks, task_values):
+        move_values.setdefault(move, {})[reply] = values
+
+    merged = {move: mergeRootMove(reply_values, distant_replies.get(move))
+              for move, reply_values in move_values.items()}
+    finished = {move: values for move, values in merged.items() if values}
+    if (not finished):
+        return None, None, 0
+
+    completed_depth = min(len(values) for values in finished.values())
+    best_move = None
+    result_value = float("-inf")
+    for move, values in finished.items():
+        value = values[completed_depth - 1]
+        if (best_move is None or value > result_value):
+            best_move, result_value = move, value
+
+    if (result_value == float("-inf")):
+        for move, values in merged.items():
+            if (not values):
+                return move, result_value, completed_depth
+
+    return best_move, result_value, completed_depth
+
+
+# Same answer as miniMax_value, searched by the worker pool. Falls back to the serial search
+# when the pool has not been started
+def parallelMiniMax_value(game_state, safe_moves, current_time_ms, engine_name=None):
+    if (search_pool is None):
+        return minimax.miniMax_value(game_state, safe_moves, current_time_ms, engine_name)
+
+    memory = game_store.get(game_state)
+    with memory.lock:
+        return gameParallelMiniMax_value(game_state, current_time_ms, engine_name or minimax.SEARCH_ENGINE, memory)
+
+
+# Search of one turn by the worker pool. Every improvement of the merged depth is published to the game memory,
+# the watchdog answers with it if the search does not return in time
+def gameParallelMiniMax_value(game_state, current_time_ms, engine_name, memory):
+    engine = minimax.getEngine(engine_name)
+    main_snake_id = game_state["you"]["id"]
+    _, stop_time_ms = searchDeadlines(game_state, current_time_ms, memory)
+    # The mode is kept for the whole game, the workers' tables hold values of its search only
+    if (memory.search_mode is None):
+        memory.search_mode = minimax.searchMode(game_state)
+    # Context of the wait for the workers, the watchdog stops it
+    context = minimax.SearchContext(engine, stop_time_ms, None, None)
+    context.best_reply = memory.search_mode == "best_reply"
+    memory.search_context = context
+
+    search_state = engine.createGameState(game_state, main_snake_id, memory.slots)
+    tasks, distant_replies = rootTasks(engine, search_state, main_snake_id, search_worker_count, context.best_reply)
+
+    search_id, inbox = openInbox()
+    try:
+        # Every worker gets its share of the tasks up front, so all of them are searched from the start
+        indexed_tasks = list(enumerate(tasks))
+        worker_tasks = [indexed_tasks[index::search_worker_count]
+                        for index in range(min(search_worker_count, len(tasks)))]
+        live_games = game_store.keys()
+        results = [search_pool.apply_async(searchTasks, (game_state, engine_name, curr_tasks,
+                                                         stop_time_ms - RESULT_MARGIN_MS, memory.search_mode,
+                                                         search_id, memory.slots, live_games))
+                   for curr_tasks in worker_tasks]
+
+        # Merge the depths as they are reported, until every worker returned or the deadline.
+        # Late workers are ignored and stop on their own
+        task_values = [[] for _ in tasks]
+        while (not context.timeUp() and not all(result.ready() for result in results)):
+            try:
+                task_index, depth, value = inbox.get(
+                    timeout=min(max(context.stop_time_ms - time.time()*1000, 0) / 1000, PROGRESS_POLL_S))
+            except queue.Empty:
+                continue
+            if (depth == len(task_values[task_index]) + 1):
+                task_values[task_index].append(value)
+                publishMove(memory, context, current_time_ms, bestMergedMove(tasks, task_values, distant_replies))
+    finally:
+        closeInbox(search_id)
+
+    # The values a worker returned are complete, its last reports may still be on their way
+    for curr_tasks, result in zip(worker_tasks, results):
+        if (result.ready() and result.successful()):
+            for (task_index, _), values in zip(curr_tasks, result.get()):
+                if (len(values) > len(task_values[task_index])):
+                    task_values[task_index] = values
+
+    best_move, result_value, completed_depth = bestMergedMove(tasks, task_values, distant_replies)
+    if (best_move is None):
+        print("No good move found!")
+        return None
+    publishMove(memory, context, current_time_ms, (best_move, result_value, completed_depth))
+    memory.update(game_state, [(main_snake_id, best_move)])
+
+    print("Minimax value: " + str(result_value) + ", Best move:" + best_move + " depth: " + str(completed_depth)
+          + " workers: " + str(search_worker_count) + " tasks: " + str(len(tasks)))
+    return best_move
+
+
+# Publish a merged move (see bestMergedMove) at least as deep as the last one as the game's answer so far
+def publishMove(memory, context, current_time_ms, merged_move):
+    best_move, _, completed_depth = merged_move
+    if (best_move is None or completed_depth < context.completed_depth):
+        return
+    if (memory.first_answer_ms is None):
+        memory.first_answer_ms = time.time()*1000 - current_time_ms
+    context.completed_depth = completed_depth
+    memory.answer_move = best_move
@@ -0,0 +1,27 @@
+from minimax import cellNeighbours
+
+# Shortest paths of the fallback move without building a graph: a breadth-first search over the flat list
+# of blocked cells of the board model (see BoardModel.blockedCells) with the neighbour table of the board size.
+# Every step costs the same, so the first path found is a shortest one.
+
+
+# First cell and length of a shortest path from the start cell to the target cell over the free cells,
+# None when there is none. Searched from the target, it stops as soon as it reaches the start
+def findPath(blocked, board_width, board_height, start_cell, target_cell):
+    if (start_cell == target_cell or blocked[target_cell]):
+        return None
+
+    neighbours = cellNeighbours(board_width, board_height)
+    distances = [None] * len(blocked)
+    distances[target_cell] = 0
+    queue = [target_cell]
+    for cell in queue:
+        for next_cell in neighbours[cell]:
+            # The cell found the start from is its first step towards the target
+            if (next_cell == start_cell):
+                return cell, distances[cell] + 1
+            if (distances[next_cell] is None and not blocked[next_cell]):
+                distances[next_cell] = distances[cell] + 1
+                queue.append(next_cell)
+
+    return None
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+
+import minimax
+from gamestore import game_store
+from ordering import MOVES, MoveOrdering
+
+# Pondering: after answering a move request, the game keeps searching the position it expects next
+# (our move, then the replies the search predicted) in a background thread. Its results go into the
+# game's transposition table under the next turn, so the next search finds them. The next request of the
+# game stops it at once, requests of other games pause it, and it uses at most a share of one core.
+
+# Share of one core pondering may use, 0 disables it
+PONDER_CPU_SHARE = float(os.environ.get("PONDER_CPU_SHARE", "0"))
+
+# Pondering of a turn stops after this many ms even if no request came
+PONDER_MAX_MS = 2000
+
+# Pondering rests after every slice of this many ms of searching
+PONDER_SLICE_MS = 5
+
+# Move requests being answered right now, pondering waits while there are any
+active_requests = 0
+active_requests_lock = threading.Lock()
+
+
+# Search context of pondering: stops when told to, and rests in timeUp to keep to its share of the CPU
+class PonderContext(minimax.SearchContext):
+    def __init__(self, engine, stop_time_ms, transposition_table, move_ordering, evaluation_cache, cpu_share):
+        minimax.SearchContext.__init__(self, engine, stop_time_ms, transposition_table, move_ordering,
+                                       evaluation_cache)
+        self.cpu_share = cpu_share
+        self.stopped = threading.Event()
+        self.slice_start = time.perf_counter()
+
+    def stop(self):
+        self.stopped.set()
+
+    def timeUp(self):
+        if (self.stopped.is_set() or time.time()*1000 >= self.stop_time_ms):
+            return True
+
+        searched = time.perf_counter() - self.slice_start
+        if (searched >= PONDER_SLICE_MS / 1000):
+            # Rest in proportion to the time searched, and for as long as a request is being answered
+            rest_until = time.perf_counter() + searched * (1 - self.cpu_share) / self.cpu_share
+            while (time.perf_counter() < rest_until or active_requests > 0):
+                if (self.stopped.wait(PONDER_SLICE_MS / 1000)):
+                    return True
+            self.slice_start = time.perf_counter()
+
+        return False
+
+
+# A move request of the game arrived: stop its pondering and hold back the pondering of other games
+def requestStarted(game_state):
+    global active_requests
+    with active_requests_lock:
+        active_requests += 1
+
+    memory = game_store.get(game_state)
+    if (memory.ponder_context is not None):
+        memory.ponder_context.stop()
+
+
+# The request was answered with the given move: ponder the position expected after it
+def requestFinished(game_state, move):
+    global active_requests
+    with active_requests_lock:
+        active_requests -= 1
+
+    if (PONDER_CPU_SHARE > 0 and move in MOVES):
+        startPondering(game_state, move)
+
+
+# Position expected on the next turn: our move, then the other snakes' moves from the principal variation,
+# their first legal move where it ends. Returns the search state, or None if our snake does not survive it
+def predictedPosition(engine, memory, game_state, move):
+    main_snake_id = game_state["you"]["id"]
+    search_state = engine.createGameState(game_state, main_snake_id, memory.slots)
+    snake_count = len(game_state["board"]["snakes"])
+
+    table_context = minimax.SearchContext(engine, float("inf"), memory.transposition_table, None)
+    table_context.best_reply = memory.search_mode == "best_reply"
+    principal_variation = minimax.principalVariation(table_context, search_state, main_snake_id, move, snake_count)
+
+    curr_snake_id = main_snake_id
+    for ply in range(snake_count):
+        if (engine.isGameOver(search_state, curr_snake_id)):
+            break
+        if (ply < len(principal_variation)):
+            curr_move = principal_variation[ply][1]
+        else:
+            legal_moves = engine.legalMoves(search_state, curr_snake_id, main_snake_id, True)
+            curr_move = legal_moves[0] if legal_moves else move
+        next_snake_id = engine.nextSnakeId(search_state, curr_snake_id)
+        engine.applyMove(search_state, curr_snake_id, curr_move)
+        curr_snake_id = next_snake_id
+
+    if (engine.isGameOver(search_state, main_snake_id)):
+        return None
+    return search_state
+
+
+def startPondering(game_state, move):
+    memory = game_store.get(game_state)
+    if (memory.transposition_table is None):
+        return
+
+    next_turn = game_state["turn"] + 1
+    move_ordering = MoveOrdering()
+    move_ordering.newSearch(memory.game_id, next_turn)
+    context = PonderContext(minimax.getEngine(minimax.SEARCH_ENGINE), time.time()*1000 + PONDER_MAX_MS,
+                            memory.transposition_table, move_ordering, memory.evaluation_cache, PONDER_CPU_SHARE)
+    context.best_reply = memory.search_mode == "best_reply"
+    memory.ponder_context = context
+
+    thread = threading.Thread(target=ponder, args=(context, memory, game_state, move), daemon=True)
+    thread.start()
+
+
+# Iterative deepening of the expected position, its results are stored as the next turn's
+def ponder(context, memory, game_state, move):
+    main_snake_id = game_state["you"]["id"]
+    next_turn = game_state["turn"] + 1
+
+    with memory.lock:
+        if (context.timeUp()):
+            return
+        search_state = predictedPosition(context.engine, memory, game_state, move)
+        if (search_state is None):
+            return
+        memory.transposition_table.newGeneration(next_turn)
+
+        best_move = None
+        depth_values = {}
+        snake_count = len(game_state["board"]["snakes"])
+        for depth in range(1, context.max_depth + 1):
+            curr_value, curr_move, finished = minimax.aspirationSearch(
+                context, search_state, depth, main_snake_id, next_turn, best_move,
+                minimax.aspirationCenter(context, depth_values, depth, snake_count))
+            if (not finished):
+                break
+            context.completed_depth = depth
+            depth_values[depth] = curr_value
+            best_move = curr_move
+            if (curr_value in [float("inf"), float("-inf")]):
+                break
+
+    print("Pondered turn " + str(next_turn) + ": " + str(context.stats()))
@@ -0,0 +1,97 @@
+import time
+
+from bitboard import boardGeometry, releaseGeometry
+from gamestore import game_store
+from minimax import cellNeighbours, releaseNeighbours
+from transposition import releaseZobristKeys, zobristKeys
+
+# Game start stage: start() builds the static tables of the game's board before its first move request, so they
+# are not built on turn 0's clock. These are the cell neighbours of the flood fill and the pathfinder, the
+# bitboard's column masks and the Zobrist keys. The tables are shared by every game on a board of the same size.
+# end() releases them from the server process once no game kept by the game store plays on that size. Search
+# workers build the tables of the standard board sizes in the pool initializer and keep them; a worker builds
+# the tables of any other size with its first search on it.
+# Every searched turn records its preprocessing and first answer ms, end() prints turn 0 against the later turns.
+
+# Board sizes whose tables every search worker builds when it starts, for up to MAX_PREPARED_SNAKES snakes
+STANDARD_BOARD_SIZES = [(7, 7), (11, 11), (19, 19)]
+MAX_PREPARED_SNAKES = 8
+
+# Boards whose tables start() built, keyed by (width, height, ruleset), with the ms it took
+prepared_boards = {}
+
+
+# Key of the game's board: width, height and the name of the ruleset
+def boardKey(game_state):
+    ruleset = game_state["game"].get("ruleset") or {}
+    return game_state["board"]["width"], game_state["board"]["height"], ruleset.get("name", "standard")
+
+
+# Build the tables of a board size and snake count
+def buildTables(board_width, board_height, snake_count):
+    cellNeighbours(board_width, board_height)
+    boardGeometry(board_width, board_height)
+    zobristKeys(board_width, board_height, snake_count)
+
+
+# Build the tables of every standard board size and snake count, run by each search worker as it starts
+def buildStandardTables():
+    for board_width, board_height in STANDARD_BOARD_SIZES:
+        for snake_count in range(1, MAX_PREPARED_SNAKES + 1):
+            buildTables(board_width, board_height, snake_count)
+
+
+def releaseTables(board_width, board_height):
+    releaseNeighbours(board_width, board_height)
+    releaseGeometry(board_width, board_height)
+    releaseZobristKeys(board_width, board_height)
+
+
+# Build the tables of the game's board, called by start(). The Zobrist keys are built for the snakes of the
+# first turn, the hash slots of the whole game. Returns the ms the server process took
+def prepareBoard(game_state):
+    start_ms = time.time()*1000
+    board_width, board_height, _ = board_key = boardKey(game_state)
+    snake_count = len(game_state["board"]["snakes"])
+
+    buildTables(board_width, board_height, snake_count)
+    build_ms = time.time()*1000 - start_ms
+    prepared_boards.setdefault(board_key, build_ms)
+    return build_ms
+
+
+# Release the tables of the game's board when no other game plays on its size, called by end() after the game
+# left the game store. Returns whether they were released
+def releaseBoard(game_state):
+    board_width, board_height, _ = boardKey(game_state)
+    if (game_store.playsBoard((board_width, board_height))):
+        return False
+
+    for board_key in [board_key for board_key in prepared_boards if board_key[:2] == (board_width, board_height)]:
+        prepared_boards.pop(board_key, None)
+    releaseTables(board_width, board_height)
+    return True
+
+
+# Record the preprocessing ms of a searched turn and the ms to the first finished depth (None when the
+# search gives none, the worker pool and Monte Carlo tree search answer at the deadline)
+def recordTimings(memory, turn, preprocessing_ms):
+    memory.answer_timings.append((turn, preprocessing_ms, memory.first_answer_ms))
+
+
+def meanMs(values):
+    values = [value for value in values if value is not None]
+    if (not values):
+        return "-"
+    return str(round(sum(values) / len(values), 1)) + " ms"
+
+
+# Preprocessing and first answer ms of turn 0 against the mean of the later turns
+def timingReport(memory):
+    first_turn = [timings for timings in memory.answer_timings if timings[0] == 0]
+    later_turns = [timings for timings in memory.answer_timings if timings[0] != 0]
+    return ("turn 0: preprocessing " + meanMs([timings[1] for timings in first_turn])
+            + ", first answer " + meanMs([timings[2] for timings in first_turn])
+            + "; later turns (" + str(len(later_turns)) + "): preprocessing "
+            + meanMs([timings[1] for timings in later_turns])
+            + ", first answer " + meanMs([timings[2] for timings in later_turns]))
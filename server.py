@@ -1,5 +1,6 @@
 import logging
 import os
+import time
 import typing
 
 from flask import Flask
@@ -21,8 +22,10 @@ def run_server(handlers: typing.Dict):
 
     @app.post("/move")
     def on_move():
+        # The move's clock starts before the request body is parsed
+        request_time_ms = time.time() * 1000
         game_state = request.get_json()
-        return handlers["move"](game_state)
+        return handlers["move"](game_state, request_time_ms)
 
     @app.post("/end")
     def on_end():
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules live at the repo root and the tests import their helpers as tests.<module>, so the root is put on
+# the import path whatever directory pytest is started from
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
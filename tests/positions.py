@@ -0,0 +1,68 @@
+import random
+
+# Random positions of the move request format for the tests, reproducible from the random generator.
+# Snakes are random walks (some with a stacked tail, as after eating), food is on free cells
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+# Body of a random walk from a free cell, None when it could not grow to 2 cells
+def randomBody(rng, board_width, board_height, occupied, length):
+    start = (rng.randrange(board_width), rng.randrange(board_height))
+    if (start in occupied):
+        return None
+
+    body = [start]
+    while (len(body) < length):
+        x, y = body[-1]
+        free_cells = [(x + dx, y + dy) for dx, dy in DIRECTIONS
+                      if 0 <= x + dx < board_width and 0 <= y + dy < board_height
+                      and (x + dx, y + dy) not in occupied and (x + dx, y + dy) not in body]
+        if (not free_cells):
+            break
+        body.append(rng.choice(free_cells))
+
+    if (len(body) < 2):
+        return None
+    if (rng.random() < 0.2):
+        body.append(body[-1])
+    return body
+
+
+def randomPosition(rng, snake_count=4, board_width=11, board_height=11, food_count=5):
+    occupied = set()
+    snakes = []
+    for index in range(snake_count):
+        for _ in range(100):
+            body = randomBody(rng, board_width, board_height, occupied, rng.randint(2, 12))
+            if (body is None):
+                continue
+            occupied.update(body)
+            cells = [{"x": x, "y": y} for x, y in body]
+            snake_id = "s" + str(index)
+            snakes.append({"id": snake_id, "name": snake_id, "health": rng.randint(1, 100), "body": cells,
+                           "head": dict(cells[0]), "length": len(cells), "latency": "", "shout": ""})
+            break
+
+    food = []
+    for _ in range(food_count):
+        cell = (rng.randrange(board_width), rng.randrange(board_height))
+        if (cell not in occupied):
+            occupied.add(cell)
+            food.append({"x": cell[0], "y": cell[1]})
+
+    return {"game": {"id": "test", "ruleset": {"name": "standard"}, "timeout": 500}, "turn": rng.randint(0, 200),
+            "board": {"width": board_width, "height": board_height, "snakes": snakes, "food": food,
+                      "hazards": []},
+            "you": snakes[0]}
+
+
+# Random positions where every one of the snakes could be placed
+def randomPositions(seed, count, snake_count=4):
+    rng = random.Random(seed)
+    positions = []
+    while (len(positions) < count):
+        position = randomPosition(rng, snake_count)
+        if (len(position["board"]["snakes"]) == snake_count):
+            positions.append(position)
+    return positions
@@ -0,0 +1,66 @@
+import copy
+
+from boardmodel import BoardModel, boardModel, releaseBoardModel
+
+
+def snake(snake_id, body, health=90):
+    cells = [{"x": x, "y": y} for x, y in body]
+    return {"id": snake_id, "name": snake_id, "health": health, "body": cells, "head": dict(cells[0]),
+            "length": len(cells), "latency": "", "shout": ""}
+
+
+# 5x4 board: our snake along the bottom row heading right, the other one up the right column
+def gameState():
+    you = snake("you", [(2, 0), (1, 0), (0, 0)])
+    other = snake("other", [(4, 2), (4, 1), (4, 0)])
+    return {"game": {"id": "model", "ruleset": {"name": "standard"}, "timeout": 500}, "turn": 3,
+            "board": {"width": 5, "height": 4, "snakes": [you, other], "food": [{"x": 0, "y": 3}], "hazards": []},
+            "you": you}
+
+
+def test_cells_are_row_major_with_rows_from_the_top():
+    model = BoardModel(gameState())
+
+    assert model.cell(0, 3) == 0
+    assert model.cell(2, 0) == 3 * 5 + 2
+    assert model.coordinates(17) == (2, 0)
+    assert model.food == [0]
+    assert model.snake("you").body == [17, 16, 15]
+    assert model.snake("other").body == [9, 14, 19]
+    assert model.cells[17] == 2 and model.head_cells[17] == "you"
+    assert model.cells[16] == "you"
+    assert model.cells[0] == 1
+
+
+def test_moves_follow_the_request_directions():
+    model = BoardModel(gameState())
+
+    assert model.coordinates(model.moveCell(17, "up")) == (2, 1)
+    assert model.coordinates(model.moveCell(17, "right")) == (3, 0)
+    assert model.moveCell(17, "down") is None
+    assert model.moveCell(15, "left") is None
+    assert model.cellMove(17, model.cell(2, 1)) == "up"
+
+
+def test_blocked_cells_are_the_bodies_and_with_extra_safe_the_cells_next_to_other_heads():
+    model = BoardModel(gameState())
+
+    blocked = {model.coordinates(cell) for cell, is_blocked in enumerate(model.blockedCells()) if is_blocked}
+    assert blocked == {(1, 0), (0, 0), (4, 2), (4, 1), (4, 0)}
+
+    extra_blocked = {model.coordinates(cell) for cell, is_blocked in enumerate(model.blockedCells(True))
+                     if is_blocked}
+    assert extra_blocked == blocked | {(3, 2), (4, 3)}
+
+
+def test_model_is_kept_for_the_request_itself_until_released():
+    game_state = gameState()
+    model = boardModel(game_state)
+
+    assert boardModel(game_state) is model
+    assert boardModel(copy.deepcopy(game_state)) is not model
+    assert set(game_state) == {"game", "turn", "board", "you"}
+
+    releaseBoardModel(game_state)
+    assert boardModel(game_state) is not model
+    releaseBoardModel(game_state)
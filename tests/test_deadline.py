@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+import deadline
+from gamestore import GameMemory
+from tests.positions import randomPositions
+
+
+def gameState(timeout=500, turn=10, latency=""):
+    game_state = randomPositions(1, 1, snake_count=2)[0]
+    game_state["game"]["timeout"] = timeout
+    game_state["turn"] = turn
+    game_state["you"]["latency"] = latency
+    return game_state
+
+
+def test_budget_is_the_timeout_less_latency_and_safety_margin():
+    game_state = gameState(timeout=500)
+    request_time_ms = time.time()*1000 - 50
+    soft_stop_time_ms, stop_time_ms = deadline.searchDeadlines(game_state, request_time_ms, GameMemory(game_state))
+
+    budget_ms = 500 - deadline.DEFAULT_NETWORK_LATENCY_MS - deadline.DEADLINE_SAFETY_MS
+    assert stop_time_ms - request_time_ms == pytest.approx(budget_ms)
+    assert soft_stop_time_ms - request_time_ms == pytest.approx(budget_ms * deadline.SOFT_DEADLINE_SHARE)
+
+
+def test_game_without_timeout_gets_the_default_timeout():
+    game_state = gameState()
+    del game_state["game"]["timeout"]
+    request_time_ms = time.time()*1000
+    _, stop_time_ms = deadline.searchDeadlines(game_state, request_time_ms, GameMemory(game_state))
+
+    assert stop_time_ms - request_time_ms == pytest.approx(
+        deadline.DEFAULT_TIMEOUT_MS - deadline.DEFAULT_NETWORK_LATENCY_MS - deadline.DEADLINE_SAFETY_MS)
+
+
+# The time spent before the search already took the whole budget: the search still gets MIN_SEARCH_MS from now
+def test_search_gets_at_least_the_minimum_time():
+    game_state = gameState(timeout=150)
+    request_time_ms = time.time()*1000 - 200
+    before_ms = time.time()*1000
+    _, stop_time_ms = deadline.searchDeadlines(game_state, request_time_ms, GameMemory(game_state))
+
+    assert before_ms + deadline.MIN_SEARCH_MS <= stop_time_ms <= time.time()*1000 + deadline.MIN_SEARCH_MS
+
+
+def test_latency_is_the_default_until_the_game_reports_one():
+    game_state = gameState(turn=0, latency="")
+    assert deadline.networkLatency(game_state, GameMemory(game_state)) == deadline.DEFAULT_NETWORK_LATENCY_MS
+
+
+# The reported latency of our last response less the time we took is a sample, smoothed over the turns
+def test_latency_is_a_rolling_estimate_after_the_responses():
+    game_state = gameState(turn=5)
+    memory = GameMemory(game_state)
+
+    deadline.responseSent(game_state, time.time()*1000 - 120, memory)
+    assert memory.response_turn == 5
+    assert memory.response_ms == pytest.approx(120, abs=20)
+    memory.response_ms = 120
+
+    game_state = gameState(turn=6, latency="180")
+    assert deadline.networkLatency(game_state, memory) == pytest.approx(60)
+    # The request's latency counts once
+    assert deadline.networkLatency(game_state, memory) == pytest.approx(60)
+
+    deadline.responseSent(game_state, time.time()*1000, memory)
+    memory.response_ms = 100
+    game_state = gameState(turn=7, latency="200")
+    assert deadline.networkLatency(game_state, memory) == pytest.approx(60 + deadline.LATENCY_SMOOTHING * (100 - 60))
+
+
+# A latency reported for a response other than the last turn's does not tell the network latency
+def test_latency_of_a_skipped_turn_is_not_sampled():
+    game_state = gameState(turn=5)
+    memory = GameMemory(game_state)
+    deadline.responseSent(game_state, time.time()*1000, memory)
+
+    game_state = gameState(turn=8, latency="180")
+    assert deadline.networkLatency(game_state, memory) == deadline.DEFAULT_NETWORK_LATENCY_MS
@@ -0,0 +1,112 @@
+import copy
+import random
+
+import pytest
+
+import minimax
+from ordering import MOVES
+from tests.positions import randomPositions
+from transposition import snakeHash
+
+# Random games played move by move on the grid and the bitboard engine at once. After every move both engines
+# must hold the same position and evaluate it the same, the incrementally updated hash must equal a full rehash
+# of it, and taking the moves back must restore every state exactly
+
+GAME_MOVES = 60
+
+
+# Food cells, turn, snake to move and every snake's alive flag, health and body cells of a grid state
+def gridPosition(game_state):
+    board_state = game_state["board"]["state_board"]
+    board_width = len(board_state[0])
+    food = sorted(y * board_width + x for y, row in enumerate(board_state) for x, cell in enumerate(row)
+                  if cell == 1)
+    snakes = [(snake["id"], snake["alive"], snake["health"],
+               tuple(body["y"] * board_width + body["x"] for body in snake["body"]))
+              for snake in game_state["snakes"]]
+    return game_state["turn"], game_state["curr_snake_id"], food, snakes
+
+
+# Same as gridPosition for a bitboard state
+def bitboardPosition(game_state):
+    food = [cell for cell in range(game_state.width * game_state.height) if game_state.food >> cell & 1]
+    snakes = [(snake.id, snake.alive, snake.health, tuple(snake.body)) for snake in game_state.snakes]
+    return game_state.turn, game_state.curr_snake_id, food, snakes
+
+
+# Hash of a position built from scratch, as createGameState does
+def fullHash(keys, slots, position):
+    _, _, food, snakes = position
+    position_hash = 0
+    for cell in food:
+        position_hash ^= keys.food[cell]
+    for snake_id, alive, health, body in snakes:
+        if (alive):
+            position_hash ^= snakeHash(keys, slots[snake_id], list(body), health)
+    return position_hash
+
+
+# Everything undoMove has to restore in a bitboard state
+def bitboardSnapshot(game_state):
+    snakes = [(snake.id, tuple(snake.body), snake.mask, snake.health, snake.slot, snake.hash, snake.alive)
+              for snake in game_state.snakes]
+    head_snakes = sorted((cell, snake.id) for cell, snake in game_state.head_snakes.items())
+    return (game_state.turn, game_state.curr_snake_id, game_state.food, game_state.occupied, game_state.heads,
+            head_snakes, game_state.hash, snakes)
+
+
+def gridSnapshot(game_state):
+    return copy.deepcopy(game_state)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3, 4])
+def test_engines_agree_move_by_move_and_undo_restores(seed):
+    grid = minimax.getEngine("grid")
+    bitboard = minimax.getEngine("bitboard")
+    rng = random.Random(seed)
+    moves_played = 0
+
+    for position in randomPositions(seed, 10, snake_count=rng.randint(2, 4)):
+        snake_id = position["you"]["id"]
+        grid_state = grid.createGameState(position, snake_id)
+        bitboard_state = bitboard.createGameState(position, snake_id)
+        assert gridPosition(grid_state) == bitboardPosition(bitboard_state)
+
+        undo_records = []
+        for _ in range(GAME_MOVES):
+            if (grid.isGameOver(grid_state, snake_id)):
+                break
+
+            # Mostly moves that stay on the board, sometimes any move to run into walls and bodies
+            moves = grid.legalMoves(grid_state, snake_id, position["you"]["id"], False)
+            assert moves == bitboard.legalMoves(bitboard_state, snake_id, position["you"]["id"], False)
+            move = rng.choice(moves if moves and rng.random() < 0.9 else MOVES)
+
+            snapshots = (gridSnapshot(grid_state), bitboardSnapshot(bitboard_state))
+            grid_undo = grid.applyMove(grid_state, snake_id, move)
+            bitboard_undo = bitboard.applyMove(bitboard_state, snake_id, move)
+            undo_records.append((snapshots, grid_undo, bitboard_undo))
+            moves_played += 1
+
+            grid_position = gridPosition(grid_state)
+            assert grid_position == bitboardPosition(bitboard_state)
+            assert grid_state["hash"] == fullHash(grid_state["zobrist_keys"], grid_state["slots"], grid_position)
+            assert bitboard_state.hash == grid_state["hash"]
+            assert bitboard_state.head_snakes == {snake.body[0]: snake for snake in bitboard_state.snakes
+                                                  if snake.alive}
+
+            next_snake_id = grid.nextSnakeId(grid_state, snake_id)
+            assert next_snake_id == bitboard.nextSnakeId(bitboard_state, snake_id)
+            snake_id = next_snake_id
+            main_snake_id = position["you"]["id"]
+            assert (grid.evaluatePoint(grid_state, 0, main_snake_id, snake_id, position["turn"])
+                    == bitboard.evaluatePoint(bitboard_state, 0, main_snake_id, snake_id, position["turn"]))
+            assert grid.positionKey(grid_state, snake_id) == bitboard.positionKey(bitboard_state, snake_id)
+
+        for (grid_snapshot, bitboard_snapshot), grid_undo, bitboard_undo in reversed(undo_records):
+            grid.undoMove(grid_state, grid_undo)
+            bitboard.undoMove(bitboard_state, bitboard_undo)
+            assert grid_state == grid_snapshot
+            assert bitboardSnapshot(bitboard_state) == bitboard_snapshot
+
+    assert moves_played > 200
@@ -0,0 +1,126 @@
+import copy
+import time
+
+import minimax
+from gamestore import GameMemory, GameStore, gameKey, headMove
+from tests.positions import randomPositions
+
+
+def gameState(game_id, you_index=0):
+    game_state = randomPositions(3, 1, snake_count=2)[0]
+    game_state["game"]["id"] = game_id
+    game_state["you"] = game_state["board"]["snakes"][you_index]
+    return game_state
+
+
+def test_least_recently_used_game_is_evicted_above_the_size_limit():
+    store = GameStore(8, 60)
+    games = [gameState("game " + str(index)) for index in range(8)]
+    for game_state in games:
+        store.create(game_state)
+
+    store.get(games[0])
+    store.create(gameState("game 8"))
+
+    assert gameKey(games[0]) in store.keys()
+    assert gameKey(games[1]) not in store.keys()
+    assert len(store.keys()) == 8
+    assert store.stats()["evicted"] == 1
+
+
+def test_expired_game_is_evicted_with_the_next_lookup():
+    store = GameStore(8, 60)
+    expired = gameState("expired")
+    kept = gameState("kept")
+    store.create(expired).last_used = time.time() - 61
+    store.create(kept)
+
+    store.get(kept)
+    assert store.keys() == [gameKey(kept)]
+
+
+def test_release_keeps_our_other_snake_in_the_game():
+    store = GameStore(8, 60)
+    first = gameState("shared")
+    second = gameState("shared", you_index=1)
+    store.create(first)
+    store.create(second)
+
+    store.release(first)
+    assert store.keys() == [gameKey(second)]
+
+
+def test_head_moves_are_in_request_coordinates():
+    assert headMove((5, 5), (5, 6)) == "up"
+    assert headMove((5, 5), (5, 4)) == "down"
+    assert headMove((5, 5), (4, 5)) == "left"
+    assert headMove((5, 5), (6, 5)) == "right"
+
+
+# A round of the engine where every snake goes up when it can, else takes its first legal move, in the snake order
+# of the search. Returns the principal variation of the round followed by our next move and the request of the
+# next turn, None when a snake has no move that keeps it alive
+def playedRound(game_state):
+    engine = minimax.getEngine("grid")
+    main_snake_id = game_state["you"]["id"]
+    search_state = engine.createGameState(game_state, main_snake_id)
+    board_height = game_state["board"]["height"]
+
+    principal_variation = []
+    snake_id = main_snake_id
+    for _ in game_state["board"]["snakes"]:
+        moves = engine.legalMoves(search_state, snake_id, main_snake_id, True)
+        if (not moves):
+            return None
+        move = "up" if "up" in moves else moves[0]
+        principal_variation.append((snake_id, move))
+        next_snake_id = engine.nextSnakeId(search_state, snake_id)
+        engine.applyMove(search_state, snake_id, move)
+        snake_id = next_snake_id
+    moves = engine.legalMoves(search_state, main_snake_id, main_snake_id, True)
+    if (not moves or any(not snake["alive"] for snake in search_state["snakes"])):
+        return None
+    principal_variation.append((main_snake_id, moves[0]))
+
+    # The engine's rows count down from the top of the board, the request's y counts up from the bottom
+    next_state = copy.deepcopy(game_state)
+    next_state["turn"] += 1
+    for snake, searched_snake in zip(next_state["board"]["snakes"], search_state["snakes"]):
+        snake["head"] = {"x": searched_snake["head"]["x"], "y": board_height - 1 - searched_snake["head"]["y"]}
+    return principal_variation, next_state
+
+
+def roundPosition():
+    for position in randomPositions(4, 20, snake_count=3):
+        played_round = playedRound(position)
+        if (played_round is not None and any(move == "up" for _, move in played_round[0][:-1])):
+            return (position,) + played_round
+    raise AssertionError("no position where every snake moves and one goes up")
+
+
+def test_expected_move_follows_the_principal_variation_the_snakes_played():
+    position, principal_variation, next_state = roundPosition()
+    memory = GameMemory(position)
+    memory.update(position, principal_variation)
+
+    played_moves = memory.playedMoves(next_state)
+    assert played_moves == dict(principal_variation[:-1])
+    assert memory.expectedMove(next_state, position["you"]["id"]) == principal_variation[-1][1]
+
+
+def test_expected_move_is_dropped_when_a_snake_deviated_or_a_turn_was_skipped():
+    position, principal_variation, next_state = roundPosition()
+    memory = GameMemory(position)
+    memory.update(position, principal_variation)
+
+    skipped_state = copy.deepcopy(next_state)
+    skipped_state["turn"] += 1
+    assert memory.expectedMove(skipped_state, position["you"]["id"]) is None
+
+    # A snake went down instead of up
+    deviated_state = copy.deepcopy(next_state)
+    up_snake_id = next(snake_id for snake_id, move in principal_variation[:-1] if move == "up")
+    for snake in deviated_state["board"]["snakes"]:
+        if (snake["id"] == up_snake_id):
+            snake["head"]["y"] -= 2
+    assert memory.expectedMove(deviated_state, position["you"]["id"]) is None
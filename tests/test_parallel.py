@@ -0,0 +1,54 @@
+import time
+
+import minimax
+import parallel
+from gamestore import game_store, gameKey
+from tests.positions import randomPositions
+
+INF = float("inf")
+
+
+def test_merged_root_move_takes_the_worst_reply():
+    reply_values = {"up": [1, 2, 3], "down": [0, 5]}
+    assert parallel.mergeRootMove(reply_values, None) == [0, 2]
+
+
+# While the opponent is too far away to branch, the serial search lets it play its distant reply only
+def test_merged_root_move_plays_the_distant_reply_while_the_opponent_is_far():
+    reply_values = {"up": [1, 2, 3], "down": [0, 5, 4]}
+    distant_reply = ("up", minimax.INTERACTION_MARGIN + 1)
+    assert parallel.mergeRootMove(reply_values, distant_reply) == [1, 2, 3]
+
+
+def test_best_merged_move_compares_the_depth_every_finished_move_reached():
+    tasks = [("up", None), ("down", None), ("left", "up"), ("left", "down")]
+    task_values = [[1, 5], [2, 3, 9], [8, 9], [7]]
+    # left finished depth 1 only (its worst reply), so depth 1 is compared: left 7 against up 1 and down 2
+    assert parallel.bestMergedMove(tasks, task_values, {}) == ("left", 7, 1)
+
+    task_values[3].append(0)
+    assert parallel.bestMergedMove(tasks, task_values, {}) == ("up", 5, 2)
+
+
+def test_best_merged_move_picks_an_unfinished_move_over_sure_losses():
+    tasks = [("up", None), ("down", None), ("left", None)]
+    assert parallel.bestMergedMove(tasks, [[], [], []], {}) == (None, None, 0)
+    assert parallel.bestMergedMove(tasks, [[1], [], []], {}) == ("up", 1, 1)
+    assert parallel.bestMergedMove(tasks, [[-INF], [-INF], []], {}) == ("left", -INF, 1)
+
+
+# searchTasks as a worker runs it: the game's slots from the server process are used and the games the server
+# process no longer keeps are released
+def test_search_tasks_use_the_game_slots_and_release_ended_games():
+    ended, position = randomPositions(7, 2, snake_count=3)
+    ended["game"]["id"] = "ended"
+    position["game"]["id"] = "kept"
+    game_store.create(ended)
+    game_slots = {snake["id"]: slot for slot, snake in enumerate(reversed(position["board"]["snakes"]))}
+
+    parallel.searchTasks(position, "grid", [(0, ("up", None))], time.time()*1000 + 20, "paranoid", None,
+                         game_slots, [gameKey(position)])
+
+    assert game_store.get(position).slots == game_slots
+    assert gameKey(ended) not in game_store.keys()
+    game_store.release(position)
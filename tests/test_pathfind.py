@@ -0,0 +1,52 @@
+from boardmodel import BoardModel
+from pathfind import findPath
+
+
+def snake(snake_id, body):
+    cells = [{"x": x, "y": y} for x, y in body]
+    return {"id": snake_id, "name": snake_id, "health": 90, "body": cells, "head": dict(cells[0]),
+            "length": len(cells), "latency": "", "shout": ""}
+
+
+# 7x7 board: our snake in the bottom left corner, the other one walls in the top right corner cell (6, 6)
+def boardModel():
+    you = snake("you", [(1, 1), (1, 0), (0, 0)])
+    other = snake("other", [(4, 6), (5, 6), (5, 5), (6, 5), (6, 4)])
+    return BoardModel({"game": {"id": "path", "ruleset": {"name": "standard"}, "timeout": 500}, "turn": 5,
+                       "board": {"width": 7, "height": 7, "snakes": [you, other], "food": [], "hazards": []},
+                       "you": you})
+
+
+def path(model, start, target):
+    return findPath(model.blockedCells(), model.width, model.height, model.cell(*start), model.cell(*target))
+
+
+def test_shortest_path_to_a_reachable_target():
+    model = boardModel()
+
+    first_step, path_length = path(model, (1, 1), (4, 3))
+    assert path_length == 5
+    assert model.coordinates(first_step) in [(2, 1), (1, 2)]
+
+    first_step, path_length = path(model, (1, 1), (1, 2))
+    assert (model.coordinates(first_step), path_length) == ((1, 2), 1)
+
+
+# Around our own body: the head cannot go through its neck
+def test_path_goes_around_the_bodies():
+    model = boardModel()
+
+    first_step, path_length = path(model, (1, 1), (2, 0))
+    assert (model.coordinates(first_step), path_length) == ((2, 1), 2)
+
+
+def test_target_enclosed_by_bodies_is_unreachable():
+    model = boardModel()
+    assert path(model, (1, 1), (6, 6)) is None
+
+
+# Every body cell is blocked, our tail too, as on the board of the move checks
+def test_target_on_our_own_tail_is_blocked():
+    model = boardModel()
+    assert path(model, (1, 1), (0, 0)) is None
+    assert path(model, (1, 1), (1, 1)) is None
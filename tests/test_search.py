@@ -0,0 +1,44 @@
+import copy
+
+import minimax
+from tests.positions import randomPositions
+
+
+# Iterative deepening of a fixed number of aspiration searches after the first round, as gameMiniMax_value
+# deepens. Returns the aspiration windows searched and the ones that failed
+def aspirationFails(game_state, best_reply, aspirated_depths):
+    engine = minimax.getEngine("grid")
+    main_snake_id = game_state["you"]["id"]
+    context = minimax.createSearchContext(game_state, engine, float("inf"))
+    context.best_reply = best_reply
+    search_state = engine.createGameState(game_state, main_snake_id)
+    snake_count = len(game_state["board"]["snakes"])
+    first_aspirated = 3 if best_reply else snake_count + 1
+
+    depth_values = {}
+    best_move = None
+    for depth in range(1, first_aspirated + aspirated_depths):
+        value, move, _ = minimax.aspirationSearch(
+            context, search_state, depth, main_snake_id, game_state["turn"], best_move,
+            minimax.aspirationCenter(context, depth_values, depth, snake_count))
+        depth_values[depth] = value
+        best_move = move or best_move
+        if (value in [float("inf"), float("-inf")]):
+            return depth - first_aspirated + 1, context.aspiration_fails
+
+    return aspirated_depths, context.aspiration_fails
+
+
+# A best-reply round is our ply and the opponents' round ply, the window of a depth is centered on a value
+# of the same point of view, so it fails no more often than in paranoid search
+def test_best_reply_aspiration_fails_no_more_than_paranoid():
+    searched = {True: 0, False: 0}
+    fails = {True: 0, False: 0}
+    for seed in range(1, 5):
+        for game_state in randomPositions(seed, 12, snake_count=3):
+            for best_reply in [True, False]:
+                windows, window_fails = aspirationFails(copy.deepcopy(game_state), best_reply, 3)
+                searched[best_reply] += windows
+                fails[best_reply] += window_fails
+
+    assert fails[True] * searched[False] <= fails[False] * searched[True]
@@ -0,0 +1,49 @@
+import pytest
+
+import minimax
+import transposition
+
+
+def coiledPosition(body):
+    cells = [{"x": x, "y": y} for x, y in body]
+    snake = {"id": "coiled", "name": "coiled", "health": 90, "body": cells, "head": dict(cells[0]),
+             "length": len(cells), "latency": "", "shout": ""}
+    other = {"id": "other", "name": "other", "health": 90, "body": [{"x": 5, "y": 5}, {"x": 5, "y": 4}],
+             "head": {"x": 5, "y": 5}, "length": 2, "latency": "", "shout": ""}
+    return {"game": {"id": "test", "ruleset": {"name": "standard"}, "timeout": 500}, "turn": 10,
+            "board": {"width": 7, "height": 7, "snakes": [snake, other], "food": [], "hazards": []},
+            "you": snake}
+
+
+# Same head and cells, coiled the other way round a 2x2 block: another neck and another tail
+@pytest.mark.parametrize("engine_name", ["grid", "bitboard"])
+def test_coiled_snakes_with_another_tail_hash_apart(engine_name):
+    engine = minimax.getEngine(engine_name)
+    clockwise = coiledPosition([(0, 0), (0, 1), (1, 1), (1, 0)])
+    counterclockwise = coiledPosition([(0, 0), (1, 0), (1, 1), (0, 1)])
+
+    clockwise_state = engine.createGameState(clockwise, "coiled")
+    counterclockwise_state = engine.createGameState(counterclockwise, "coiled")
+    assert (engine.positionKey(clockwise_state, "coiled")
+            != engine.positionKey(counterclockwise_state, "coiled"))
+
+
+def healthPosition(health):
+    position = coiledPosition([(0, 0), (0, 1), (1, 1), (1, 0)])
+    position["you"]["health"] = health
+    return position
+
+
+# A snake that may starve within the search is hashed with its exact health, a healthy one in buckets
+@pytest.mark.parametrize("engine_name", ["grid", "bitboard"])
+def test_health_is_hashed_exactly_within_the_search_horizon(engine_name):
+    engine = minimax.getEngine(engine_name)
+
+    def key(health):
+        return engine.positionKey(engine.createGameState(healthPosition(health), "coiled"), "coiled")
+
+    assert transposition.EXACT_HEALTH >= minimax.MAX_SEARCH_DEPTH
+    assert len({key(health) for health in range(1, transposition.EXACT_HEALTH + 1)}) == transposition.EXACT_HEALTH
+    assert key(transposition.EXACT_HEALTH) != key(transposition.EXACT_HEALTH + 1)
+    assert key(96) == key(99)
+    assert key(99) != key(100)
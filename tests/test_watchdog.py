@@ -0,0 +1,68 @@
+import time
+
+import minimax
+import watchdog
+from gamestore import game_store
+from tests.positions import randomPositions
+
+# Timeout of the requests: 150 ms less the default latency and the safety margin leaves a 20 ms search
+TIMEOUT_MS = 150
+
+
+def gameState(game_id):
+    game_state = randomPositions(2, 1, snake_count=2)[0]
+    game_state["game"]["id"] = game_id
+    game_state["game"]["timeout"] = TIMEOUT_MS
+    return game_state
+
+
+# A search that registers its context and publishes published_move, then runs far past the deadline
+def slowSearch(published_move, contexts):
+    def chooseMove(game_state, request_time_ms):
+        memory = game_store.get(game_state)
+        context = minimax.SearchContext(None, float("inf"), None, None)
+        contexts.append(context)
+        memory.search_context = context
+        if (published_move is not None):
+            memory.answer_move = published_move
+        time.sleep(0.3)
+        return {"move": "down"}
+
+    return chooseMove
+
+
+def test_watchdog_answers_with_the_published_move_and_stops_the_search():
+    game_state = gameState("watchdog published")
+    contexts = []
+    fires = watchdog.watchdog_fires
+    request_time_ms = time.time()*1000
+
+    answer = watchdog.watchedMove(game_state, request_time_ms, slowSearch("left", contexts), "up")
+
+    assert answer == {"move": "left"}
+    assert time.time()*1000 - request_time_ms < 200
+    assert contexts[0].stop_time_ms == float("-inf")
+    assert watchdog.watchdog_fires == fires + 1
+    game_store.release(game_state)
+
+
+def test_watchdog_answers_with_the_cheap_move_before_the_search_published_one():
+    game_state = gameState("watchdog cheap")
+    fires = watchdog.watchdog_fires
+
+    answer = watchdog.watchedMove(game_state, time.time()*1000, slowSearch(None, []), "up")
+
+    assert answer == {"move": "up"}
+    assert watchdog.watchdog_fires == fires + 1
+    game_store.release(game_state)
+
+
+def test_watchdog_passes_a_search_in_time_through():
+    game_state = gameState("watchdog in time")
+    fires = watchdog.watchdog_fires
+
+    answer = watchdog.watchedMove(game_state, time.time()*1000, lambda *_: {"move": "right"}, "up")
+
+    assert answer == {"move": "right"}
+    assert watchdog.watchdog_fires == fires
+    game_store.release(game_state)
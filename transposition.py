@@ -0,0 +1,239 @@
+import os
+import random
+
+# Zobrist hashing and the transposition table used by the alpha-beta search.
+# Cells are indexed as y * width + x in the y-flipped search coordinates, snakes by their slot
+# (index in the snake list when the search state was created).
+
+# Health up to this is hashed exactly: the snake may starve within the deepest search (minimax.MAX_SEARCH_DEPTH,
+# a snake moves at most once per ply), so one more or less health can change the value of the position
+EXACT_HEALTH = 64
+
+# Health above EXACT_HEALTH is hashed in buckets, the evaluation only looks at thresholds that are multiples of it
+HEALTH_BUCKET_SIZE = 5
+
+# Bound type of a stored score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Rough size of one table entry in memory (tuple, key, score and move), used to size the table
+ENTRY_BYTES = 200
+
+# Memory budget of the transposition table, 0 disables it
+TRANSPOSITION_TABLE_MB = float(os.environ.get("TRANSPOSITION_TABLE_MB", "16"))
+
+
+# Key mixed into the positions of best-reply search searched after an opponent of the round deviated
+# from its greedy move, they have another value than the same position before the deviation
+DEVIATED_KEY = random.Random("deviated").getrandbits(64)
+
+
+# Random 64 bit keys of the snake in one slot on a board size, the same for every snake count
+class SlotKeys:
+    def __init__(self, board_width, board_height, slot):
+        cell_count = board_width * board_height
+        rng = random.Random(f"{board_width}x{board_height} slot {slot}")
+
+        def randomKeys(count):
+            return [rng.getrandbits(64) for _ in range(count)]
+
+        self.body = randomKeys(cell_count)
+        self.head = randomKeys(cell_count)
+        self.length = randomKeys(cell_count + 2)
+        self.health = randomKeys(healthBucket(100) + 1)
+        self.to_move = rng.getrandbits(64)
+        self.tail = randomKeys(cell_count)
+        self.neck = randomKeys(cell_count)
+
+
+# Random 64 bit keys for every hashed feature of a board size and snake count, indexed by slot
+class ZobristKeys:
+    def __init__(self, board_width, board_height, snake_count):
+        rng = random.Random(f"{board_width}x{board_height}")
+        self.food = [rng.getrandbits(64) for _ in range(board_width * board_height)]
+
+        slots = [slotKeys(board_width, board_height, slot) for slot in range(snake_count)]
+        self.body = [slot_keys.body for slot_keys in slots]
+        self.head = [slot_keys.head for slot_keys in slots]
+        self.length = [slot_keys.length for slot_keys in slots]
+        self.health = [slot_keys.health for slot_keys in slots]
+        self.to_move = [slot_keys.to_move for slot_keys in slots]
+        self.tail = [slot_keys.tail for slot_keys in slots]
+        self.neck = [slot_keys.neck for slot_keys in slots]
+
+    # Keys never change, copies of a game state can share them
+    def __deepcopy__(self, memo):
+        return self
+
+
+_slot_keys_cache = {}
+_keys_cache = {}
+
+
+def slotKeys(board_width, board_height, slot):
+    cache_key = (board_width, board_height, slot)
+    keys = _slot_keys_cache.get(cache_key)
+
+    if (keys is None):
+        keys = SlotKeys(board_width, board_height, slot)
+        _slot_keys_cache[cache_key] = keys
+
+    return keys
+
+
+# Return the Zobrist keys of a board size and snake count, shared by every search
+def zobristKeys(board_width, board_height, snake_count):
+    cache_key = (board_width, board_height, snake_count)
+    keys = _keys_cache.get(cache_key)
+
+    if (keys is None):
+        keys = ZobristKeys(board_width, board_height, snake_count)
+        _keys_cache[cache_key] = keys
+
+    return keys
+
+
+# Drop the Zobrist keys of a board size for every snake count, see precompute.py
+def releaseZobristKeys(board_width, board_height):
+    for cache in [_keys_cache, _slot_keys_cache]:
+        for cache_key in list(cache):
+            if (cache_key[:2] == (board_width, board_height)):
+                cache.pop(cache_key, None)
+
+
+# Slot of every snake in the list. The slots of a game (taken on its first turn) are kept while they
+# cover every snake, so hashes of positions match between turns. Returns the slots and the slot count
+def snakeSlots(snakes, game_slots=None):
+    if (game_slots is None or any(snake["id"] not in game_slots for snake in snakes)):
+        return {snake["id"]: slot for slot, snake in enumerate(snakes)}, len(snakes)
+
+    return {snake["id"]: game_slots[snake["id"]] for snake in snakes}, len(game_slots)
+
+
+# Index of the health key: the health itself up to EXACT_HEALTH, its bucket above
+def healthBucket(health):
+    health = max(health, 0)
+    if (health <= EXACT_HEALTH):
+        return health
+    return EXACT_HEALTH + 1 + health // HEALTH_BUCKET_SIZE
+
+
+# Hash of one snake: occupied cells, head, neck, tail, length (stacked tail) and health (see healthBucket). The cells alone
+# do not tell the body order apart, the rules and the evaluation read the neck and the tail.
+# body_cells goes from head to tail and may contain stacked cells
+def snakeHash(keys, slot, body_cells, health):
+    snake_hash = keys.head[slot][body_cells[0]]
+    snake_hash ^= keys.tail[slot][body_cells[-1]]
+    if (len(body_cells) > 1):
+        snake_hash ^= keys.neck[slot][body_cells[1]]
+    snake_hash ^= keys.length[slot][len(body_cells)]
+    snake_hash ^= keys.health[slot][healthBucket(health)]
+    for cell in set(body_cells):
+        snake_hash ^= keys.body[slot][cell]
+
+    return snake_hash
+
+
+# Hash change of a snake moving its head, vacating its tail (or not), growing and changing health.
+# The old head becomes the neck, old_neck and new_tail are the neck before and the tail after the move.
+# From the body after the move, the old neck is the third cell, the old tail for a snake of two cells
+# (the third cell is then the grown segment) and None for a snake of one cell
+def moveHashDelta(keys, slot, old_head, head_cell, tail, tail_vacated, old_length, new_length, old_health, new_health,
+                  old_neck, new_tail):
+    delta = keys.head[slot][old_head] ^ keys.head[slot][head_cell] ^ keys.body[slot][head_cell]
+    if (tail_vacated):
+        delta ^= keys.body[slot][tail]
+    if (old_length != new_length):
+        delta ^= keys.length[slot][old_length] ^ keys.length[slot][new_length]
+    delta ^= keys.tail[slot][tail] ^ keys.tail[slot][new_tail]
+    if (old_neck is not None):
+        delta ^= keys.neck[slot][old_neck]
+    if (new_length > 1):
+        delta ^= keys.neck[slot][old_head]
+
+    old_bucket = healthBucket(old_health)
+    new_bucket = healthBucket(new_health)
+    if (old_bucket != new_bucket):
+        delta ^= keys.health[slot][old_bucket] ^ keys.health[slot][new_bucket]
+
+    return delta
+
+
+# Fixed size table of searched positions, indexed by the low bits of the position key.
+# An entry is (key, depth, bound, score, best move, generation). Replacement is depth-preferred:
+# a slot is overwritten when it is empty, holds the same position, an earlier generation or a search
+# that was not deeper. The generation is the turn of the search, entries of earlier turns stay in the
+# table for the moves they found
+class TranspositionTable:
+    def __init__(self, memory_mb):
+        max_entries = max(int(memory_mb * 1024 * 1024) // ENTRY_BYTES, 1)
+        size = 1
+        while size * 2 <= max_entries:
+            size *= 2
+
+        self.entries = [None] * size
+        self.mask = size - 1
+        self.generation = 0
+        self.resetStats()
+
+    def resetStats(self):
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+        self.rejected = 0
+        self.cutoffs = 0
+        self.previous_hits = 0
+
+    # Start the search of another turn, the entries of earlier turns are kept
+    def newGeneration(self, generation):
+        self.generation = generation
+        self.resetStats()
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+        self.resetStats()
+
+    # Return the entry of the position or None, counting hits (of earlier turns too), misses and index collisions
+    def probe(self, key):
+        entry = self.entries[key & self.mask]
+
+        if (entry is None):
+            self.misses += 1
+            return None
+
+        if (entry[0] != key):
+            self.collisions += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if (entry[5] != self.generation):
+            self.previous_hits += 1
+        return entry
+
+    def store(self, key, depth, bound, score, best_move):
+        index = key & self.mask
+        entry = self.entries[index]
+
+        if (entry is not None and entry[0] != key and entry[1] > depth and entry[5] == self.generation):
+            self.rejected += 1
+            return
+
+        self.entries[index] = (key, depth, bound, score, best_move, self.generation)
+        self.stores += 1
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "rejected": self.rejected,
+            "cutoffs": self.cutoffs,
+            "previous_hits": self.previous_hits,
+            "hit_rate": self.hits / probes if probes else 0.0,
+        }
@@ -0,0 +1,60 @@
+import json
+import threading
+import time
+
+from deadline import DEADLINE_SAFETY_MS, searchDeadlines
+from gamestore import game_store
+
+# Watchdog of the move requests: the move is chosen in a thread of its own while the request waits for it
+# until the hard deadline. The game memory holds the best move found so far, a cheap safe move until the search
+# finishes its first depth. If the move is not chosen in time, the watchdog answers with that move and stops
+# the search, which returns at its next time check. Every time it fires is counted and logged with the request.
+
+# The search stops itself at the hard deadline and gets this many ms of the safety margin to return
+WATCHDOG_GRACE_MS = min(10, DEADLINE_SAFETY_MS / 2)
+
+watchdog_fires = 0
+watchdog_lock = threading.Lock()
+
+
+# Answer of choose_move(game_state, request_time_ms) if it is ready by the hard deadline, else
+# {"move": the best move found so far}, cheap_move until the search found one
+def watchedMove(game_state, request_time_ms, choose_move, cheap_move):
+    memory = game_store.get(game_state)
+    memory.answer_move = cheap_move
+    # The search of this request registers its context, the last request's is done
+    memory.search_context = None
+    _, stop_time_ms = searchDeadlines(game_state, request_time_ms, memory)
+
+    answer = {}
+
+    def chooseAnswer():
+        try:
+            answer["selected"] = choose_move(game_state, request_time_ms)
+        except Exception as err:
+            print(err)
+
+    thread = threading.Thread(target=chooseAnswer, daemon=True)
+    thread.start()
+    thread.join(max(stop_time_ms + WATCHDOG_GRACE_MS - time.time()*1000, 0) / 1000)
+
+    if (not thread.is_alive()):
+        if (answer.get("selected") is not None):
+            return answer["selected"]
+        return {"move": memory.answer_move}
+
+    if (memory.search_context is not None):
+        memory.search_context.stop()
+    watchdogFired(game_state, request_time_ms, memory.answer_move)
+    return {"move": memory.answer_move}
+
+
+def watchdogFired(game_state, request_time_ms, move):
+    global watchdog_fires
+    with watchdog_lock:
+        watchdog_fires += 1
+        fires = watchdog_fires
+
+    print("Watchdog fired (" + str(fires) + ") after " + str(round(time.time()*1000 - request_time_ms)) + " ms, game "
+          + game_state["game"]["id"] + " turn " + str(game_state["turn"]) + ", answered " + move
+          + ", position: " + json.dumps(game_state))